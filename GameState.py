@@ -1,6 +1,8 @@
 #!/usr/bin/python
 
 from card import *
+from scoring import handScores, runningTotals
+from seeds import dealFromSeed
 
 #
 # Game State class
@@ -14,6 +16,7 @@ class GameState:
   def __init__(self):
     self.players = []
     self.hands = []
+    self.seed = None
 
   #
   # initialize a new empty game
@@ -69,16 +72,11 @@ class GameState:
   #   returns)
   #
   def currentScores(self):
-    scores = [0] * self.numPlayers
-    for hand in self.hands:
-      bids = hand.getBids()
-      tricks = hand.getTricksMade()
-      for i in range(self.numPlayers):
-        if bids[i] == tricks[i]:
-          scores[i] = scores[i] + 10 + bids[i]*bids[i]
-        elif tricks[i] < bids[i]:
-          scores[i] = scores[i] - 5*(bids[i] - tricks[i])
-    return scores
+    totals = runningTotals([ (hand.getBids(), hand.getTricksMade())
+                             for hand in self.hands ])
+    if totals:
+      return totals[-1]
+    return [0] * self.numPlayers
 
   #
   # returns dealer of next hand
@@ -91,16 +89,22 @@ class GameState:
 
   #
   # generate XML representation of game
+  # Parameter:
+  #   deals - 0 to leave out the cards dealt in hands that have a seed
+  #           (they are dealt again from the seed when parsed)
   # Return value:
   #   XML rep of game as string
   #
-  def generateXML(self):
+  def generateXML(self, deals = 1):
     xml = "<?xml version=\"1.0\" ?>\n"
-    xml = xml + "<game numPlayers=\"" + str(self.numPlayers) + "\" >\n"
+    xml = xml + "<game numPlayers=\"" + str(self.numPlayers) + "\""
+    if self.seed is not None:
+      xml = xml + " seed=\"" + str(self.seed) + "\""
+    xml = xml + " >\n"
     xml = xml + "<time>" + self.time + "</time>\n"
     xml = xml + self.generatePlayerXML()
     for hand in self.hands:
-      xml = xml + hand.generateXML()
+      xml = xml + hand.generateXML(deals)
     xml = xml + "</game>\n"
     return xml
 
@@ -126,22 +130,20 @@ class GameState:
       Returns:
         List of scores
     """
-    handScores = []
+    sheet = []
     scores = [0] * self.numPlayers
     for hand in self.hands:
       bids = hand.getBids()
       tricks = hand.getTricksMade()
+      deltas = handScores(bids, tricks)
       handScore = []
       
       for i in range(self.numPlayers):
-        if bids[i] == tricks[i]:
-          scores[i] = scores[i] + 10 + bids[i]*bids[i]
-        elif tricks[i] < bids[i]:
-          scores[i] = scores[i] - 5*(bids[i] - tricks[i])
+        scores[i] = scores[i] + deltas[i]
         handScore.append( (bids[i], tricks[i], scores[i]))
         
-      handScores.append( (hand.numCards, handScore) )
-    return handScores
+      sheet.append( (hand.numCards, handScore) )
+    return sheet
       
  
 #
@@ -181,16 +183,9 @@ class TrickState:
       Returns:
         Winning player
     """
-    winnerNum, bestCard = self.cards[0]
-    for info in self.cards[1:]:
-      player, card_played = info
-      if ( cardSuit(bestCard) == cardSuit(card_played)
-           and cardValue(card_played) > cardValue(bestCard) ):
-        winnerNum, bestCard = info
-      elif ( trump >= 0 and cardSuit(bestCard) != cardSuit(trump)
-             and cardSuit(card_played) == cardSuit(trump) ):
-        winnerNum, bestCard = info
-    return winnerNum
+    if trump >= 0:
+      return trickWinner(self.cards, CARD_SUIT[trump])
+    return trickWinner(self.cards, -1)
 
   #
   # generate XML for trick
@@ -216,12 +211,14 @@ class HandState:
   #   numCards   - number of cards in hand
   #   trump      - index of trump card
   #   dealer     - index of dealer
+  #   seed       - seed the hand was dealt from (None if not known)
   #
-  def __init__(self, numPlayers, numCards, trump, dealer):
+  def __init__(self, numPlayers, numCards, trump, dealer, seed = None):
     self.numPlayers = int(numPlayers)
     self.numCards = int(numCards)
     self.trump = trump
     self.dealer = int(dealer)
+    self.seed = seed
     self.playerInfo = []
     self.tricks = []
 
@@ -301,6 +298,16 @@ class HandState:
     if not found:
       raise "playerID (%d) not found in HandState.setBid" % playerID
 
+  #
+  # deal the cards of every player (and the trump) again from the
+  # seed of the hand
+  #
+  def dealFromSeed( self ):
+    hands, self.trump = dealFromSeed(self.seed, self.numPlayers,
+                                     self.numCards, self.dealer)
+    for i in range(self.numPlayers):
+      self.setHand(i, hands[i])
+
   #
   # set the cards dealt to the given player for the hand
   # Parameters:
@@ -338,19 +345,25 @@ class HandState:
 
   #
   # generate XML for hand
+  # Parameter:
+  #   deals - 0 to leave out the cards dealt if the hand has a seed
   # Return value:
   #   XML representing hand as string
   #
-  def generateXML(self):
+  def generateXML(self, deals = 1):
     xml = ("<hand numCards=\"" + str(self.numCards) + "\" dealer=\""
-           + str(self.dealer) + "\" >\n")
+           + str(self.dealer) + "\"")
+    if self.seed is not None:
+      xml = xml + " seed=\"" + str(self.seed) + "\""
+    xml = xml + " >\n"
     if self.trump >= 0:
       xml = xml + "<trump> " + str(self.trump) + " </trump>\n"
-    for player in self.playerInfo:
-      xml = xml + "<deal playerID=\"" + str(player[0]) +"\" >\n"
-      for card in player[2]:
-        xml = xml + "<card value=\"" + str(card) + "\" />\n"
-      xml = xml + "</deal>\n"
+    if deals or self.seed is None:
+      for player in self.playerInfo:
+        xml = xml + "<deal playerID=\"" + str(player[0]) +"\" >\n"
+        for card in player[2]:
+          xml = xml + "<card value=\"" + str(card) + "\" />\n"
+        xml = xml + "</deal>\n"
     for player in self.playerInfo:
       xml = xml + ("<bid playerID=\"" + str(player[0]) + "\" value=\""
                    + str(player[1]) + "\" />\n")
@@ -376,6 +389,8 @@ class XMLHandler(xml.sax.handler.ContentHandler):
       key_list = attrs.keys()
       i = key_list.index('numPlayers')
       self.numPlayers = attrs.getValue('numPlayers')
+      if 'seed' in key_list:
+        self.gameState.seed = long(attrs.getValue('seed'))
     elif name == 'player':
       key_list = attrs.keys()
       i = key_list.index('playerID')
@@ -386,8 +401,14 @@ class XMLHandler(xml.sax.handler.ContentHandler):
     elif name == 'hand':
       numCards = attrs.getValue('numCards')
       dealer = attrs.getValue('dealer')
-      self.hand = HandState(self.numPlayers, numCards, -1, dealer)
-    elif name == 'bid':
+      seed = None
+      if 'seed' in attrs.keys():
+        seed = long(attrs.getValue('seed'))
+      self.hand = HandState(self.numPlayers, numCards, -1, dealer, seed)
+    elif name == 'bid' or name == 'trick' or name == 'tricks':
+      self.checkDeals()
+
+    if name == 'bid':
       self.hand.setBid(int(attrs.getValue('playerID')),
                        int(attrs.getValue('value')))
     elif name == 'tricks':
@@ -410,6 +431,7 @@ class XMLHandler(xml.sax.handler.ContentHandler):
     elif name == 'trump':
       self.hand.trump = int(self.chars)
     elif name == 'hand':
+      self.checkDeals()
       self.gameState.addHand(self.hand)
     elif name == 'deal':
       self.hand.setHand(self.playerCardsID, self.playerCards)
@@ -417,6 +439,13 @@ class XMLHandler(xml.sax.handler.ContentHandler):
       self.hand.addTrick(self.trick)
     self.chars = ''
 
+  #
+  # deal the current hand from its seed if the log left out the deals
+  #
+  def checkDeals(self):
+    if not self.hand.playerInfo and self.hand.seed is not None:
+      self.hand.dealFromSeed()
+
   def startDocument(self):
     self.gameState = GameState()
       
@@ -0,0 +1,449 @@
+###############################################
+# advisor.py
+# Monte Carlo bid advice with an LRU cache
+#
+# The advisor deals the unseen cards at random
+# many times and plays each deal out with a simple
+# bid-seeking card policy for every bid the player
+# could make.  Estimates are cached under the
+# canonical key of the hand (see canonical.py), so
+# a hand seen before, or one that only differs by
+# a renaming of the suits, is answered from the
+# cache.
+###############################################
+
+import random, threading
+from card import *
+from canonical import canonicalize
+from ismcts import Observation
+from scoring import handScore
+from seeds import deriveSeed
+
+#
+# default number of estimates kept in the cache
+#
+CACHE_SIZE = 4096
+
+#
+# default number of deals played out per estimate
+#
+SAMPLES = 100
+
+
+#
+# LRUCache class
+# bounded dict that forgets the least recently used key when full
+#
+# Attributes:
+#   capacity
+#     most keys kept
+#
+#   hits
+#     number of lookups that found their key
+#
+#   misses
+#     number of lookups that did not
+#
+#   evictions
+#     number of keys dropped to make room for new ones
+#
+class LRUCache:
+
+  #
+  # links of a cache entry (a list so they can be changed in place)
+  #
+  PREV, NEXT, KEY, VALUE = range(4)
+
+  def __init__( self, capacity = CACHE_SIZE ):
+    if capacity < 1:
+      raise ValueError('Cache capacity must be positive')
+    self.capacity = capacity
+    self.entries = {}
+    # circular list of entries, most recently used first
+    self.root = [None, None, None, None]
+    self.root[LRUCache.PREV] = self.root[LRUCache.NEXT] = self.root
+    self.hits = 0
+    self.misses = 0
+    self.evictions = 0
+
+  def __len__( self ):
+    return len(self.entries)
+
+  def __contains__( self, key ):
+    return key in self.entries
+
+  def _unlink( self, entry ):
+    prev, next = entry[LRUCache.PREV], entry[LRUCache.NEXT]
+    prev[LRUCache.NEXT] = next
+    next[LRUCache.PREV] = prev
+
+  def _pushFront( self, entry ):
+    first = self.root[LRUCache.NEXT]
+    entry[LRUCache.PREV] = self.root
+    entry[LRUCache.NEXT] = first
+    first[LRUCache.PREV] = entry
+    self.root[LRUCache.NEXT] = entry
+
+  #
+  # look up a key and mark it as most recently used
+  # Return value:
+  #   value of key, default if it is not in the cache
+  #
+  def get( self, key, default = None ):
+    entry = self.entries.get(key)
+    if entry is None:
+      self.misses = self.misses + 1
+      return default
+    self.hits = self.hits + 1
+    self._unlink(entry)
+    self._pushFront(entry)
+    return entry[LRUCache.VALUE]
+
+  #
+  # store the value of a key, dropping the least recently used key if
+  # the cache is full
+  #
+  def put( self, key, value ):
+    entry = self.entries.get(key)
+    if entry is not None:
+      entry[LRUCache.VALUE] = value
+      self._unlink(entry)
+      self._pushFront(entry)
+      return
+    if len(self.entries) >= self.capacity:
+      last = self.root[LRUCache.PREV]
+      self._unlink(last)
+      del self.entries[last[LRUCache.KEY]]
+      self.evictions = self.evictions + 1
+    entry = [None, None, key, value]
+    self._pushFront(entry)
+    self.entries[key] = entry
+
+  #
+  # drop every key (the counters are kept)
+  #
+  def clear( self ):
+    self.entries.clear()
+    self.root[LRUCache.PREV] = self.root[LRUCache.NEXT] = self.root
+
+  #
+  # fraction of lookups that found their key (0 before any lookup)
+  #
+  def hitRate( self ):
+    lookups = self.hits + self.misses
+    if not lookups:
+      return 0.0
+    return float(self.hits) / lookups
+
+  #
+  # return the counters as a dict
+  #
+  def stats( self ):
+    return { 'size': len(self.entries), 'capacity': self.capacity,
+             'hits': self.hits, 'misses': self.misses,
+             'evictions': self.evictions, 'hitRate': self.hitRate() }
+
+
+#
+# Advice class
+# estimate of how a hand will do for each bid
+#
+# Attributes:
+#   bid
+#     recommended bid (the legal bid with the highest expected score)
+#
+#   made
+#     made[k] is the probability of taking exactly k tricks when bidding k
+#
+#   expected
+#     expected[k] is the expected hand score when bidding k (None for the
+#     bid the dealer may not make)
+#
+class Advice:
+
+  def __init__( self, bid, made, expected ):
+    self.bid = bid
+    self.made = made
+    self.expected = expected
+
+
+#
+# pick a card for the player to move that goes after their bid: win the
+# trick as cheaply as possible while tricks are still needed, otherwise
+# get rid of the highest card that does not win
+# Parameter:
+#   position - Position with the bids of all players
+# Return value:
+#   card to play
+#
+# Cards of different suits are compared by the number of cards of their
+# suit still out that beat them, which only depends on the order of the
+# cards in play (see exact.py).
+#
+def policyCard( position ):
+  player = position.toMove
+  want = position.tricksWon[player] < position.bids[player]
+  cards = list(iterCards(position.legalMoves()))
+  rank = lambda card: CARD_RANK[card]
+  out = 0
+  for hand in position.hands:
+    out = out | hand
+  # cards still out above card, negated so higher cards come first
+  height = lambda card: -popcount(out & SUIT_MASKS[CARD_SUIT[card]]
+                                  & ~((2 << card) - 1))
+  if not position.trick:
+    if want:
+      return max(cards, key = height)
+    return min(cards, key = height)
+
+  trumpSuit = position.trumpSuit
+  best = position.trick[0][1]
+  for p, card in position.trick[1:]:
+    if beats(card, best, trumpSuit):
+      best = card
+  winners = [ card for card in cards if beats(card, best, trumpSuit) ]
+  losers = [ card for card in cards if not beats(card, best, trumpSuit) ]
+  if want:
+    if winners:
+      # cheapest winner, saving trumps
+      return min(winners,
+                 key = lambda card: (CARD_SUIT[card] == trumpSuit,
+                                     CARD_RANK[card]))
+    return min(losers, key = height)
+  if losers:
+    return max(losers, key = height)
+  return max(winners, key = rank)
+
+#
+# play the rest of a hand out with policyCard
+# Parameters:
+#   position - Position to play from
+#   until    - index of a player to stop at when it is their turn (-1 to
+#              play to the end)
+#
+def playOut( position, until = -1 ):
+  while not position.isOver() and position.toMove != until:
+    legal = position.legalMoves()
+    if legal & (legal - 1):
+      position.play(policyCard(position))
+    else:
+      # a forced card needs no policy
+      position.play(legal.bit_length() - 1)
+  return position
+
+
+#
+# BidAdvisor class
+# recommends bids from Monte Carlo estimates, caching them by canonical
+# hand key
+#
+# Attributes:
+#   samples
+#     number of deals played out per estimate
+#
+#   seed
+#     seed of the advisor; an estimate is sampled from deriveSeed(seed,
+#     key) so the same hand always gets the same estimate
+#
+#   cache
+#     LRUCache from (number of players, canonical key) to Advice
+#
+#   tables
+#     BidTables (see bidtables.py) to take advice from before sampling,
+#     None to always sample
+#
+#   exact
+#     ExactSolver (see exact.py) for the hands small enough to solve
+#     exactly, None to sample them too
+#
+#   model
+#     BidModel (see calibrate.py) to take advice from before sampling,
+#     after the tables; None to sample
+#
+# The cache is locked, so one thread can sample hands (advise) while
+# others look them up (lookup).
+#
+class BidAdvisor:
+
+  #
+  # constructor
+  # Parameters:
+  #   capacity - most estimates kept in the cache
+  #   samples  - number of deals played out per estimate
+  #   seed     - seed of the advisor
+  #   tables   - BidTables to look hands up in (None for none)
+  #   exact    - ExactSolver to solve small hands with (None for none)
+  #   model    - BidModel to predict hands with (None for none)
+  #
+  def __init__( self, capacity = CACHE_SIZE, samples = SAMPLES, seed = 0,
+                tables = None, exact = None, model = None ):
+    self.samples = samples
+    self.seed = seed
+    self.cache = LRUCache(capacity)
+    self.tables = tables
+    self.exact = exact
+    self.model = model
+    self.lock = threading.Lock()
+
+  #
+  # advise a player who is about to bid
+  # Parameters:
+  #   numPlayers - number of players
+  #   hand       - bit mask of the cards of player
+  #   trump      - trump card (-1 for no trump)
+  #   seat       - place of player in the bidding order (0 bids first,
+  #                numPlayers - 1 is the dealer)
+  #   bids       - bids made so far, in bidding order
+  # Return value:
+  #   Advice
+  #
+  def advise( self, numPlayers, hand, trump, seat, bids ):
+    (canonHand, canonTrump, seat, bids), key = \
+                canonicalize(hand, trump, seat, bids)
+    advice = self._cached( (numPlayers, key) )
+    if advice is None:
+      advice = self._solve(numPlayers, canonHand, canonTrump, seat, bids,
+                           key)
+    return advice
+
+  #
+  # advise a player whose hand lookup has just missed: like advise, but
+  # without looking in the cache again, so the miss is only counted once
+  # Parameters:
+  #   numPlayers, hand, trump, seat, bids - as for advise
+  # Return value:
+  #   Advice
+  #
+  def solve( self, numPlayers, hand, trump, seat, bids ):
+    (canonHand, canonTrump, seat, bids), key = \
+                canonicalize(hand, trump, seat, bids)
+    return self._solve(numPlayers, canonHand, canonTrump, seat, bids, key)
+
+  #
+  # advice that is quick to give: from the cache, the tables or the model,
+  # without solving or sampling
+  # Parameters:
+  #   numPlayers, hand, trump, seat, bids - as for advise
+  # Return value:
+  #   Advice, None if the hand is in none of them
+  #
+  def lookup( self, numPlayers, hand, trump, seat, bids ):
+    (canonHand, canonTrump, seat, bids), key = \
+                canonicalize(hand, trump, seat, bids)
+    advice = self._cached( (numPlayers, key) )
+    if advice is None:
+      advice = self._tabled(numPlayers, canonHand, canonTrump, seat, bids)
+      if advice is not None:
+        self._store( (numPlayers, key), advice )
+    return advice
+
+  #
+  # advise the player an Engine is asking for a bid
+  # Parameters:
+  #   engine    - Engine between dealing and the end of bidding
+  #   playerNum - index of player
+  #
+  def adviseEngine( self, engine, playerNum ):
+    return self.advise(*engineHand(engine, playerNum))
+
+  #
+  # solve, look up or sample a canonical hand and cache the advice
+  #
+  def _solve( self, numPlayers, hand, trump, seat, bids, key ):
+    advice = None
+    if self.exact is not None:
+      advice = self.exact.advise(numPlayers, hand, trump, seat, bids)
+    if advice is None:
+      advice = self._tabled(numPlayers, hand, trump, seat, bids)
+    if advice is None:
+      advice = self.estimate(numPlayers, hand, trump, seat, bids,
+                             random.Random(deriveSeed(self.seed, key)))
+    self._store( (numPlayers, key), advice )
+    return advice
+
+  def _cached( self, key ):
+    self.lock.acquire()
+    try:
+      return self.cache.get(key)
+    finally:
+      self.lock.release()
+
+  def _store( self, key, advice ):
+    self.lock.acquire()
+    try:
+      self.cache.put(key, advice)
+    finally:
+      self.lock.release()
+
+  #
+  # advice of the tables, or else of the model (None if neither has it)
+  #
+  def _tabled( self, numPlayers, hand, trump, seat, bids ):
+    advice = None
+    if self.tables is not None:
+      advice = self.tables.advise(numPlayers, hand, trump, seat, bids)
+    if advice is None and self.model is not None:
+      advice = self.model.advise(numPlayers, hand, trump, seat, bids)
+    return advice
+
+  #
+  # Monte Carlo estimate of a hand (usually in canonical form)
+  # Parameters:
+  #   numPlayers, hand, trump, seat, bids - as for advise
+  #   rng                                 - random.Random instance
+  # Return value:
+  #   Advice
+  #
+  def estimate( self, numPlayers, hand, trump, seat, bids, rng ):
+    numCards = popcount(hand)
+    # the dealer is the last player, so player numbers are seats
+    allBids = list(bids) + [-1] * (numPlayers - len(bids))
+    observation = Observation(numPlayers, numCards, numPlayers - 1, trump,
+                              seat, hand, allBids, [])
+    legal = observation.legalBids()
+    counts = [ [0] * (numCards + 1) for bid in range(numCards + 1) ]
+    for sample in xrange(self.samples):
+      hands = observation.determinize(rng)
+      guessed = observation.guessBids(hands)
+      for bid in range(numCards + 1):
+        guessed[seat] = bid
+        position = playOut(observation.position(hands, guessed))
+        counts[bid][position.tricksWon[seat]] = \
+                counts[bid][position.tricksWon[seat]] + 1
+
+    samples = float(self.samples)
+    made = [ counts[bid][bid] / samples for bid in range(numCards + 1) ]
+    expected = [None] * (numCards + 1)
+    best = None
+    for bid in legal:
+      expected[bid] = sum([ counts[bid][tricks] * handScore(bid, tricks)
+                            for tricks in range(numCards + 1) ]) / samples
+      if best is None or expected[bid] > expected[best]:
+        best = bid
+    return Advice(best, made, expected)
+
+  #
+  # return the cache counters (see LRUCache.stats)
+  #
+  def stats( self ):
+    self.lock.acquire()
+    try:
+      return self.cache.stats()
+    finally:
+      self.lock.release()
+
+
+#
+# the hand of the player an Engine is asking for a bid
+# Parameters:
+#   engine    - Engine between dealing and the end of bidding
+#   playerNum - index of player
+# Return value:
+#   (numPlayers, hand, trump, seat, bids) as BidAdvisor.advise takes them
+#
+def engineHand( engine, playerNum ):
+  numPlayers = engine.numPlayers
+  seat = (playerNum - engine.dealer - 1) % numPlayers
+  bids = tuple([ engine.bids[(engine.dealer + 1 + i) % numPlayers]
+                 for i in range(seat) ])
+  return (numPlayers, engine.cards[playerNum].mask, engine.trump, seat, bids)
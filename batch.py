@@ -0,0 +1,141 @@
+###############################################
+# batch.py
+# vectorized (NumPy) helpers for working on many
+# deals at once, for simulation and analysis
+###############################################
+
+import numpy
+from card import SUIT_MASKS
+
+#
+# default number of decks generated per chunk
+#
+CHUNK_SIZE = 65536
+
+SUIT_MASKS64 = numpy.array(SUIT_MASKS, numpy.uint64)
+
+
+#
+# shuffle a batch of decks
+# Parameters:
+#   numDecks - number of decks
+#   rng      - numpy.random.RandomState to shuffle with
+# Return value:
+#   (numDecks, 52) uint8 array, each row a shuffled deck
+#
+def shuffledDecks( numDecks, rng ):
+  keys = rng.random_sample((numDecks, 52))
+  return keys.argsort(axis=1).astype(numpy.uint8)
+
+#
+# generate shuffled decks in chunks of bounded size
+# Parameters:
+#   numDecks  - total number of decks
+#   seed      - seed for the decks (None for a random seed)
+#   chunkSize - maximum number of decks per chunk
+# Return value:
+#   generator of (n, 52) uint8 arrays with n <= chunkSize
+#
+# The decks produced for a seed do not depend on chunkSize.
+#
+def generateDecks( numDecks, seed=None, chunkSize=CHUNK_SIZE ):
+  rng = numpy.random.RandomState(seed)
+  done = 0
+  while done < numDecks:
+    n = min(chunkSize, numDecks - done)
+    yield shuffledDecks(n, rng)
+    done = done + n
+
+#
+# deal a batch of decks the way OhHellServer.startHand does: one card
+# at a time starting left of the dealer, then one card for trump
+# (no trump is turned for 10 card hands)
+# Parameters:
+#   decks      - (N, 52) array of shuffled decks
+#   numPlayers - number of players
+#   numCards   - number of cards dealt to each player
+#   dealer     - index of dealer, a scalar or an (N,) array
+# Return value:
+#   (hands, trump) where hands is an (N, numPlayers, numCards) uint8
+#   array indexed by player and trump an (N,) int8 array (-1 = no trump)
+#
+def dealDecks( decks, numPlayers, numCards, dealer ):
+  numDecks = decks.shape[0]
+  numDealt = numPlayers*numCards
+  if numDealt > 52:
+    raise ValueError('Not enough cards to deal %d cards to %d players'
+                     % (numCards, numPlayers))
+
+  # byOffset[n, k] holds the cards of the k-th player after the dealer
+  byOffset = decks[:, :numDealt].reshape(numDecks, numCards, numPlayers)
+  byOffset = byOffset.transpose(0, 2, 1)
+
+  offsets = (numpy.arange(numPlayers)
+             - numpy.asarray(dealer)[..., numpy.newaxis] - 1) % numPlayers
+  if offsets.ndim == 1:
+    hands = byOffset[:, offsets]
+  else:
+    hands = byOffset[numpy.arange(numDecks)[:, numpy.newaxis], offsets]
+
+  if numCards != 10 and numDealt < 52:
+    trump = decks[:, numDealt].astype(numpy.int8)
+  else:
+    trump = numpy.empty(numDecks, numpy.int8)
+    trump.fill(-1)
+  return numpy.ascontiguousarray(hands), trump
+
+#
+# generate dealt hands in chunks of bounded size
+# Parameters:
+#   numDeals   - total number of deals
+#   numPlayers - number of players
+#   numCards   - number of cards dealt to each player
+#   dealer     - index of dealer
+#   seed       - seed for the deals (None for a random seed)
+#   chunkSize  - maximum number of deals per chunk
+# Return value:
+#   generator of (hands, trump) pairs as returned by dealDecks
+#
+def generateDeals( numDeals, numPlayers, numCards, dealer, seed=None,
+                   chunkSize=CHUNK_SIZE ):
+  for decks in generateDecks(numDeals, seed, chunkSize):
+    yield dealDecks(decks, numPlayers, numCards, dealer)
+
+#
+# batched card.legalMask: cards that may be played in many positions
+# Parameters:
+#   hands    - (N,) array of hand bit masks
+#   ledCards - (N,) array of led cards (-1 where the player is leading)
+# Return value:
+#   (N,) uint64 array of legal card bit masks
+#
+def legalMasks( hands, ledCards ):
+  hands = numpy.asarray(hands, numpy.uint64)
+  ledCards = numpy.asarray(ledCards)
+  leading = ledCards < 0
+  follow = hands & SUIT_MASKS64[numpy.where(leading, 0, ledCards // 13)]
+  return numpy.where(leading | (follow == 0), hands, follow)
+
+#
+# find the winners of many tricks at once (batched card.trickWinner)
+# Parameters:
+#   cards     - (N, numPlayers) array, cards[n, p] played by player p
+#   lead      - (N,) array of the player who led each trick
+#   trumpSuit - (N,) array or scalar, suit of trump (-1 for no trump)
+# Return value:
+#   (N,) array of winning players
+#
+def trickWinners( cards, lead, trumpSuit ):
+  cards = numpy.asarray(cards, numpy.int16)
+  rows = numpy.arange(cards.shape[0])
+  suits = cards // 13
+  ledSuit = suits[rows, numpy.asarray(lead)]
+  trumpSuit = numpy.asarray(trumpSuit)
+  if trumpSuit.ndim == 0:
+    trumpSuit = trumpSuit.repeat(cards.shape[0])
+
+  # trumps beat cards of the led suit, which beat everything else
+  ranks = cards % 13
+  score = numpy.where(suits == ledSuit[:, numpy.newaxis], ranks + 1, 0)
+  score = numpy.where(suits == trumpSuit[:, numpy.newaxis], ranks + 14, score)
+  return score.argmax(axis=1)
@@ -0,0 +1,98 @@
+#!/usr/bin/python
+
+###############################################
+# bench_cardlist.py
+# compares the bit mask CardList with the old
+# list based implementation
+###############################################
+
+import os, sys, timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+from card import CardList
+
+
+#
+# the original CardList, kept here for comparison
+#
+class ListCardList:
+
+  def __init__(self, init=0):
+    self.cards = []
+    for i in range(52):
+      self.cards.append(init)
+
+  def hasCard( self, cardIndex ):
+    return self.cards[cardIndex]
+
+  def addCard( self, cardIndex ):
+    self.cards[cardIndex] = 1
+
+  def removeCard( self, cardIndex ):
+    self.cards[cardIndex] = 0
+
+  def hasSuit( self, suit ):
+    for i in range(suit*13, suit*13+13):
+      if self.cards[i]:
+        return 1
+    return 0
+
+  def numCards( self ):
+    cnt = 0
+    for i in range(52):
+      if self.cards[i]:
+        cnt = cnt + 1
+    return cnt
+
+  def getFirstCard( self ):
+    for i in range(52):
+      if self.cards[i]:
+        return i
+    return -1
+
+
+HAND = [ 5, 17, 22, 30, 38, 41, 44, 47, 49, 51 ]
+
+SETUP = """
+from __main__ import CardList, ListCardList, HAND
+cards = %s()
+for c in HAND:
+  cards.addCard(c)
+"""
+
+TESTS = [
+  ( 'construct', '%s()' ),
+  ( 'hasCard', 'cards.hasCard(38)' ),
+  ( 'hasSuit', 'cards.hasSuit(0)' ),
+  ( 'numCards', 'cards.numCards()' ),
+  ( 'getFirstCard', 'cards.getFirstCard()' ),
+  ( 'listCards', '[c for c in range(52) if cards.hasCard(c)]' ),
+]
+
+#
+# time one statement for both implementations
+# Return value:
+#   (list time, mask time) in microseconds per call
+#
+def compare( stmt, number ):
+  times = []
+  for cls in ('ListCardList', 'CardList'):
+    timer = timeit.Timer(stmt.replace('%s', cls), SETUP % cls)
+    times.append(min(timer.repeat(3, number)) / number * 1e6)
+  return times
+
+
+if __name__ == '__main__':
+  number = 100000
+  print '%-14s %10s %10s %8s' % ('operation', 'list (us)', 'mask (us)',
+                                 'speedup')
+  for name, stmt in TESTS:
+    listTime, maskTime = compare(stmt, number)
+    print '%-14s %10.3f %10.3f %7.1fx' % (name, listTime, maskTime,
+                                          listTime / maskTime)
+
+  # the bit mask version can also iterate its cards directly
+  timer = timeit.Timer('list(cards)', SETUP % 'CardList')
+  print '%-14s %10s %10.3f' % ('iterate', '-',
+                               min(timer.repeat(3, number)) / number * 1e6)
@@ -0,0 +1,77 @@
+#!/usr/bin/python
+
+###############################################
+# bench_cardtables.py
+# compares the lookup tables of cardtables.py with
+# computing suit, rank and names on every call
+###############################################
+
+import os, sys, timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+from cardtables import *
+from GameState import TrickState
+
+
+#
+# the original arithmetic helpers, kept here for comparison
+#
+def oldSuit( cardIndex ):
+  return cardIndex // 13
+
+def oldValue( cardIndex ):
+  return cardIndex % 13
+
+def oldToString( cardIndex ):
+  return RANK_NAMES[oldValue(cardIndex)] + ' of ' \
+         + SUIT_NAMES[oldSuit(cardIndex)]
+
+def oldParse( cardStr ):
+  cardValue = RANK_LETTERS.find(cardStr[0])
+  cardSuit = SUIT_LETTERS.find(cardStr[1])
+  if cardValue < 0 or cardSuit < 0:
+    return -1
+  return cardSuit*13 + cardValue
+
+def oldWinner( cards, trump ):
+  winnerNum, bestCard = cards[0]
+  for info in cards[1:]:
+    player, card_played = info
+    if ( oldSuit(bestCard) == oldSuit(card_played)
+         and oldValue(card_played) > oldValue(bestCard) ):
+      winnerNum, bestCard = info
+    elif ( trump >= 0 and oldSuit(bestCard) != oldSuit(trump)
+           and oldSuit(card_played) == oldSuit(trump) ):
+      winnerNum, bestCard = info
+  return winnerNum
+
+
+SETUP = """
+from __main__ import oldSuit, oldValue, oldToString, oldParse, oldWinner
+from __main__ import CARD_SUIT, CARD_RANK, CARD_NAME, parseCard, TrickState
+trick = TrickState()
+for seat, card in [ (2, 30), (3, 35), (4, 27), (0, 41), (1, 33) ]:
+  trick.addCard(seat, card)
+"""
+
+TESTS = [
+  ( 'suit', 'oldSuit(37)', 'CARD_SUIT[37]' ),
+  ( 'rank', 'oldValue(37)', 'CARD_RANK[37]' ),
+  ( 'name', 'oldToString(37)', 'CARD_NAME[37]' ),
+  ( 'parse', 'oldParse("QH")', 'parseCard("QH")' ),
+  ( 'trick winner', 'oldWinner(trick.cards, 44)', 'trick.getWinner(44)' ),
+]
+
+
+if __name__ == '__main__':
+  number = 200000
+  print '%-14s %10s %10s %8s' % ('operation', 'old (us)', 'table (us)',
+                                 'speedup')
+  for name, oldStmt, newStmt in TESTS:
+    times = []
+    for stmt in (oldStmt, newStmt):
+      timer = timeit.Timer(stmt, SETUP)
+      times.append(min(timer.repeat(3, number)) / number * 1e6)
+    print '%-14s %10.3f %10.3f %7.1fx' % (name, times[0], times[1],
+                                          times[0] / times[1])
@@ -0,0 +1,47 @@
+#!/usr/bin/python
+
+###############################################
+# bench_engine.py
+# games per second of the in-process engine
+# with random players
+###############################################
+
+import os, sys, time, random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+from engine import Engine
+from bots import RandomPlayer
+from seeds import deriveSeed
+
+
+#
+# play a number of games
+# Parameters:
+#   numGames   - number of games to play
+#   numPlayers - number of players per game
+#   seed       - seed for the games
+# Return value:
+#   (games per second, hands per second)
+#
+def run( numGames, numPlayers, seed ):
+  rng = random.Random(seed)
+  numHands = 0
+  start = time.time()
+  for i in range(numGames):
+    players = [ RandomPlayer('bot%d' % p, rng) for p in range(numPlayers) ]
+    engine = Engine(players, seed = deriveSeed(seed, i))
+    engine.playGame()
+    numHands = numHands + engine.gameState.numHands()
+  elapsed = time.time() - start
+  return numGames / elapsed, numHands / elapsed
+
+
+if __name__ == '__main__':
+  numGames = 200
+  if len(sys.argv) > 1:
+    numGames = int(sys.argv[1])
+  print '%-8s %10s %10s' % ('players', 'games/s', 'hands/s')
+  for numPlayers in range(2, 6):
+    games, hands = run(numGames, numPlayers, numPlayers)
+    print '%-8d %10.1f %10.1f' % (numPlayers, games, hands)
@@ -0,0 +1,92 @@
+#!/usr/bin/python
+
+###############################################
+# bench_ismcts.py
+# ISMCTS playouts per second for the first card
+# of seeded hands
+#
+#   bench_ismcts.py [seconds per search] [processes]
+###############################################
+
+import os, sys, time, random, multiprocessing
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+import ismcts
+from seeds import deriveSeed, dealFromSeed
+
+#
+# seed of the hands
+#
+SUITE_SEED = 0x15C75
+
+#
+# (numPlayers, numCards) of the hands searched
+#
+SIZES = [ (3, 10), (4, 5), (4, 10), (5, 10) ]
+
+
+#
+# return the observation of the first player to play a seeded hand
+#
+def observation( numPlayers, numCards, index ):
+  seed = deriveSeed(SUITE_SEED, numPlayers*100 + numCards*1000 + index)
+  hands, trump = dealFromSeed(seed, numPlayers, numCards, 0)
+  player = 1 % numPlayers
+  hand = 0
+  for card in hands[player]:
+    hand = hand | (1 << card)
+  bids = [ ismcts.quickBid(sum([ 1 << card for card in cards ]), trump)
+           for cards in hands ]
+  return ismcts.Observation(numPlayers, numCards, 0, trump, player, hand,
+                            bids, [])
+
+#
+# search a hand for some time
+# Parameters:
+#   observation - Observation of hand
+#   seconds     - time to search
+#   pool        - multiprocessing.Pool to search in (None for this
+#                 process)
+#   processes   - number of processes in pool
+# Return value:
+#   number of playouts
+#
+def run( observation, seconds, pool, processes ):
+  deadline = time.time() + seconds
+  if pool is None:
+    results = [ ismcts.search(observation, deadline, random.Random(1), 0) ]
+  else:
+    results = pool.map(ismcts.searchJob,
+                       [ (observation, deadline, i, 0)
+                         for i in range(processes) ])
+  playouts = 0
+  for stats in results:
+    for visits, reward in stats.values():
+      playouts = playouts + visits
+  return playouts
+
+
+if __name__ == '__main__':
+  seconds = 1.0
+  if len(sys.argv) > 1:
+    seconds = float(sys.argv[1])
+  processes = 0
+  if len(sys.argv) > 2:
+    processes = int(sys.argv[2])
+  pool = None
+  if processes:
+    pool = multiprocessing.Pool(processes)
+
+  print '%-8s %-6s %12s' % ('players', 'cards', 'playouts/s')
+  for numPlayers, numCards in SIZES:
+    playouts = 0
+    start = time.time()
+    for index in range(3):
+      playouts = playouts + run(observation(numPlayers, numCards, index),
+                                seconds, pool, processes)
+    print '%-8d %-6d %12.0f' % (numPlayers, numCards,
+                                playouts / (time.time() - start))
+    sys.stdout.flush()
+  if pool is not None:
+    pool.terminate()
@@ -0,0 +1,47 @@
+#!/usr/bin/python
+
+###############################################
+# bench_service.py
+# decisions per second of the batched decision
+# service against the delay batching adds, for
+# a range of batch sizes and latency caps
+#
+#   bench_service.py [tables] [games per table]
+###############################################
+
+import os, sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+from service import DecisionService, playTables
+
+#
+# seed of the games
+#
+SUITE_SEED = 0x5E41CE
+
+#
+# (batch size, latency cap in seconds) of the runs
+#
+SETTINGS = [ (1, 0.0), (8, 0.001), (32, 0.001), (32, 0.005), (128, 0.005) ]
+
+
+if __name__ == '__main__':
+  numTables = 32
+  if len(sys.argv) > 1:
+    numTables = int(sys.argv[1])
+  numGames = 1
+  if len(sys.argv) > 2:
+    numGames = int(sys.argv[2])
+
+  print '%-6s %-8s %10s %10s %10s %10s' % ('batch', 'latency', 'mean size',
+                                           'dec/s', 'mean ms', 'max ms')
+  for batchSize, latency in SETTINGS:
+    service = DecisionService(batchSize, latency)
+    playTables(service, numTables, 4, numGames, SUITE_SEED)
+    service.close()
+    stats = service.stats()
+    print '%-6d %-8.3f %10.1f %10.0f %10.2f %10.2f' % \
+          (batchSize, latency, stats['meanBatch'], stats['throughput'],
+           1000*stats['meanDelay'], 1000*stats['maxDelay'])
+    sys.stdout.flush()
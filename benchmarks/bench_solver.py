@@ -0,0 +1,119 @@
+#!/usr/bin/python
+
+###############################################
+# bench_solver.py
+# double dummy solver speed on a fixed suite of
+# seeded deals
+#
+#   bench_solver.py [deals per size] [max cards] [tablebase | -]
+#                   [node limit (0 for none)]
+#
+# Deals of up to 7 cards are solved in well under
+# a second.  10-card deals are not (5-player ones
+# take many minutes), so every size runs by
+# default with each deal stopped at the node
+# limit and counted as unsolved.
+###############################################
+
+import os, sys, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+from position import Position
+from seeds import deriveSeed, dealFromSeed
+from solver import Solver, SearchLimit
+from tablebase import Tablebase
+
+#
+# seed of the deal suite
+#
+SUITE_SEED = 0x50171
+
+#
+# (numPlayers, numCards) of the deals in the suite
+#
+SIZES = [ (4, 5), (4, 7), (5, 5), (5, 6), (5, 7), (4, 10), (5, 10) ]
+
+#
+# default most positions searched per deal
+#
+NODE_LIMIT = 1000000
+
+
+#
+# return the deals of the suite for one size
+# Parameters:
+#   numPlayers - number of players
+#   numCards   - number of cards per player
+#   numDeals   - number of deals
+# Return value:
+#   list of Positions
+#
+def suite( numPlayers, numCards, numDeals ):
+  positions = []
+  for i in range(numDeals):
+    seed = deriveSeed(SUITE_SEED, numPlayers*100 + numCards*1000 + i)
+    hands, trump = dealFromSeed(seed, numPlayers, numCards, 0)
+    deals = []
+    for cards in hands:
+      mask = 0
+      for card in cards:
+        mask = mask | (1 << card)
+      deals.append(mask)
+    positions.append(Position(deals, trump, 0))
+  return positions
+
+#
+# solve every seat of a list of deals
+# Parameters:
+#   positions - list of Positions
+#   tablebase - Tablebase for the solver (None for none)
+#   maxNodes  - most positions searched per deal (None for no limit)
+# Return value:
+#   (deals solved, average seconds per deal, slowest deal, average nodes
+#   per deal), deals stopped at the limit counting the time and nodes
+#   they took until then
+#
+def run( positions, tablebase = None, maxNodes = None ):
+  times = []
+  nodes = 0
+  solved = 0
+  for position in positions:
+    solver = Solver(tablebase = tablebase, maxNodes = maxNodes)
+    start = time.time()
+    try:
+      solver.solve(position)
+      solved = solved + 1
+    except SearchLimit:
+      pass
+    times.append(time.time() - start)
+    nodes = nodes + solver.nodes
+  return (solved, sum(times) / len(times), max(times),
+          float(nodes) / len(positions))
+
+
+if __name__ == '__main__':
+  numDeals = 5
+  if len(sys.argv) > 1:
+    numDeals = int(sys.argv[1])
+  maxCards = 10
+  if len(sys.argv) > 2:
+    maxCards = int(sys.argv[2])
+  tablebase = None
+  if len(sys.argv) > 3 and sys.argv[3] != '-':
+    tablebase = Tablebase(sys.argv[3])
+  maxNodes = NODE_LIMIT
+  if len(sys.argv) > 4:
+    maxNodes = int(sys.argv[4]) or None
+  print '%-8s %-6s %7s %10s %10s %12s' % ('players', 'cards', 'solved',
+                                          'avg s', 'max s', 'nodes/deal')
+  for numPlayers, numCards in SIZES:
+    if numCards > maxCards:
+      continue
+    solved, average, slowest, nodes = run(suite(numPlayers, numCards,
+                                                numDeals),
+                                          tablebase, maxNodes)
+    print '%-8d %-6d %7s %10.3f %10.3f %12.0f' % (
+      numPlayers, numCards, '%d/%d' % (solved, numDeals), average, slowest,
+      nodes)
+    sys.stdout.flush()
@@ -0,0 +1,49 @@
+#!/usr/bin/python
+
+###############################################
+# bench_strength.py
+# hand strength evaluations per second, one hand
+# at a time and in batches
+#
+#   bench_strength.py [hands] [cards]
+###############################################
+
+import os, sys, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+import strength
+from batch import generateDeals
+
+#
+# seed of the deals
+#
+SUITE_SEED = 0x57E6
+
+
+if __name__ == '__main__':
+  numHands = 100000
+  if len(sys.argv) > 1:
+    numHands = int(sys.argv[1])
+  numCards = 10
+  if len(sys.argv) > 2:
+    numCards = int(sys.argv[2])
+
+  hands, trump = generateDeals(numHands, 1, numCards, 0, SUITE_SEED,
+                               numHands).next()
+  hands = hands[:, 0]
+  masks = [ sum([ 1 << int(card) for card in cards ]) for cards in hands ]
+  trumps = map(int, trump)
+
+  start = time.time()
+  for i in xrange(numHands):
+    strength.handStrength(masks[i], trumps[i])
+  scalar = time.time() - start
+
+  start = time.time()
+  strength.expectedTricks(hands, trump)
+  batch = time.time() - start
+
+  print '%-8s %14s' % ('', 'hands/s')
+  print '%-8s %14.0f' % ('scalar', numHands / scalar)
+  print '%-8s %14.0f' % ('batch', numHands / batch)
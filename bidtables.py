@@ -0,0 +1,381 @@
+#!/usr/bin/python
+
+###############################################
+# bidtables.py
+# precomputed trick count distributions by hand
+# class, in a file read through mmap
+#
+# The builder plays out many random deals on all
+# cores; the tables are then looked up in O(1) by
+# every bot and server that opens the file, with
+# nothing to compute at startup.
+###############################################
+#
+# A hand is summed up by its class:
+#
+#   - trump class: number of trumps held (0 without trump), at most
+#     TRUMP_CLASSES - 1
+#   - strength class: high card points (ace 4, king 3, queen 2, jack 1)
+#     halved, at most STRENGTH_CLASSES - 1
+#
+# For every number of players, number of cards of the makeTrickNums
+# schedule, seat (place in the bidding order, the dealer last), trump
+# class, strength class and bid, the table gives the distribution of the
+# tricks the hand takes when it plays to that bid (see advisor.policyCard)
+# and the other players bid advisor-style quick bids.
+#
+# File layout (little endian):
+#   header    - magic 'OHBP', version (H), number of trump classes (B),
+#               number of strength classes (B), number of blocks (H)
+#   directory - per block: number of players (B), number of cards (B),
+#               offset of block (I)
+#   blocks    - per block, for each seat, trump class, strength class and
+#               bid 0..numCards: numCards + 1 bytes, the chance of taking
+#               0..numCards tricks in 255ths (all 0 when no deal was seen)
+#
+
+import sys, time, mmap, struct, multiprocessing
+from card import *
+from engine import makeTrickNums
+from ismcts import quickBid
+from position import Position
+from advisor import Advice, playOut
+from scoring import handScore
+from seeds import newSeed, deriveSeed, dealFromSeed
+
+MAGIC = 'OHBP'
+VERSION = 1
+HEADER = struct.Struct('<4sHBBH')
+BLOCK = struct.Struct('<BBI')
+
+TRUMP_CLASSES = 5
+STRENGTH_CLASSES = 12
+
+#
+# high card points of each rank (2 .. ace)
+#
+POINTS = [0] * 9 + [1, 2, 3, 4]
+
+#
+# default number of deals per work unit
+#
+CHUNK_SIZE = 200
+
+
+#
+# class of a hand
+# Parameters:
+#   hand  - bit mask of cards held
+#   trump - trump card (-1 for no trump)
+# Return value:
+#   (trump class, strength class)
+#
+def handClass( hand, trump ):
+  points = 0
+  for card in iterCards(hand):
+    points = points + POINTS[CARD_RANK[card]]
+  if trump >= 0:
+    trumps = popcount(hand & SUIT_MASKS[CARD_SUIT[trump]])
+  else:
+    trumps = 0
+  return (min(trumps, TRUMP_CLASSES - 1),
+          min(points / 2, STRENGTH_CLASSES - 1))
+
+#
+# number of table rows (one per bid) of a block
+#
+def blockRows( numPlayers, numCards ):
+  return numPlayers * TRUMP_CLASSES * STRENGTH_CLASSES * (numCards + 1)
+
+#
+# index of the row of a hand class and bid in its block
+#
+def rowIndex( numCards, seat, trumpClass, strengthClass, bid ):
+  return (((seat*TRUMP_CLASSES + trumpClass)*STRENGTH_CLASSES
+           + strengthClass)*(numCards + 1) + bid)
+
+
+#
+# BidTables class
+# read only view of a bid table file
+#
+# Attributes:
+#   blocks
+#     dict from (number of players, number of cards) to the offset of
+#     their block in the file
+#
+class BidTables:
+
+  #
+  # constructor
+  # Parameter:
+  #   fileName - name of a file written by writeTables
+  #
+  def __init__( self, fileName ):
+    self.file = open(fileName, 'rb')
+    self.data = mmap.mmap(self.file.fileno(), 0, access = mmap.ACCESS_READ)
+    if len(self.data) < HEADER.size:
+      raise ValueError('Not a bid table file: ' + fileName)
+    magic, version, trumpClasses, strengthClasses, numBlocks = \
+           HEADER.unpack_from(self.data, 0)
+    if magic != MAGIC or version != VERSION:
+      raise ValueError('Not a bid table file: ' + fileName)
+    if trumpClasses != TRUMP_CLASSES or strengthClasses != STRENGTH_CLASSES:
+      raise ValueError('Bid table file uses other hand classes: ' + fileName)
+    self.blocks = {}
+    end = HEADER.size + numBlocks*BLOCK.size
+    for i in range(numBlocks):
+      numPlayers, numCards, offset = \
+                  BLOCK.unpack_from(self.data, HEADER.size + i*BLOCK.size)
+      self.blocks[(numPlayers, numCards)] = offset
+      end = max(end, offset + blockRows(numPlayers, numCards)*(numCards + 1))
+    if len(self.data) < end:
+      raise ValueError('Truncated bid table file: ' + fileName)
+
+  #
+  # distribution of the tricks taken by a hand
+  # Parameters:
+  #   numPlayers - number of players
+  #   hand       - bit mask of the cards of player
+  #   trump      - trump card (-1 for no trump)
+  #   seat       - place of player in the bidding order (the dealer is
+  #                numPlayers - 1)
+  #   bid        - bid of player
+  # Return value:
+  #   list of the chances of taking 0..numCards tricks, None if the
+  #   table has no deals for the hand class
+  #
+  def distribution( self, numPlayers, hand, trump, seat, bid ):
+    numCards = popcount(hand)
+    offset = self.blocks.get( (numPlayers, numCards) )
+    if offset is None:
+      return None
+    trumpClass, strengthClass = handClass(hand, trump)
+    start = offset + (rowIndex(numCards, seat, trumpClass, strengthClass, bid)
+                      * (numCards + 1))
+    row = struct.unpack_from('%dB' % (numCards + 1), self.data, start)
+    total = float(sum(row))
+    if not total:
+      return None
+    return [ count / total for count in row ]
+
+  #
+  # recommend a bid from the tables
+  # Parameters:
+  #   numPlayers, hand, trump, seat - as for distribution
+  #   bids - bids made so far, in bidding order
+  # Return value:
+  #   Advice (see advisor.py), None if the table has no deals for the
+  #   hand class
+  #
+  def advise( self, numPlayers, hand, trump, seat, bids ):
+    numCards = popcount(hand)
+    forbidden = -1
+    if seat == numPlayers - 1:
+      forbidden = numCards - sum(bids)
+    made = [0.0] * (numCards + 1)
+    expected = [None] * (numCards + 1)
+    best = None
+    for bid in range(numCards + 1):
+      chances = self.distribution(numPlayers, hand, trump, seat, bid)
+      if chances is None:
+        return None
+      made[bid] = chances[bid]
+      if bid == forbidden:
+        continue
+      expected[bid] = sum([ chances[tricks] * handScore(bid, tricks)
+                            for tricks in range(numCards + 1) ])
+      if best is None or expected[bid] > expected[best]:
+        best = bid
+    return Advice(best, made, expected)
+
+  def close( self ):
+    self.data.close()
+    self.file.close()
+
+
+###############################################################
+# builder
+###############################################################
+
+#
+# play out the deals of one work unit (runs in a worker process)
+# Parameter:
+#   unit - (numPlayers, numCards, seed, firstDeal, numDeals); deal n is
+#          dealt from the hand seed deriveSeed(seed, n)
+# Return value:
+#   (numPlayers, numCards, counts) where counts[row][tricks] is the number
+#   of times the hands of a table row took that many tricks
+#
+def buildUnit( unit ):
+  numPlayers, numCards, seed, firstDeal, numDeals = unit
+  counts = [ [0] * (numCards + 1)
+             for row in range(blockRows(numPlayers, numCards)) ]
+  # the dealer is the last player, so player numbers are seats
+  dealer = numPlayers - 1
+  for n in xrange(firstDeal, firstDeal + numDeals):
+    hands, trump = dealFromSeed(deriveSeed(seed, n), numPlayers, numCards,
+                                dealer)
+    masks = []
+    for cards in hands:
+      mask = 0
+      for card in cards:
+        mask = mask | (1 << card)
+      masks.append(mask)
+    bids = [ quickBid(mask, trump) for mask in masks ]
+    for seat in range(numPlayers):
+      trumpClass, strengthClass = handClass(masks[seat], trump)
+      for bid in range(numCards + 1):
+        played = list(bids)
+        played[seat] = bid
+        tricks = playOut(Position(masks, trump, dealer, played)).tricksWon[seat]
+        row = counts[rowIndex(numCards, seat, trumpClass, strengthClass, bid)]
+        row[tricks] = row[tricks] + 1
+  return numPlayers, numCards, counts
+
+#
+# split a build into work units
+# Parameters:
+#   playerCounts - numbers of players to build tables for
+#   numDeals     - deals per number of players and number of cards
+#   seed         - seed of the build
+#   chunkSize    - deals per work unit
+#
+def makeUnits( playerCounts, numDeals, seed, chunkSize ):
+  units = []
+  for numPlayers in playerCounts:
+    for numCards in sorted(set(makeTrickNums(numPlayers))):
+      # every (numPlayers, numCards) gets its own stream of deals
+      blockSeed = deriveSeed(seed, (numPlayers << 8) | numCards)
+      done = 0
+      while done < numDeals:
+        n = min(chunkSize, numDeals - done)
+        units.append( (numPlayers, numCards, blockSeed, done, n) )
+        done = done + n
+  return units
+
+#
+# build the tables
+# Parameters:
+#   playerCounts - numbers of players to build tables for
+#   numDeals     - deals per number of players and number of cards
+#   seed         - seed of the build (None for a random one)
+#   processes    - number of worker processes (None for one per core)
+#   chunkSize    - deals per work unit
+#   progress     - file to write a progress line to (None for no output)
+# Return value:
+#   dict from (numPlayers, numCards) to counts as returned by buildUnit
+#
+def build( playerCounts, numDeals, seed = None, processes = None,
+           chunkSize = CHUNK_SIZE, progress = sys.stderr ):
+  if seed is None:
+    seed = newSeed()
+  units = makeUnits(playerCounts, numDeals, seed, chunkSize)
+  tables = {}
+  pool = multiprocessing.Pool(processes)
+  start = time.time()
+  done = 0
+  try:
+    for numPlayers, numCards, counts in pool.imap_unordered(buildUnit,
+                                                            units):
+      table = tables.get( (numPlayers, numCards) )
+      if table is None:
+        tables[(numPlayers, numCards)] = counts
+      else:
+        for row in range(len(counts)):
+          for tricks in range(numCards + 1):
+            table[row][tricks] = table[row][tricks] + counts[row][tricks]
+      done = done + 1
+      if progress is not None:
+        progress.write('\r%d/%d units  %.1f s  ' % (done, len(units),
+                                                   time.time() - start))
+        progress.flush()
+  finally:
+    pool.terminate()
+  if progress is not None:
+    progress.write('\n')
+  return tables
+
+#
+# scale a row of counts to 255ths, keeping the largest remainders so the
+# row still sums to 255
+#
+def quantize( row ):
+  total = sum(row)
+  if not total:
+    return [0] * len(row)
+  scaled = [ 255*count // total for count in row ]
+  order = sorted(range(len(row)),
+                 key = lambda i: 255*row[i] % total, reverse = True)
+  for i in order[:255 - sum(scaled)]:
+    scaled[i] = scaled[i] + 1
+  return scaled
+
+#
+# write a bid table file
+# Parameters:
+#   fileName - name of file
+#   tables   - dict returned by build
+#
+def writeTables( fileName, tables ):
+  keys = sorted(tables.keys())
+  offset = HEADER.size + len(keys)*BLOCK.size
+  directory = []
+  for numPlayers, numCards in keys:
+    directory.append(BLOCK.pack(numPlayers, numCards, offset))
+    offset = offset + blockRows(numPlayers, numCards)*(numCards + 1)
+  file = open(fileName, 'wb')
+  file.write(HEADER.pack(MAGIC, VERSION, TRUMP_CLASSES, STRENGTH_CLASSES,
+                         len(keys)))
+  file.write(''.join(directory))
+  for key in keys:
+    for row in tables[key]:
+      file.write(struct.pack('%dB' % len(row), *quantize(row)))
+  file.close()
+
+
+###############################################################
+# program code
+###############################################################
+
+def printUsage():
+  print 'Usage: bidtables.py [-n <num_players,...>] [-d <deals>] [-j <processes>]'
+  print '                    [-c <chunk size>] [-s <seed>] [-o <file>]'
+  sys.exit(1)
+
+
+if __name__ == '__main__':
+  import getopt
+
+  playerCounts = [3, 4, 5]
+  numDeals = 2000
+  processes = None
+  chunkSize = CHUNK_SIZE
+  seed = None
+  fileName = 'bids.tbl'
+  try:
+    flags, args = getopt.getopt(sys.argv[1:], 'n:d:j:c:s:o:')
+    for flag, value in flags:
+      if flag == '-n':
+        playerCounts = [ int(n) for n in value.split(',') ]
+      elif flag == '-d':
+        numDeals = int(value)
+      elif flag == '-j':
+        processes = int(value)
+      elif flag == '-c':
+        chunkSize = int(value)
+      elif flag == '-s':
+        seed = int(value)
+      elif flag == '-o':
+        fileName = value
+  except (getopt.GetoptError, ValueError):
+    printUsage()
+  # every schedule has a 10 card hand, which turns no trump, so the deck
+  # only needs 10 cards per player
+  for numPlayers in playerCounts:
+    if numPlayers < 2 or numPlayers*max(makeTrickNums(numPlayers)) > 52:
+      printUsage()
+
+  tables = build(playerCounts, numDeals, seed, processes, chunkSize)
+  writeTables(fileName, tables)
+  print 'Wrote', len(tables), 'tables to', fileName
@@ -0,0 +1,283 @@
+###############################################
+# bots.py
+# computer players for the game engine
+###############################################
+
+import time, random, multiprocessing
+import ismcts
+from card import *
+from engine import EnginePlayer
+from tracker import CardTracker
+from advisor import BidAdvisor, engineHand
+from exact import ExactSolver
+import strength
+
+
+#
+# RandomPlayer class
+# bids and plays legal cards at random
+#
+# Attributes:
+#   rng
+#     random number generator of player
+#
+class RandomPlayer(EnginePlayer):
+
+  #
+  # constructor
+  # Parameters:
+  #   name - name of player
+  #   rng  - random.Random instance (None for a random one)
+  #
+  def __init__( self, name = "", rng = None ):
+    EnginePlayer.__init__(self, name)
+    if rng is None:
+      rng = random.Random()
+    self.rng = rng
+
+  def getBid( self, engine, playerNum ):
+    forbidden = engine.forbiddenBid(playerNum)
+    while 1:
+      bid = self.rng.randint(0, engine.numCards)
+      if bid != forbidden:
+        return bid
+
+  def getCard( self, engine, playerNum ):
+    if engine.trick:
+      legal = engine.cards[playerNum].legalCards(engine.trick[0][1])
+    else:
+      legal = engine.cards[playerNum].mask
+    cards = list(iterCards(legal))
+    return cards[self.rng.randrange(len(cards))]
+
+
+#
+# HeuristicPlayer class
+# bids the expected tricks of its hand (see strength.strengthBid) and
+# plays the card most likely to win the trick while it still needs tricks,
+# the least likely one after that (see CardTracker.winChances)
+#
+# Attributes:
+#   rng
+#     random number generator of player (unused, for the same constructor
+#     as the other bots)
+#
+#   tracker
+#     CardTracker following the cards of the hand
+#
+#   bid
+#     bid of player in the current hand
+#
+#   tricksWon
+#     tricks taken by player in the current hand
+#
+#   model
+#     BidModel (see calibrate.py) to bid with, shared by all heuristic
+#     players; None to bid with the default weights of strength.py
+#
+class HeuristicPlayer(EnginePlayer):
+
+  model = None
+
+  #
+  # constructor
+  # Parameters:
+  #   name - name of player
+  #   rng  - random.Random instance (None for a random one)
+  #
+  def __init__( self, name = "", rng = None ):
+    EnginePlayer.__init__(self, name)
+    if rng is None:
+      rng = random.Random()
+    self.rng = rng
+    self.tracker = CardTracker(1, 0)
+    self.playerNum = -1
+
+  def notify( self, message, *args ):
+    self.tracker.notify(message, *args)
+    if message == 'START_GAME':
+      self.tracker = CardTracker(args[0], 0)
+    elif message == 'NEW_HAND':
+      self.bid = 0
+      self.tricksWon = 0
+    elif message == 'BID_ANNOUNCE' and args[0] == self.playerNum:
+      self.bid = args[1]
+    elif message == 'TRICK_WINNER' and args[0] == self.playerNum:
+      self.tricksWon = self.tricksWon + 1
+
+  def getBid( self, engine, playerNum ):
+    # the engine only says which player this is when it asks
+    self.playerNum = self.tracker.player = playerNum
+    if self.model is not None:
+      return self.model.bid(engine.numPlayers, engine.cards[playerNum].mask,
+                            engine.trump, engine.forbiddenBid(playerNum))
+    return strength.strengthBid(engine.cards[playerNum].mask, engine.trump,
+                                engine.forbiddenBid(playerNum))
+
+  def getCard( self, engine, playerNum ):
+    return chanceCard(self.tracker.winChances(), self.tricksWon < self.bid)
+
+
+#
+# AdvisorPlayer class
+# HeuristicPlayer that bids what the bid advisor recommends (see
+# advisor.py), and in the hands small enough to solve exactly plays the
+# card of ExactSolver.bestCard (see exact.py)
+#
+# Attributes:
+#   advisor
+#     BidAdvisor shared by all advisor players, so a hand seen before (in
+#     another game, or in the same deal with the seats rotated) is
+#     answered from its cache; made by the first bid of an advisor player
+#     (None until then)
+#
+#   dealt
+#     the hand of player when it bid, as engineHand returns it (see
+#     advisor.py)
+#
+class AdvisorPlayer(HeuristicPlayer):
+
+  advisor = None
+
+  def getBid( self, engine, playerNum ):
+    self.playerNum = self.tracker.player = playerNum
+    if AdvisorPlayer.advisor is None:
+      AdvisorPlayer.advisor = BidAdvisor(exact = ExactSolver())
+    self.dealt = engineHand(engine, playerNum)
+    return AdvisorPlayer.advisor.adviseEngine(engine, playerNum).bid
+
+  def getCard( self, engine, playerNum ):
+    card = None
+    if AdvisorPlayer.advisor.exact is not None:
+      numPlayers, hand, trump, seat, bids = self.dealt
+      card = AdvisorPlayer.advisor.exact.bestCard(
+        numPlayers, hand, trump, seat, bids, self.bid,
+        [ card for player, card in engine.trick ],
+        engine.cards[playerNum].mask)
+    if card is None:
+      card = HeuristicPlayer.getCard(self, engine, playerNum)
+    return card
+
+
+#
+# pick the card of HeuristicPlayer
+# Parameters:
+#   chances - dict from each legal card to its chance of winning the trick
+#   want    - 1 if the player still needs tricks
+#
+def chanceCard( chances, want ):
+  if want:
+    # surest winner, the lowest of equal ones
+    return max(chances, key = lambda card: (chances[card], -CARD_RANK[card]))
+  # surest loser, the highest of equal ones
+  return min(chances, key = lambda card: (chances[card], -CARD_RANK[card]))
+
+
+#
+# ISMCTSPlayer class
+# bids and plays with information set Monte Carlo tree search (see
+# ismcts.py), following the game through the engine messages
+#
+# Attributes:
+#   rng
+#     random number generator of player
+#
+#   budget
+#     wall clock seconds allowed for each bid or card
+#
+#   processes
+#     number of worker processes to search in (0 to search in this
+#     process)
+#
+#   numPlayers, numCards, dealer, trump, hand, bids, plays
+#     what the player knows of the current hand (see ismcts.Observation)
+#
+class ISMCTSPlayer(EnginePlayer):
+
+  #
+  # constructor
+  # Parameters:
+  #   name      - name of player
+  #   rng       - random.Random instance (None for a random one)
+  #   budget    - seconds allowed for each decision
+  #   processes - number of worker processes (0 for none)
+  #
+  def __init__( self, name = "", rng = None, budget = 0.1, processes = 0 ):
+    EnginePlayer.__init__(self, name)
+    if rng is None:
+      rng = random.Random()
+    self.rng = rng
+    self.budget = budget
+    self.processes = processes
+    self.pool = None
+    if processes:
+      self.pool = multiprocessing.Pool(processes)
+    self.numPlayers = 0
+
+  def notify( self, message, *args ):
+    if message == 'START_GAME':
+      self.numPlayers = args[0]
+    elif message == 'NEW_HAND':
+      self.numCards, self.dealer = args
+      self.hand = 0
+      self.bids = [-1] * self.numPlayers
+      self.plays = []
+    elif message == 'DRAW':
+      self.hand = self.hand | (1 << args[0])
+    elif message == 'DEAL_OVER':
+      self.trump = args[0]
+    elif message == 'BID_ANNOUNCE':
+      self.bids[args[0]] = args[1]
+    elif message == 'CARD_PLAYED':
+      self.plays.append( (args[0], args[1]) )
+      self.hand = self.hand & ~(1 << args[1])
+
+  def getBid( self, engine, playerNum ):
+    return self.decide(playerNum, 1)
+
+  def getCard( self, engine, playerNum ):
+    return self.decide(playerNum, 0)
+
+  #
+  # search for a bid or a card within the time budget
+  # Parameters:
+  #   playerNum - index of this player
+  #   bidding   - 1 for a bid, 0 for a card
+  #
+  def decide( self, playerNum, bidding ):
+    deadline = time.time() + self.budget
+    observation = ismcts.Observation(self.numPlayers, self.numCards,
+                                     self.dealer, self.trump, playerNum,
+                                     self.hand, self.bids, self.plays)
+    if self.pool is not None:
+      # leave time to send the results back, and wait for them no longer
+      # than the deadline (results that come later are dropped)
+      jobs = [ (observation, deadline - ismcts.POOL_MARGIN*self.budget,
+                self.rng.getrandbits(64), bidding)
+               for i in range(self.processes) ]
+      pending = self.pool.map_async(ismcts.searchJob, jobs)
+      try:
+        results = pending.get(max(deadline - time.time(), 0.0))
+      except multiprocessing.TimeoutError:
+        results = []
+    else:
+      results = [ ismcts.search(observation, deadline, self.rng, bidding) ]
+
+    move = ismcts.bestMove(results)
+    if move is None:
+      if bidding:
+        moves = observation.legalBids()
+      else:
+        moves = list(iterCards(observation.legalCards()))
+      move = moves[self.rng.randrange(len(moves))]
+    return move
+
+  #
+  # stop the worker processes (the player cannot search in workers after
+  # this)
+  #
+  def close( self ):
+    if self.pool is not None:
+      self.pool.terminate()
+      self.pool = None
+      self.processes = 0
@@ -0,0 +1,342 @@
+#!/usr/bin/python
+
+###############################################
+# calibrate.py
+# bid model fitted to the game archive
+#
+# The trainer reads the XML game logs one game at
+# a time and fits, for each number of players, a
+# linear model of the tricks a hand takes from
+# its strength.py features, plus the spread of
+# the tricks around it.  The model is a few
+# hundred bytes of NumPy arrays that bots and the
+# bid advisor load once and evaluate in
+# microseconds.
+#
+#   calibrate.py [-o <model file>] [-r <ridge>] <xml file or directory> ...
+###############################################
+#
+# Only sums are kept while reading (X'X, X'y, y'y and the number of
+# hands and of cards for each number of players), so the archive can be
+# any size.  Row 0 of the model pools every number of players and is used
+# for the numbers of players the archive has no hands of.  The tricks a
+# hand takes are modelled as normal around the fitted value with a
+# variance of spread times the number of cards.
+#
+
+import sys, os, math
+import xml.sax
+import numpy
+import strength
+from card import *
+from advisor import Advice
+from GameState import GameXMLParser
+from scoring import handScore
+
+MODEL_VERSION = 1
+
+#
+# most players a model has a row for
+#
+MAX_PLAYERS = 7
+
+#
+# default ridge penalty of the fit (keeps features never seen at 0)
+#
+RIDGE = 1e-3
+
+
+#
+# BidModel class
+# tricks expected of a hand, by number of players
+#
+# Attributes:
+#   weights
+#     (MAX_PLAYERS + 1, len(strength.FEATURES)) array, row n the weights
+#     of strength.expectedTricks for n players (row 0 for all)
+#
+#   spread
+#     (MAX_PLAYERS + 1,) array, variance of the tricks taken per card
+#
+#   counts
+#     (MAX_PLAYERS + 1,) array, number of hands each row was fitted to
+#
+class BidModel:
+
+  def __init__( self, weights, spread, counts ):
+    self.weights = weights
+    self.spread = spread
+    self.counts = counts
+    # plain lists are faster than arrays one hand at a time
+    self.rows = weights.tolist()
+
+  #
+  # index of the row of a number of players
+  #
+  def row( self, numPlayers ):
+    if numPlayers <= MAX_PLAYERS and self.counts[numPlayers]:
+      return numPlayers
+    return 0
+
+  #
+  # return the weights for a number of players (see strength.py)
+  #
+  def weightsFor( self, numPlayers ):
+    return self.rows[self.row(numPlayers)]
+
+  #
+  # tricks expected of a hand
+  # Parameters:
+  #   numPlayers - number of players
+  #   hand       - bit mask of the cards of player
+  #   trump      - trump card (-1 for no trump)
+  #
+  def expectedTricks( self, numPlayers, hand, trump ):
+    return strength.handStrength(hand, trump, self.weightsFor(numPlayers))
+
+  #
+  # bid of a hand (see strength.tricksToBid)
+  # Parameters:
+  #   numPlayers, hand, trump - as for expectedTricks
+  #   forbidden               - bid the player may not make (-1 for none)
+  #
+  def bid( self, numPlayers, hand, trump, forbidden = -1 ):
+    return strength.tricksToBid(self.expectedTricks(numPlayers, hand, trump),
+                                popcount(hand), forbidden)
+
+  #
+  # distribution of the tricks taken by a hand
+  # Parameters:
+  #   numPlayers, hand, trump - as for expectedTricks
+  # Return value:
+  #   list of the chances of taking 0..numCards tricks
+  #
+  def distribution( self, numPlayers, hand, trump ):
+    numCards = popcount(hand)
+    mean = self.expectedTricks(numPlayers, hand, trump)
+    deviation = math.sqrt(max(self.spread[self.row(numPlayers)]*numCards,
+                              1e-6))
+    # chance of the normal falling below k - 1/2, for k = 0..numCards + 1
+    scale = deviation*math.sqrt(2)
+    below = [ 0.5*(1.0 + math.erf((k - 0.5 - mean) / scale))
+              for k in range(1, numCards + 1) ]
+    below = [0.0] + below + [1.0]
+    return [ below[k + 1] - below[k] for k in range(numCards + 1) ]
+
+  #
+  # recommend a bid from the model
+  # Parameters:
+  #   numPlayers, hand, trump - as for expectedTricks
+  #   seat                    - place of player in the bidding order (the
+  #                             dealer is numPlayers - 1)
+  #   bids                    - bids made so far, in bidding order
+  # Return value:
+  #   Advice (see advisor.py)
+  #
+  def advise( self, numPlayers, hand, trump, seat, bids ):
+    numCards = popcount(hand)
+    forbidden = -1
+    if seat == numPlayers - 1:
+      forbidden = numCards - sum(bids)
+    chances = self.distribution(numPlayers, hand, trump)
+    expected = [None] * (numCards + 1)
+    best = None
+    for bid in range(numCards + 1):
+      if bid == forbidden:
+        continue
+      expected[bid] = sum([ chances[tricks] * handScore(bid, tricks)
+                            for tricks in range(numCards + 1) ])
+      if best is None or expected[bid] > expected[best]:
+        best = bid
+    return Advice(best, list(chances), expected)
+
+  #
+  # write the model to a file
+  #
+  def save( self, fileName ):
+    out = open(fileName, 'wb')
+    try:
+      numpy.savez(out, version = numpy.array(MODEL_VERSION),
+                  features = numpy.array(strength.FEATURES),
+                  weights = self.weights, spread = self.spread,
+                  counts = self.counts)
+    finally:
+      out.close()
+
+
+#
+# read a model written by BidModel.save
+# Return value:
+#   BidModel
+#
+def loadModel( fileName ):
+  try:
+    data = numpy.load(fileName)
+    try:
+      version = int(data['version'])
+      features = list(data['features'])
+      model = BidModel(data['weights'], data['spread'], data['counts'])
+    finally:
+      data.close()
+  except (AttributeError, KeyError, ValueError):
+    raise ValueError('Not a bid model file: ' + fileName)
+  if version != MODEL_VERSION or features != strength.FEATURES:
+    raise ValueError('Bid model file uses other features: ' + fileName)
+  return model
+
+
+#
+# Trainer class
+# sums of the archived hands for the least squares fit
+#
+# Attributes:
+#   xtx, xty, yy
+#     per row, X'X, X'y and y'y of the features X and tricks taken y
+#
+#   hands, cards
+#     per row, number of hands and of cards they held
+#
+class Trainer:
+
+  def __init__( self ):
+    numFeatures = len(strength.FEATURES)
+    self.xtx = numpy.zeros((MAX_PLAYERS + 1, numFeatures, numFeatures))
+    self.xty = numpy.zeros((MAX_PLAYERS + 1, numFeatures))
+    self.yy = numpy.zeros(MAX_PLAYERS + 1)
+    self.hands = numpy.zeros(MAX_PLAYERS + 1, numpy.int64)
+    self.cards = numpy.zeros(MAX_PLAYERS + 1, numpy.int64)
+
+  #
+  # add the hands of every player of a game
+  # Parameter:
+  #   gameState - GameState, e.g. read from a log
+  #
+  def addGame( self, gameState ):
+    for hand in gameState.getHands():
+      self.addHand(hand)
+
+  #
+  # add the hand of every player of a HandState (hands not played to the
+  # end are left out)
+  #
+  def addHand( self, hand ):
+    numPlayers = len(hand.getHands())
+    tricks = hand.getTricksMade()
+    if numPlayers > MAX_PLAYERS or min(tricks) < 0:
+      return
+    trump = hand.getTrump()
+    x = numpy.array([ strength.handFeatures(sum([ 1 << card
+                                                  for card in cards ]),
+                                            trump)
+                      for cards in hand.getHands() ], numpy.float64)
+    y = numpy.array(tricks, numpy.float64)
+    for row in (0, numPlayers):
+      self.xtx[row] = self.xtx[row] + x.T.dot(x)
+      self.xty[row] = self.xty[row] + x.T.dot(y)
+      self.yy[row] = self.yy[row] + y.dot(y)
+      self.hands[row] = self.hands[row] + numPlayers
+      self.cards[row] = self.cards[row] + numPlayers*hand.getNumCards()
+
+  #
+  # fit the model to the hands added
+  # Parameter:
+  #   ridge - penalty on the square of the weights
+  # Return value:
+  #   BidModel
+  #
+  def fit( self, ridge = RIDGE ):
+    numFeatures = len(strength.FEATURES)
+    weights = numpy.tile(strength.WEIGHTS, (MAX_PLAYERS + 1, 1))
+    spread = numpy.ones(MAX_PLAYERS + 1)
+    for row in range(MAX_PLAYERS + 1):
+      if not self.hands[row]:
+        continue
+      w = numpy.linalg.solve(self.xtx[row] + ridge*numpy.eye(numFeatures),
+                             self.xty[row])
+      weights[row] = w
+      # sum of the squared residuals from the sums
+      residual = (self.yy[row] - 2*w.dot(self.xty[row])
+                  + w.dot(self.xtx[row]).dot(w))
+      spread[row] = max(residual, 0.0) / self.cards[row]
+    return BidModel(weights, spread, self.hands.copy())
+
+
+#
+# read the games of the logs one at a time
+# Parameters:
+#   paths - XML log files, or directories to read every .xml file under
+#   log   - file to report files that cannot be read to (None for none)
+# Return value:
+#   generator of GameStates
+#
+def readGames( paths, log = sys.stderr ):
+  for path in paths:
+    if os.path.isdir(path):
+      names = []
+      for dirPath, dirNames, fileNames in os.walk(path):
+        dirNames.sort()
+        names.extend([ os.path.join(dirPath, name)
+                       for name in sorted(fileNames)
+                       if name.endswith('.xml') ])
+    else:
+      names = [ path ]
+    for name in names:
+      # a log that parses but is not a game fails in GameState (which
+      # raises strings, a TypeError) or in the handler
+      try:
+        yield GameXMLParser().parse(name)
+      except (IOError, ValueError, TypeError, KeyError, AttributeError,
+              xml.sax.SAXException), e:
+        if log is not None:
+          log.write('Skipping %s: %s\n' % (name, e))
+
+
+###############################################################
+# program code
+###############################################################
+
+def printUsage():
+  print 'Usage: calibrate.py [-o <model file>] [-r <ridge>]'
+  print '                    <xml file or directory> ...'
+  sys.exit(1)
+
+
+if __name__ == '__main__':
+  import getopt
+
+  fileName = 'bids.npz'
+  ridge = RIDGE
+  try:
+    flags, args = getopt.getopt(sys.argv[1:], 'o:r:')
+    for flag, value in flags:
+      if flag == '-o':
+        fileName = value
+      elif flag == '-r':
+        ridge = float(value)
+  except (getopt.GetoptError, ValueError):
+    printUsage()
+  if not args:
+    printUsage()
+
+  trainer = Trainer()
+  numGames = 0
+  for gameState in readGames(args):
+    trainer.addGame(gameState)
+    numGames = numGames + 1
+    if numGames % 100 == 0:
+      sys.stderr.write('\r%d games' % numGames)
+  sys.stderr.write('\r%d games\n' % numGames)
+  model = trainer.fit(ridge)
+  model.save(fileName)
+
+  print 'Fitted %d hands of %d games' % (trainer.hands[0], numGames)
+  print '%-8s %8s %8s  %s' % ('players', 'hands', 'spread',
+                              ' '.join([ '%9s' % name[:9]
+                                         for name in strength.FEATURES ]))
+  for row in range(MAX_PLAYERS + 1):
+    if trainer.hands[row]:
+      print '%-8s %8d %8.3f  %s' % (row or 'all', trainer.hands[row],
+                                    model.spread[row],
+                                    ' '.join([ '%9.3f' % w
+                                               for w in model.weights[row] ]))
+  print 'Wrote', fileName
@@ -0,0 +1,226 @@
+###############################################
+# canonical.py
+# canonical form and 64 bit keys of Oh Hell
+# positions under relabeling of the suits
+###############################################
+#
+# Two positions are equivalent when one turns into the other by
+# renaming suits, as long as the trump suit stays the trump suit.
+# The canonical form puts the trump suit in slot 0 and the other suits
+# in the remaining slots ordered by their 13 bit rank masks (highest
+# first).  Without trump all four suits are ordered.  A position then
+# has at most 24 (no trump) or 6 (trump) equivalent relabelings and
+# they all share one canonical form and one key.
+#
+
+import random
+from card import CARD_SUIT, CARD_RANK
+
+#
+# Zobrist keys for the suit slots, the trump rank, the seat and the bids
+# (a fixed seed so keys are the same in every process)
+#
+_rng = random.Random(0x0DE11)
+SLOT_KEYS = [ [ _rng.getrandbits(64) for mask in range(1 << 13) ]
+              for slot in range(4) ]
+TRUMP_KEYS = [ _rng.getrandbits(64) for rank in range(14) ]
+SEAT_KEYS = [ _rng.getrandbits(64) for seat in range(16) ]
+BID_KEYS = [ [ _rng.getrandbits(64) for bid in range(12) ]
+             for position in range(16) ]
+del _rng
+
+
+#
+# split a hand bit mask into its four 13 bit suit masks
+#
+def suitMasks( hand ):
+  return [ (hand >> (13*suit)) & 0x1fff for suit in range(4) ]
+
+#
+# find the canonical order of the suits
+# Parameters:
+#   suits     - list of the four 13 bit suit masks
+#   trumpSuit - trump suit (-1 for no trump)
+# Return value:
+#   list of original suits in canonical slot order
+#
+def suitOrder( suits, trumpSuit ):
+  others = [ (suits[suit], suit) for suit in range(4) if suit != trumpSuit ]
+  others.sort()
+  others.reverse()
+  order = [ suit for mask, suit in others ]
+  if trumpSuit >= 0:
+    order.insert(0, trumpSuit)
+  return order
+
+#
+# key of a hand from its suit masks and canonical suit order
+#
+def _handKey( suits, order, trumpRank ):
+  key = TRUMP_KEYS[trumpRank + 1]
+  for slot in range(4):
+    key = key ^ SLOT_KEYS[slot][suits[order[slot]]]
+  return key
+
+#
+# key contribution of the seat and the bids made so far
+#
+def _seatKey( seat, bids ):
+  key = SEAT_KEYS[seat]
+  for position in range(len(bids)):
+    key = key ^ BID_KEYS[position][bids[position]]
+  return key
+
+#
+# canonicalize a position
+# Parameters:
+#   hand  - bit mask of cards held
+#   trump - trump card (-1 for no trump)
+#   seat  - seat of player relative to dealer
+#   bids  - list of bids made so far, in bidding order
+# Return value:
+#   ((hand, trump, seat, bids), key) where hand and trump are relabeled
+#   into canonical suits and key is a 64 bit integer
+#
+def canonicalize( hand, trump, seat, bids ):
+  if trump >= 0:
+    trumpSuit = CARD_SUIT[trump]
+    trumpRank = CARD_RANK[trump]
+  else:
+    trumpSuit = trumpRank = -1
+  suits = suitMasks(hand)
+  order = suitOrder(suits, trumpSuit)
+
+  canonHand = 0
+  for slot in range(4):
+    canonHand = canonHand | (suits[order[slot]] << (13*slot))
+  if trump >= 0:
+    canonTrump = trumpRank
+  else:
+    canonTrump = -1
+
+  key = _handKey(suits, order, trumpRank) ^ _seatKey(seat, bids)
+  return (canonHand, canonTrump, seat, tuple(bids)), key
+
+#
+# return only the 64 bit key of a position (see canonicalize)
+#
+def positionKey( hand, trump, seat, bids ):
+  if trump >= 0:
+    trumpSuit = CARD_SUIT[trump]
+    trumpRank = CARD_RANK[trump]
+  else:
+    trumpSuit = trumpRank = -1
+  suits = suitMasks(hand)
+  return (_handKey(suits, suitOrder(suits, trumpSuit), trumpRank)
+          ^ _seatKey(seat, bids))
+
+
+#
+# CanonicalHand class
+# keeps the canonical key of a hand up to date while cards are
+# added and removed, for use inside searches
+#
+# Attributes:
+#   suits
+#     list of the four 13 bit suit masks of the hand
+#
+#   trumpSuit
+#     trump suit (-1 for no trump)
+#
+#   trumpRank
+#     rank of trump card (-1 for no trump)
+#
+#   order
+#     list of original suits in canonical slot order
+#
+#   slots
+#     canonical slot of each original suit (the inverse of order)
+#
+#   key
+#     canonical 64 bit key of the hand
+#
+# Adding or removing a card only changes the key contribution of its
+# suit, and of the suits it passes if its suit moves in the order.
+#
+class CanonicalHand:
+
+  #
+  # constructor
+  # Parameters:
+  #   hand  - bit mask of cards held
+  #   trump - trump card (-1 for no trump)
+  #
+  def __init__( self, hand, trump ):
+    if trump >= 0:
+      self.trumpSuit = CARD_SUIT[trump]
+      self.trumpRank = CARD_RANK[trump]
+    else:
+      self.trumpSuit = self.trumpRank = -1
+    self.suits = suitMasks(hand)
+    self.order = suitOrder(self.suits, self.trumpSuit)
+    self.slots = [0] * 4
+    for slot in range(4):
+      self.slots[self.order[slot]] = slot
+    self.key = _handKey(self.suits, self.order, self.trumpRank)
+
+  #
+  # give a suit a new mask, moving it to its new slot if it is not trump
+  #
+  def _setSuit( self, suit, mask ):
+    suits, order, slots = self.suits, self.order, self.slots
+    slot = slots[suit]
+    key = self.key ^ SLOT_KEYS[slot][suits[suit]]
+    suits[suit] = mask
+    if suit != self.trumpSuit:
+      first = int(self.trumpSuit >= 0)
+      # the suits passed move one slot the other way
+      while slot > first and (suits[order[slot - 1]], order[slot - 1]) < \
+                             (mask, suit):
+        other = order[slot - 1]
+        key = (key ^ SLOT_KEYS[slot - 1][suits[other]]
+               ^ SLOT_KEYS[slot][suits[other]])
+        order[slot] = other
+        slots[other] = slot
+        slot = slot - 1
+      while slot < 3 and (suits[order[slot + 1]], order[slot + 1]) > \
+                         (mask, suit):
+        other = order[slot + 1]
+        key = (key ^ SLOT_KEYS[slot + 1][suits[other]]
+               ^ SLOT_KEYS[slot][suits[other]])
+        order[slot] = other
+        slots[other] = slot
+        slot = slot + 1
+      order[slot] = suit
+      slots[suit] = slot
+    self.key = key ^ SLOT_KEYS[slot][mask]
+
+  def addCard( self, card ):
+    suit = CARD_SUIT[card]
+    self._setSuit(suit, self.suits[suit] | (1 << CARD_RANK[card]))
+
+  def removeCard( self, card ):
+    suit = CARD_SUIT[card]
+    self._setSuit(suit, self.suits[suit] & ~(1 << CARD_RANK[card]))
+
+  #
+  # return the canonical slot of an original suit
+  #
+  def suitSlot( self, suit ):
+    return self.slots[suit]
+
+  #
+  # return key of the hand combined with a seat and bids made so far
+  # (same value as positionKey)
+  #
+  def positionKey( self, seat, bids ):
+    return self.key ^ _seatKey(seat, bids)
+
+  #
+  # return canonical hand bit mask
+  #
+  def canonicalHand( self ):
+    hand = 0
+    for slot in range(4):
+      hand = hand | (self.suits[self.order[slot]] << (13*slot))
+    return hand
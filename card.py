@@ -3,93 +3,275 @@
 ###############################################
 
 import random
+from cardtables import *
 
 
+#
+# Deck class
+# A shuffled deck of cards
+#
+# Attributes:
+#   deck
+#     list of the 52 card indexes in shuffled order
+#
+#   top
+#     position of the next card to be drawn
+#
 class Deck:
-  def __init__(self):
-    self.deck = []
-    cards = range(52)
-
-    for i in range(51):
-      index = random.randrange(len(cards))
-      self.deck.append(cards[index])
-      del cards[index]
-      
-    self.deck.append(cards[0])
-      
-##    # shuffle deck
-##    for i in range(1000):
-##      index = random.randrange(52)
-##      card = self.deck[index]
-##      del self.deck[index]
-##      self.deck = [card] + self.deck
+  #
+  # constructor
+  # Parameters:
+  #   seed - seed used to shuffle the deck (None for a random seed)
+  #   rng  - random.Random instance used to shuffle (overrides seed)
+  #
+  def __init__(self, seed=None, rng=None):
+    if rng is None:
+      rng = random.Random(seed)
+    self.deck = range(52)
+    rng.shuffle(self.deck)
+    self.top = 0
 
   def draw(self):
-    card = self.deck[0]
-    del self.deck[0]
+    card = self.deck[self.top]
+    self.top = self.top + 1
     return card
 
+  #
+  # return number of cards left to draw
+  #
+  def cardsLeft(self):
+    return 52 - self.top
+
+  #
+  # deal a hand to every player, one card at a time round the table
+  # Parameters:
+  #   numPlayers - number of players
+  #   numCards   - number of cards dealt to each player
+  #   startSeat  - index of player who gets the first card
+  # Return value:
+  #   (hands, trump) where hands[i] is the list of cards of player i
+  #   and trump is the next card of the deck (-1 if none are left)
+  #
+  def deal(self, numPlayers, numCards, startSeat):
+    end = self.top + numPlayers*numCards
+    if end > 52:
+      raise ValueError('Not enough cards to deal %d cards to %d players'
+                       % (numCards, numPlayers))
+    hands = [None] * numPlayers
+    for i in range(numPlayers):
+      hands[(startSeat + i) % numPlayers] = \
+          self.deck[self.top + i:end:numPlayers]
+    self.top = end
+    if end < 52:
+      trump = self.draw()
+    else:
+      trump = -1
+    return hands, trump
+
+
+#
+# bit masks for the cards of each suit
+# card index i is stored in bit i, so each suit occupies 13 bits
+#
+SUIT_MASKS = [ 0x1fff << (13*suit) for suit in range(4) ]
+FULL_MASK = (1 << 52) - 1
+
+
+#
+# return bit mask of a single card
+# Parameter:
+#   cardIndex - index of card
+#
+def cardMask( cardIndex ):
+  return 1 << cardIndex
+
+#
+# return number of cards in a bit mask
+#
+def popcount( mask ):
+  return bin(mask).count('1')
+
+#
+# return lowest card in a bit mask (-1 if mask is empty)
+#
+def firstCard( mask ):
+  return (mask & -mask).bit_length() - 1
+
+#
+# return bit mask of the cards that may legally be played
+# Parameters:
+#   hand    - bit mask of cards held by player
+#   ledCard - index of card led in the trick (-1 if player is leading)
+# Return value:
+#   cards of the led suit if player has any, otherwise the whole hand
+#
+def legalMask( hand, ledCard ):
+  if ledCard < 0:
+    return hand
+  follow = hand & SUIT_MASKS[CARD_SUIT[ledCard]]
+  if follow:
+    return follow
+  return hand
+
+#
+# does card beat the card winning the trick so far?
+#
+def beats( card, best, trumpSuit ):
+  if CARD_SUIT[card] == CARD_SUIT[best]:
+    return CARD_RANK[card] > CARD_RANK[best]
+  return CARD_SUIT[card] == trumpSuit
+
+#
+# iterate over the cards of a bit mask in card order
+#
+def iterCards( mask ):
+  while mask:
+    low = mask & -mask
+    yield low.bit_length() - 1
+    mask = mask ^ low
+
 
+#
+# CardList class
+# A set of cards stored as a 52 bit integer mask
+#
+# Attributes:
+#   mask
+#     bit mask of cards in list (bit i set if card i is in list)
+#
 class CardList:
 
-  suit = [ 'Clubs', 'Diamonds', 'Hearts', 'Spades' ]
-  value = [ 'Two', 'Three', 'Four', 'Five', 'Six', 'Seven', 'Eight',
-            'Nine', 'Ten', 'Jack', 'Queen', 'King', 'Ace' ]
+  suit = SUIT_NAMES
+  value = RANK_NAMES
 
-  def __init__(self, init=0):
-    self.cards = []
-    for i in range(52):
-      self.cards.append(init)
+  #
+  # constructor
+  # Parameters:
+  #   init - 1 to start with all 52 cards, 0 for an empty list
+  #   mask - bit mask of cards to start with (overrides init)
+  #
+  def __init__(self, init=0, mask=None):
+    if mask is not None:
+      self.mask = mask
+    elif init:
+      self.mask = FULL_MASK
+    else:
+      self.mask = 0
 
   def hasCard( self, cardIndex ):
-    return self.cards[cardIndex]
+    if cardIndex < 0 or cardIndex >= 52:
+      return 0
+    return (self.mask >> cardIndex) & 1
 
   def addCard( self, cardIndex ):
-    self.cards[cardIndex] = 1
+    self.mask = self.mask | (1 << cardIndex)
 
   def removeCard( self, cardIndex ):
-    self.cards[cardIndex] = 0
+    self.mask = self.mask & ~(1 << cardIndex)
 
   def hasSuit( self, suit ):
-    for i in range(suit*13, suit*13+13):
-      if self.cards[i]:
-        return 1
+    if self.mask & SUIT_MASKS[suit]:
+      return 1
     return 0
 
+#
+# return bit mask of cards of the given suit in list
+#
+  def suitMask( self, suit ):
+    return self.mask & SUIT_MASKS[suit]
+
+#
+# return bit mask of cards that may be played on ledCard (see legalMask)
+#
+  def legalCards( self, ledCard ):
+    return legalMask(self.mask, ledCard)
+
 #
 # return number of cards
 #
   def numCards( self ):
-    cnt = 0
-    
-    for i in range(52):
-      if self.cards[i]:
-        cnt = cnt + 1
-        
-    return cnt
+    return popcount(self.mask)
 
 #
 # return first card found in list
 #
   def getFirstCard( self ):
-    for i in range(52):
-      if self.cards[i]:
-        return i
+    return firstCard(self.mask)
 
-    return -1
+#
+# remove all cards from list
+#
+  def clear( self ):
+    self.mask = 0
 
+#
+# return a new list with the cards of both lists
+#
+  def union( self, other ):
+    return CardList(mask = self.mask | other.mask)
+
+#
+# return a new list with the cards common to both lists
+#
+  def intersection( self, other ):
+    return CardList(mask = self.mask & other.mask)
+
+  __or__ = union
+  __and__ = intersection
+
+  def __len__( self ):
+    return popcount(self.mask)
+
+  def __contains__( self, cardIndex ):
+    return self.hasCard(cardIndex) == 1
+
+  def __iter__( self ):
+    return iterCards(self.mask)
+
+  def __eq__( self, other ):
+    return isinstance(other, CardList) and self.mask == other.mask
+
+  def __ne__( self, other ):
+    return not self.__eq__(other)
+
+  def __repr__( self ):
+    return 'CardList(mask=0x%x)' % self.mask
+
+#
+# card helpers, all lookups in the tables of cardtables.py
+# (cardIndex must be a real card, 0 - 51)
+#
 def cardSuit( cardIndex ):
-  return cardIndex / 13
+  return CARD_SUIT[cardIndex]
 
 def cardValue( cardIndex ):
-  return cardIndex % 13
+  return CARD_RANK[cardIndex]
 
 def cardToString( cardIndex ):
-  return CardList.value[cardValue(cardIndex)] + ' of ' \
-         + CardList.suit[cardSuit(cardIndex)]
+  return CARD_NAME[cardIndex]
+
+#
+# find the winner of a trick
+# Parameters:
+#   cards     - list of (player, card) pairs in the order played
+#   trumpSuit - suit of trump (-1 for no trump)
+# Return value:
+#   player who won the trick
+#
+def trickWinner( cards, trumpSuit ):
+  winner, best = cards[0]
+  bestSuit = CARD_SUIT[best]
+  for player, card in cards[1:]:
+    suit = CARD_SUIT[card]
+    if suit == bestSuit:
+      if card > best:
+        winner, best = player, card
+    elif suit == trumpSuit:
+      winner, best, bestSuit = player, card, suit
+  return winner
 
 
 if __name__ == '__main__':
   deck = Deck()
-  print len(deck.deck)
+  print deck.cardsLeft()
   print deck.deck
@@ -0,0 +1,59 @@
+###############################################
+# cardtables.py
+# precomputed, read-only lookup tables for the
+# 52 card indexes (card = 13*suit + rank)
+###############################################
+
+SUIT_NAMES = ( 'Clubs', 'Diamonds', 'Hearts', 'Spades' )
+RANK_NAMES = ( 'Two', 'Three', 'Four', 'Five', 'Six', 'Seven', 'Eight',
+               'Nine', 'Ten', 'Jack', 'Queen', 'King', 'Ace' )
+
+SUIT_LETTERS = 'CDHS'
+RANK_LETTERS = '23456789TJQKA'
+
+# rank part of the card image file names in images/cards
+IMAGE_RANKS = ( '2', '3', '4', '5', '6', '7', '8', '9', '10',
+                'j', 'q', 'k', 'a' )
+
+#
+# suit of each card (0 - 3)
+#
+CARD_SUIT = tuple([ card // 13 for card in range(52) ])
+
+#
+# rank of each card (0 = Two ... 12 = Ace)
+#
+CARD_RANK = tuple([ card % 13 for card in range(52) ])
+
+#
+# long name of each card, e.g. 'Queen of Hearts'
+#
+CARD_NAME = tuple([ RANK_NAMES[card % 13] + ' of ' + SUIT_NAMES[card // 13]
+                    for card in range(52) ])
+
+#
+# two letter code of each card, e.g. 'QH'
+#
+CARD_CODE = tuple([ RANK_LETTERS[card % 13] + SUIT_LETTERS[card // 13]
+                    for card in range(52) ])
+
+#
+# image file name of each card, e.g. 'hq.png'
+#
+CARD_IMAGE = tuple([ SUIT_LETTERS[card // 13].lower()
+                     + IMAGE_RANKS[card % 13] + '.png'
+                     for card in range(52) ])
+
+#
+# maps a two letter code back to its card index (private, so that
+# nothing can change it; see parseCard)
+#
+_PARSE_CODE = dict([ (CARD_CODE[card], card) for card in range(52) ])
+
+#
+# card index of a two letter code (upper case), e.g. 'QH'
+# Return value:
+#   index of card, -1 if code is not a card
+#
+def parseCard( code ):
+  return _PARSE_CODE.get(code, -1)
@@ -13,6 +13,7 @@ from card import *
 from socket import socket, AF_INET, SOCK_STREAM
 from time import sleep
 import inputbox
+from tracker import CardTracker
 pygame.font.init()
 pygame.mixer.init()
 
@@ -46,6 +47,19 @@ debug = debug.Debug()
 #   log
 #     list of information to be displayed
 #
+#   ledCard
+#     card led in current trick (-1 if no card played yet)
+#
+#   tracker
+#     CardTracker following the cards of the hand
+#
+#   winChances
+#     dict from each card that may be played to its chance of winning the
+#     trick, while asked for a card (empty otherwise)
+#
+#   hintFont
+#     font of the winning chances shown over the cards
+#
 class Client:
 
   #
@@ -61,15 +75,14 @@ class Client:
     self.server = server
     self.port = port
     self.log = []
+    self.hintFont = pygame.font.Font(None,24)
 
   def test_gui(self):
     self.screen = pygame.display.set_mode((1250, 760))
     self.background = imageLoad("background.jpg", 0)
     self.clock = pygame.time.Clock()
-    self.cardImages = []
-    for suit in ['c', 'd', 'h', 's']:
-      for card in [str(i) for i in range(2, 11)] + ['j', 'q', 'k', 'a']:
-        self.cardImages.append(imageLoad(suit+card+'.png', True))
+    self.cardImages = [ imageLoad(CARD_IMAGE[card], True)
+                        for card in range(52) ]
     self.handImage = imageLoad("hand.png", False)
     self.handImage.set_colorkey((0,0,0))
 
@@ -81,6 +94,8 @@ class Client:
     for card in [1,2,3,4,7,8,10]:
       self.cardList.addCard(card)
     self.playedCards = [-1]*10
+    self.tracker = CardTracker(1, 0)
+    self.winChances = {}
     exiting = False
     while not exiting:
       self.gameOver("Sean")
@@ -114,18 +129,19 @@ class Client:
     self.screen = pygame.display.set_mode((1250, 760))
     self.background = imageLoad("background.jpg", 0)
     self.clock = pygame.time.Clock()
-    self.cardImages = []
-    for suit in ['c', 'd', 'h', 's']:
-      for card in [str(i) for i in range(2, 11)] + ['j', 'q', 'k', 'a']:
-        self.cardImages.append(imageLoad(suit+card+'.png', True))
+    self.cardImages = [ imageLoad(CARD_IMAGE[card], True)
+                        for card in range(52) ]
     self.handImage = imageLoad("hand.png", False)
     self.handImage.set_colorkey((0,0,0))
 
     self.trump = -1
+    self.ledCard = -1
     self.cardList = CardList()
     self.playedCards = []
     self.players = [Player(self.name, 0)]
     self.playerIndex = 0
+    self.tracker = CardTracker(1, 0)
+    self.winChances = {}
 
     self.updateDisplay()
     exiting = False
@@ -133,6 +149,7 @@ class Client:
       command = self.readline()
       debug.echo('Read: ' +  command)
       tokens =  string.split(command)
+      self.tracker.notify(*tokens)
       if tokens[0] == 'GAME_OVER':
         winnerNum = int(tokens[1])
         self.addToLog('Player "%s" won!' % self.players[winnerNum].name)
@@ -151,6 +168,7 @@ class Client:
           if tokens[2*i+2] == self.name:
             #Assumes no two players have the same name
             self.playerIndex = i
+        self.tracker = CardTracker(numPlayers, self.playerIndex)
         self.addToLog( 'Game starting with players:' ),
         for player in self.players[:-1]:
           self.addToLog(player.name)
@@ -170,6 +188,7 @@ class Client:
 
       elif tokens[0] == 'DEAL_OVER':
         self.trump = int(tokens[1])
+        self.ledCard = -1
       
       elif tokens[0] == 'BID_ANNOUNCE':
         playerNum = int(tokens[1])
@@ -177,6 +196,10 @@ class Client:
         self.addToLog('Player "%s" bid %s' % (self.players[playerNum].name, bid))
         self.players[playerNum].bid = bid
 
+      elif tokens[0] == 'BID_HINT':
+        self.addToLog('Suggested bid: %s (makes it %s%% of the time)' %
+                      (tokens[1], tokens[int(tokens[1]) + 2]))
+
       elif tokens[0] == 'BID':
         self.getBid()
 
@@ -186,10 +209,14 @@ class Client:
         self.addToLog('"%s" played %s' %(self.players[player].name + " ", 
                                           cardToString(card)))
         self.playedCards[player] = card
+        if self.ledCard < 0:
+          self.ledCard = card
 
       elif tokens[0] == 'GET_CARD':
         print "\a"
+        self.winChances = self.tracker.winChances()
         exiting = self.playCard()
+        self.winChances = {}
 
       elif tokens[0] == 'TRICK_WINNER':
         player = int(tokens[1])
@@ -197,6 +224,7 @@ class Client:
         self.updateDisplay()
         self.players[player].wonTrick()
         self.playedCards = [-1 for i in xrange(len(self.players))]
+        self.ledCard = -1
         pygame.time.delay(400)
 
       elif tokens[0] == 'END_HAND':
@@ -233,9 +261,8 @@ class Client:
     # get valid card choice from user
     #
     fontobject = pygame.font.Font(None,30)
-    cards = [i for i in range(52) if self.cardList.hasCard(i)]
-    cardValue = -1
-    cardSuit = -1
+    cards = list(self.cardList)
+    legal = self.cardList.legalCards(self.ledCard)
     done = 0
     while not done:
       for event in pygame.event.get():
@@ -245,8 +272,11 @@ class Client:
           for i, cardrect in enumerate(self.cardRects):
             coords = pygame.mouse.get_pos()
             if cardrect.collidepoint(coords[0],coords[1]):
-              card = cards[i]
-              done = 1
+              if legal & cardMask(cards[i]):
+                card = cards[i]
+                done = 1
+              else:
+                self.addToLog('You must follow suit!')
       self.updateDisplay()
       self.screen.blit(fontobject.render("Play Card", 1, (0,0,255)), (440,390))
     #
@@ -309,12 +339,17 @@ class Client:
       screen.blit(self.cardImages[self.trump], (30,50))
     
     self.cardRects = []
+    # chance of each card to win the trick, when asked for a card
     if True:
-      cards = [i for i in range(52) if self.cardList.hasCard(i)]
+      cards = list(self.cardList)
       for i, card in enumerate(cards):
         position = (90 + 80/2*(10-len(cards)) + 80*i, 505)
         self.cardRects.append(self.cardImages[card].get_rect(left = 90 + 80/2*(10-len(cards)) + 80*i, top=505))
         screen.blit(self.cardImages[card], position)
+        if card in self.winChances:
+          hint = '%d%%' % round(100*self.winChances[card])
+          screen.blit(self.hintFont.render(hint, 1, (255,255,0)),
+                      (position[0] + 20, 485))
 
   def displayPlayedCards( self, screen ):
     #This assumes that there will be no more than 5
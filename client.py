@@ -32,6 +32,9 @@ debug = debug.Debug()
 #   numTricks
 #     number of tricks for hand
 #
+#   ledCard
+#     card led in current trick (-1 if no card played yet)
+#
 class Client:
 
   #
@@ -107,6 +110,7 @@ class Client:
         
       elif tokens[0] == 'DEAL_OVER':
         self.trump = int(tokens[1])
+        self.ledCard = -1
         self.displayHand()
         
       elif tokens[0] == 'BID_ANNOUNCE':
@@ -115,6 +119,13 @@ class Client:
         print 'Player "%s" bid %s' % (self.players[playerNum].name, bid)
         self.players[playerNum].bid = bid
         
+      elif tokens[0] == 'BID_HINT':
+        bid = int(tokens[1])
+        print 'Suggested bid: %d (' % bid,
+        for tricks in range(len(tokens) - 2):
+          print '%d: %s%%' % (tricks, tokens[tricks + 2]),
+        print ')'
+
       elif tokens[0] == 'BID':
         self.getBid()
         
@@ -123,6 +134,8 @@ class Client:
         card = int(tokens[2])
         print 'Player "%s" played %s' %(self.players[player].name,
                                         cardToString(card))
+        if self.ledCard < 0:
+          self.ledCard = card
         
       elif tokens[0] == 'GET_CARD':
         self.playCard()
@@ -131,6 +144,7 @@ class Client:
         player = int(tokens[1])
         print 'Player "%s" won trick' % self.players[player].name
         self.players[player].wonTrick()
+        self.ledCard = -1
         
       elif tokens[0] == 'END_HAND':
         for i in range(len(self.players)):
@@ -161,19 +175,15 @@ class Client:
     else:
       print 'None'
       
-    cardLetters = '23456789TJQKA'
-    cardValue = 0
-    
     for suit in range(4):
-      print "%8s:" % CardList.suit[suit],
+      print "%8s:" % SUIT_NAMES[suit],
+      suitCards = self.cardList.suitMask(suit) >> (13*suit)
       
       for value in range(13):
-        if self.cardList.hasCard(cardValue):
-          print cardLetters[value],
+        if (suitCards >> value) & 1:
+          print RANK_LETTERS[value],
         else:
           print ' ',
-          
-        cardValue = cardValue + 1
         
       print ''
 
@@ -236,16 +246,12 @@ class Client:
   # play card and send it to server
   #
   def playCard( self ):
-    cardLetters = '23456789TJQKA'
-    suitLetters = 'CDHS'
     self.displayPlayerStats()
     self.displayHand()
 
     #
     # get valid card choice from user
     #
-    cardValue = -1
-    cardSuit = -1
     done = 0
     while not done:
       print 'Play card: ',
@@ -256,21 +262,22 @@ class Client:
           self.displayHand()
         
         else:
-          cardValue = cardLetters.find(cardStr[0])
-          cardSuit = suitLetters.find(cardStr[1])
+          card = parseCard(cardStr)
         
-          if cardValue < 0 or cardSuit < 0:
+          if card < 0:
             print 'Illegal card, try again'
             self.displayHand()
           
+          elif not self.cardList.hasCard(card):
+            print 'You don\'t have that card!'
+            self.displayHand()
+
+          elif not self.cardList.legalCards(self.ledCard) & cardMask(card):
+            print 'You must follow suit!'
+            self.displayHand()
+
           else:
-            card = cardSuit*13 + cardValue
-          
-            if self.cardList.hasCard(card):
-              done = 1
-            else:
-              print 'You don\'t have that card!'
-              self.displayHand()
+            done = 1
       else:
         card = self.cardList.getFirstCard()
         done = 1
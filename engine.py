@@ -0,0 +1,411 @@
+###############################################
+# engine.py
+# Oh Hell game engine, independent of sockets
+#
+# The engine runs the game flow (deal, bids, tricks,
+# scores) against a list of player objects.  Network
+# players (server.Player) and computer players
+# (bots.py) implement the same EnginePlayer interface.
+###############################################
+
+import time
+from card import *
+from GameState import *
+from scoring import handScore
+from seeds import newSeed, handSeed, firstDealer, dealFromSeed
+
+
+def now():
+  return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(time.time()))
+
+#
+# make a list of numbers of tricks for each hand
+# Parameters:
+#   numPlayers - number of players
+#   handNum    - number of the hand to start with (0 = first)
+# Return value:
+#   a list of the number of tricks for each hand
+#
+def makeTrickNums( numPlayers, handNum=0 ):
+  trickNums = []
+
+  for i in range(10,1,-1):
+    trickNums.append(i)
+
+  for i in range(numPlayers):
+    trickNums.append(1)
+
+  for i in range(2,11):
+    trickNums.append(i)
+
+  return trickNums[handNum:]
+
+
+#
+# EnginePlayer class
+# interface of a player taking part in a game run by Engine
+#
+# Attributes:
+#   name
+#     name of player
+#
+class EnginePlayer:
+
+  def __init__( self, name = "" ):
+    self.name = name
+
+  #
+  # called for every game event, with the same names and arguments as
+  # the messages of the network protocol, e.g.
+  #   notify('CARD_PLAYED', playerNum, card)
+  # replies to this player's own bids and cards are 'OK', 'BADBID' and
+  # 'ERROR'
+  #
+  def notify( self, message, *args ):
+    pass
+
+  #
+  # return bid of player
+  # Parameters:
+  #   engine    - the Engine running the game (read only)
+  #   playerNum - index of this player
+  #
+  def getBid( self, engine, playerNum ):
+    raise NotImplementedError
+
+  #
+  # return card to play
+  # Parameters:
+  #   engine    - the Engine running the game (read only)
+  #   playerNum - index of this player
+  #
+  def getCard( self, engine, playerNum ):
+    raise NotImplementedError
+
+
+#
+# Engine class
+# plays games of Oh Hell
+#
+# Attributes:
+#   players
+#     list of players (EnginePlayer instances)
+#
+#   numPlayers
+#     number of players in game
+#
+#   gameState
+#     state of the game, a history of the hands
+#
+#   seed
+#     seed of the game; the first dealer and every deal follow from it
+#     (see seeds.py)
+#
+#   handLog
+#     function called with gameState after each hand (or None)
+#
+#   record
+#     whether finished hands are added to gameState
+#
+#   scores
+#     current scores of the players
+#
+#   trickNums
+#     a list of the num of tricks for each hand to play
+#
+#   firstHand
+#     the number of the hand the game was started (or restarted) with
+#
+#   handNum
+#     the number of the current hand, counted from firstHand
+#
+#   handSeed
+#     the seed the current hand was dealt from
+#
+#   numCards
+#     number of cards dealt in the current hand
+#
+#   dealer
+#     the index of the dealer for the current hand
+#
+#   trump
+#     the trump for the current hand (-1 for no trump)
+#
+#   deals
+#     list of the cards dealt to each player in the current hand
+#
+#   cards
+#     list of the cards (CardList) each player still holds
+#
+#   bids
+#     bids of the players in the current hand (-1 if not made yet)
+#
+#   tricksWon
+#     tricks won by each player in the current hand
+#
+#   trick
+#     list of (player index, card) pairs played to the current trick
+#
+#   plays
+#     list of (player index, card) pairs played so far in the hand
+#
+class Engine:
+
+  #
+  # constructor
+  # Parameters:
+  #   players   - list of players (EnginePlayer instances)
+  #   gameState - history of the game so far (None to start a new game)
+  #   seed      - seed of the game (None to use the seed of gameState,
+  #               or a random one for a new game)
+  #   handLog   - function called with gameState after each hand
+  #   record    - 0 to keep no history of the hands (gameState then
+  #               stays empty, for long simulations)
+  #
+  def __init__( self, players, gameState = None, seed = None,
+                handLog = None, record = 1 ):
+    self.players = players
+    self.numPlayers = len(players)
+    if gameState is None:
+      gameState = GameState()
+      gameState.init_new(self.numPlayers, now())
+    self.gameState = gameState
+    if seed is None:
+      seed = gameState.seed
+    if seed is None:
+      seed = newSeed()
+    self.seed = seed
+    gameState.seed = seed
+    self.handLog = handLog
+    self.record = record
+
+  #
+  # send a message to all players
+  #
+  def broadcast( self, message, *args ):
+    for player in self.players:
+      player.notify(message, *args)
+
+  #
+  # calculate index of next player in sequence
+  #
+  def nextPlayer( self, playerNum ):
+    return (playerNum + 1) % self.numPlayers
+
+  #
+  # plays entire game
+  # Parameters:
+  #   handNum - number of hand to start with (0 = first)
+  #   dealer  - index of initial dealer (-1 to pick randomly)
+  # Return value:
+  #   index of the winner
+  #
+  def playGame( self, handNum = 0, dealer = -1 ):
+    self.startGame(handNum, dealer)
+
+    for i in range(len(self.trickNums)):
+      self.handNum = i
+      self.startHand()
+      self.getBids()
+      self.playHand()
+      self.dealer = self.nextPlayer(self.dealer)
+
+    return self.endGame()
+
+  #
+  # start game
+  # Parameters:
+  #   handNum - number of hand to start with (0 = first)
+  #   dealer  - index of player to start dealing (-1 to pick randomly)
+  #
+  def startGame( self, handNum, dealer ):
+    self.scores = self.gameState.currentScores()
+    args = [ self.numPlayers ]
+    id = 0
+    for player in self.players:
+      args = args + [ player.name, self.scores[id] ]
+      if handNum == 0 and self.record:
+        self.gameState.addPlayer( id, player.name, None)
+      id = id + 1
+    self.broadcast('START_GAME', *args)
+    self.trickNums = makeTrickNums(self.numPlayers, handNum)
+    self.firstHand = handNum
+    self.handNum = 0
+
+    if dealer < 0:
+      self.dealer = firstDealer(self.seed, self.numPlayers)
+    else:
+      self.dealer = dealer
+
+  #
+  # start playing hand
+  # deals the cards and picks trump (if necessary) from the seed of the
+  # hand, so a hand is dealt the same however the game got to it
+  #
+  def startHand( self ):
+    numCards = self.trickNums[self.handNum]
+    seed = handSeed(self.seed, self.firstHand + self.handNum)
+    hands, trump = dealFromSeed(seed, self.numPlayers, numCards, self.dealer)
+    self.dealHand(numCards, hands, trump, seed)
+
+  #
+  # give the players a hand that has already been dealt
+  # Parameters:
+  #   numCards - number of cards dealt to each player
+  #   hands    - list of the cards dealt to each player
+  #   trump    - trump card (-1 for no trump)
+  #   seed     - seed the hand was dealt from (None if not known)
+  #
+  def dealHand( self, numCards, hands, trump, seed = None ):
+    self.numCards = numCards
+    self.handSeed = seed
+    self.broadcast('NEW_HAND', self.numCards, self.dealer)
+    self.deals = hands
+    self.cards = []
+    for i in range(self.numPlayers):
+      cards = CardList()
+      for card in hands[i]:
+        cards.addCard(card)
+        self.players[i].notify('DRAW', card)
+      self.cards.append(cards)
+    self.trump = trump
+    self.bids = [-1] * self.numPlayers
+    self.tricksWon = [0] * self.numPlayers
+    self.trick = []
+    self.plays = []
+    self.broadcast('DEAL_OVER', self.trump)
+
+  #
+  # return the bid the dealer is not allowed to make (the one that
+  # would make the bids add up to the number of tricks), or -1 if
+  # playerNum is not the dealer
+  #
+  def forbiddenBid( self, playerNum ):
+    if playerNum != self.dealer:
+      return -1
+    total = 0
+    for bid in self.bids:
+      if bid >= 0:
+        total = total + bid
+    return self.numCards - total
+
+  #
+  # get bids from players
+  #
+  def getBids( self ):
+    playerNum = self.nextPlayer(self.dealer)
+
+    for i in range(self.numPlayers-1):
+      bid = self.players[playerNum].getBid(self, playerNum)
+      self.bids[playerNum] = bid
+      self.players[playerNum].notify('OK')
+      self.broadcast('BID_ANNOUNCE', playerNum, bid)
+      playerNum = self.nextPlayer(playerNum)
+
+    dealer = self.players[self.dealer]
+    while 1:
+      bid = dealer.getBid(self, self.dealer)
+
+      if bid != self.forbiddenBid(self.dealer):
+        self.bids[self.dealer] = bid
+        dealer.notify('OK')
+        self.broadcast('BID_ANNOUNCE', self.dealer, bid)
+        break
+      else:
+        dealer.notify('BADBID', bid)
+
+  #
+  # play a hand and score it
+  #
+  def playHand( self ):
+    playerNum = self.nextPlayer(self.dealer)
+    for i in range(self.numCards):
+      winnerNum = self.playTrick(playerNum)
+      self.tricksWon[winnerNum] = self.tricksWon[winnerNum] + 1
+      playerNum = winnerNum
+      self.broadcast('TRICK_WINNER', winnerNum)
+
+    if self.record:
+      self.gameState.addHand(self.handState())
+      if self.handLog is not None:
+        self.handLog(self.gameState)
+
+    deltas = []
+    for i in range(self.numPlayers):
+      delta = handScore(self.bids[i], self.tricksWon[i])
+      deltas.append(delta)
+      self.scores[i] = self.scores[i] + delta
+    self.broadcast('END_HAND', *deltas)
+
+  #
+  # play a trick of a hand
+  # Parameter:
+  #   leadPlayerNum - index of player to lead
+  # Return value:
+  #   index of winner
+  #
+  def playTrick( self, leadPlayerNum ):
+    playerNum = leadPlayerNum
+    self.trick = []
+    for i in range(self.numPlayers):
+      if self.trick:
+        card = self.playCard(playerNum, self.trick[0][1])
+      else:
+        card = self.playCard(playerNum, -1)
+      self.broadcast('CARD_PLAYED', playerNum, card)
+      self.trick.append( (playerNum, card) )
+      self.plays.append( (playerNum, card) )
+      playerNum = self.nextPlayer(playerNum)
+    if self.trump >= 0:
+      return trickWinner(self.trick, CARD_SUIT[self.trump])
+    return trickWinner(self.trick, -1)
+
+  #
+  # return a HandState with the history of the current hand
+  #
+  def handState( self ):
+    hand = HandState(self.numPlayers, self.numCards, self.trump, self.dealer,
+                     self.handSeed)
+    for i in range(self.numPlayers):
+      hand.setHand(i, list(self.deals[i]))
+      hand.setBid(i, self.bids[i])
+      hand.setTricksMade(i, self.tricksWon[i])
+    for i in range(0, len(self.plays), self.numPlayers):
+      trick = TrickState()
+      for playerNum, card in self.plays[i:i + self.numPlayers]:
+        trick.addCard(playerNum, card)
+      hand.addTrick(trick)
+    return hand
+
+  #
+  # get a legal card from a player, asking again after an illegal one
+  # Parameters:
+  #   playerNum - index of player to play card
+  #   ledCard   - card led in the trick (-1 if player is leading)
+  # Return value:
+  #   index of card played
+  #
+  def playCard( self, playerNum, ledCard ):
+    player = self.players[playerNum]
+    cards = self.cards[playerNum]
+    while 1:
+      card = player.getCard(self, playerNum)
+      if cards.hasCard(card) and cards.legalCards(ledCard) & cardMask(card):
+        player.notify('OK')
+        cards.removeCard(card)
+        return card
+      player.notify('ERROR', 'Improper card')
+
+  #
+  # ends game
+  # Return value:
+  #   index of the winner
+  #
+  def endGame( self ):
+    winnerNum = 0
+    for i in range(1,self.numPlayers):
+      if self.scores[i] > self.scores[winnerNum]:
+        winnerNum = i
+    # look for ties!
+    self.broadcast('GAME_OVER', winnerNum)
+    return winnerNum
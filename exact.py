@@ -0,0 +1,485 @@
+#!/usr/bin/python
+
+###############################################
+# exact.py
+# exact bid odds and plays of the smallest hands
+#
+# Instead of sampling, every way of dealing the
+# unseen cards to the other players is played out
+# once, weighted by how many real deals it stands
+# for.  Results are cached on disk under the
+# canonical key of the hand (see canonical.py).
+#
+# Only hands with at most MAX_HIDDEN cards held by
+# the other players are covered: every 1 card hand
+# and the 2 card hands of up to 4 players.  The 2
+# card hands of 5 players are left to sampling
+# (see advisor.py): the first bidder's hand alone
+# stands for almost 8,000,000 segment deals (see
+# below), which take minutes just to list.
+#
+# AdvisorPlayer (see bots.py) bids with these
+# results and plays the cards of bestCard.
+###############################################
+#
+# Only the order of the cards in play matters to the play, so the unseen
+# cards of a suit fall into segments: the runs of cards between the
+# player's own cards.  Two deals that only differ by which cards of the
+# same segments the other players hold play out the same way, so each
+# segment is dealt from its lowest cards and the deal is weighted by the
+# number of ways of choosing that many cards of each segment.  When some
+# player still has to bid, the segments are also split where quickBid
+# (see ismcts.py) starts counting a card, so the guessed bids are the
+# same for every deal a segment deal stands for.
+#
+# The other players bid as in ismcts.Observation.guessBids and play
+# advisor.policyCard, so the odds are exact against those fixed policies,
+# not against players who adapt.  With 2 cards the player picks, for every
+# bid and every way the first trick can start before their turn, the card
+# that makes the bid most often against them; the second card is forced.
+# That is the best first card for this model of the other players, not a
+# game theoretic optimum.
+#
+
+import sys, shelve, itertools
+from card import *
+from canonical import canonicalize, suitMasks, suitOrder
+from position import Position
+from ismcts import quickBid
+from advisor import Advice, playOut
+from scoring import handScore
+
+#
+# most cards dealt to each player of a hand solved exactly (the model
+# only picks the first card, see above)
+#
+MAX_CARDS = 2
+
+#
+# most cards of the other players a hand is solved exactly with: every 1
+# card hand of a game (the schedule allows 5 players at most) and the 2
+# card hands of up to 4 players, those of 4 players in 2 to 20 seconds
+# (the first bidders' the slowest) before they are cached
+#
+MAX_HIDDEN = 6
+
+
+#
+# binomial coefficient
+#
+def choose( n, k ):
+  if k < 0 or k > n:
+    return 0
+  result = 1
+  for i in range(k):
+    result = result * (n - i) / (i + 1)
+  return result
+
+#
+# unseen cards grouped in segments
+# Parameters:
+#   hand      - bit mask of the cards of player
+#   trump     - trump card (-1 for no trump)
+#   splitBids - 1 to also split where quickBid starts counting
+# Return value:
+#   list of segments, each a list of cards from low to high
+#
+def segments( hand, trump, splitBids ):
+  if trump >= 0:
+    trumpSuit = CARD_SUIT[trump]
+    unseen = FULL_MASK & ~hand & ~(1 << trump)
+  else:
+    trumpSuit = -1
+    unseen = FULL_MASK & ~hand
+  segs = []
+  for suit in range(4):
+    if suit == trumpSuit:
+      split = 9
+    else:
+      split = 12
+    current = []
+    counted = 0
+    for card in iterCards((unseen | hand) & SUIT_MASKS[suit]):
+      if splitBids and not counted and CARD_RANK[card] >= split:
+        counted = 1
+        if current:
+          segs.append(current)
+        current = []
+      if hand & (1 << card):
+        if current:
+          segs.append(current)
+        current = []
+      else:
+        current.append(card)
+    if current:
+      segs.append(current)
+  return segs
+
+#
+# distinct orders of a list of labels
+#
+def _arrangements( labels ):
+  if not labels:
+    yield ()
+    return
+  for label in sorted(set(labels)):
+    rest = list(labels)
+    rest.remove(label)
+    for arrangement in _arrangements(rest):
+      yield (label,) + arrangement
+
+#
+# every segment deal of the unseen cards
+# Parameters:
+#   segs     - segments of unseen cards
+#   players  - indexes of the other players
+#   numCards - number of cards dealt to each player
+# Return value:
+#   generator of (hands, weight) with hands a dict from player to bit
+#   mask of cards
+#
+def segmentDeals( segs, players, numCards ):
+  picks = list(itertools.combinations_with_replacement(range(len(segs)),
+                                                       numCards))
+  counts = [0] * len(segs)
+  owners = [ [] for seg in segs ]
+
+  def deal( i ):
+    if i == len(players):
+      weight = 1
+      used = []
+      for seg in range(len(segs)):
+        if counts[seg]:
+          weight = weight * choose(len(segs[seg]), counts[seg])
+          used.append(seg)
+      for orders in itertools.product(*[ list(_arrangements(owners[seg]))
+                                         for seg in used ]):
+        hands = dict([ (player, 0) for player in players ])
+        for seg, order in zip(used, orders):
+          for rank in range(len(order)):
+            hands[order[rank]] = hands[order[rank]] | (1 << segs[seg][rank])
+        yield hands, weight
+      return
+    for pick in picks:
+      for seg in pick:
+        counts[seg] = counts[seg] + 1
+        owners[seg].append(players[i])
+      if max([ counts[seg] - len(segs[seg]) for seg in pick ]) <= 0:
+        for result in deal(i + 1):
+          yield result
+      for seg in pick:
+        counts[seg] = counts[seg] - 1
+        owners[seg].remove(players[i])
+
+  return deal(0)
+
+#
+# signature of the cards played to the first trick before the player, the
+# same for every deal a segment deal stands for
+# Parameters:
+#   cards - cards played so far in the trick
+#   segs  - segments of unseen cards
+#
+def trickSignature( cards, segs ):
+  segOf = {}
+  for seg in range(len(segs)):
+    for card in segs[seg]:
+      segOf[card] = seg
+  signature = []
+  for card in cards:
+    seg = segOf[card]
+    below = len([ other for other in cards
+                  if segOf[other] == seg and other < card ])
+    signature.append( (seg, below) )
+  return tuple(signature)
+
+
+#
+# solve a hand (usually in canonical form)
+# Parameters:
+#   numPlayers - number of players
+#   hand       - bit mask of the cards of player
+#   trump      - trump card (-1 for no trump)
+#   seat       - place of player in the bidding order (the dealer is
+#                numPlayers - 1, so player numbers are seats)
+#   bids       - bids made so far, in bidding order
+# Return value:
+#   (tricks, plays) where tricks[bid][k] is the number of deals in which
+#   the player takes k tricks after bidding bid and playing the best
+#   first card, and plays[bid] is a dict from the signature of the first
+#   trick before the player to that best card
+#
+def solve( numPlayers, hand, trump, seat, bids ):
+  segs = segments(hand, trump, seat < numPlayers - 1)
+  others = [ player for player in range(numPlayers) if player != seat ]
+  deals = segmentDeals(segs, others, popcount(hand))
+  return bestPlays(outcomes(numPlayers, hand, trump, seat, bids, segs,
+                            deals), popcount(hand))
+
+#
+# play out deals for every first card of a player
+# Parameters:
+#   numPlayers, hand, trump, seat, bids - as for solve
+#   segs  - segments of unseen cards
+#   deals - iterable of (hands, weight) as segmentDeals generates them
+# Return value:
+#   dict where outcomes[signature][card][k] is the weight of the deals in
+#   which the first trick starts with signature (see trickSignature)
+#   before the player, and playing card first takes k tricks
+#
+def outcomes( numPlayers, hand, trump, seat, bids, segs, deals ):
+  numCards = popcount(hand)
+  dealer = numPlayers - 1
+  outcomes = {}
+  signatures = {}
+  for hands, weight in deals:
+    dealt = [ hands.get(player, hand) for player in range(numPlayers) ]
+    # others play the same whatever the bid of player, so any bid will
+    # do for the playout
+    guessed = list(bids) + [0] * (numPlayers - len(bids))
+    for player in range(seat + 1, numPlayers):
+      guessed[player] = quickBid(dealt[player], trump)
+    # the trick before player is the same whatever card player picks
+    start = playOut(Position(dealt, trump, dealer, guessed), seat)
+    prefix = tuple([ card for player, card in start.trick ])
+    signature = signatures.get(prefix)
+    if signature is None:
+      signature = trickSignature(prefix, segs)
+      signatures[prefix] = signature
+    byCard = outcomes.setdefault(signature, {})
+    for first in iterCards(start.legalMoves()):
+      position = start.clone()
+      position.play(first)
+      tricks = playOut(position).tricksWon[seat]
+      counts = byCard.setdefault(first, [0] * (numCards + 1))
+      counts[tricks] = counts[tricks] + weight
+  return outcomes
+
+#
+# the first card that makes each bid most often
+# Parameters:
+#   outcomes - as returned by the function outcomes
+#   numCards - number of cards dealt to each player
+# Return value:
+#   (tricks, plays) as returned by solve
+#
+def bestPlays( outcomes, numCards ):
+  tricks = []
+  plays = []
+  for bid in range(numCards + 1):
+    total = [0] * (numCards + 1)
+    best = {}
+    for signature, byCard in outcomes.items():
+      card = max(sorted(byCard), key = lambda card: byCard[card][bid])
+      for k in range(numCards + 1):
+        total[k] = total[k] + byCard[card][k]
+      # a single card needs no advice
+      if numCards > 1:
+        best[signature] = card
+    tricks.append(total)
+    plays.append(best)
+  return tricks, plays
+
+#
+# can a hand be solved exactly?
+# Parameters:
+#   numPlayers - number of players
+#   numCards   - number of cards dealt to each player
+#
+def covers( numPlayers, numCards ):
+  return numCards <= MAX_CARDS and (numPlayers - 1)*numCards <= MAX_HIDDEN
+
+#
+# ExactSolver class
+# exact results of the hands small enough (see covers), kept in memory
+# and optionally in a file
+#
+# Attributes:
+#   results
+#     dict (or shelf) from '<players>:<canonical key>' to the value
+#     returned by solve
+#
+class ExactSolver:
+
+  #
+  # constructor
+  # Parameter:
+  #   fileName - file to keep results in across runs (None to keep them
+  #              in memory only)
+  #
+  def __init__( self, fileName = None ):
+    if fileName is None:
+      self.results = {}
+    else:
+      self.results = shelve.open(fileName, protocol = 2)
+
+  #
+  # canonical form of a hand and its results
+  # Return value:
+  #   (canonical hand, canonical trump, value returned by solve), None if
+  #   the hand is too big to solve
+  #
+  def _lookup( self, numPlayers, hand, trump, seat, bids ):
+    if not covers(numPlayers, popcount(hand)):
+      return None
+    # the other players only play differently for a bid of 0 or not (the
+    # last card is forced), so higher bids share results
+    bids = [ min(bid, 1) for bid in bids ]
+    (canonHand, canonTrump, seat, bids), key = \
+                canonicalize(hand, trump, seat, bids)
+    name = '%d:%016x' % (numPlayers, key)
+    result = self.results.get(name)
+    if result is None:
+      result = solve(numPlayers, canonHand, canonTrump, seat, bids)
+      self.results[name] = result
+    return canonHand, canonTrump, result
+
+  #
+  # exact distributions of the tricks taken by a hand
+  # Parameters:
+  #   numPlayers - number of players
+  #   hand       - bit mask of the cards of player
+  #   trump      - trump card (-1 for no trump)
+  #   seat       - place of player in the bidding order (the dealer is
+  #                numPlayers - 1)
+  #   bids       - bids made so far, in bidding order
+  # Return value:
+  #   list with, for every bid, the chances of taking 0..numCards tricks,
+  #   None if the hand is too big to solve
+  #
+  def distributions( self, numPlayers, hand, trump, seat, bids ):
+    found = self._lookup(numPlayers, hand, trump, seat, bids)
+    if found is None:
+      return None
+    canonHand, canonTrump, (tricks, plays) = found
+    total = float(sum(tricks[0]))
+    return [ [ count / total for count in counts ] for counts in tricks ]
+
+  #
+  # recommend a bid
+  # Parameters:
+  #   as for distributions
+  # Return value:
+  #   Advice (see advisor.py), None if the hand is too big to solve
+  #
+  def advise( self, numPlayers, hand, trump, seat, bids ):
+    chances = self.distributions(numPlayers, hand, trump, seat, bids)
+    if chances is None:
+      return None
+    numCards = len(chances) - 1
+    forbidden = -1
+    if seat == numPlayers - 1:
+      forbidden = numCards - sum(bids)
+    made = [ chances[bid][bid] for bid in range(numCards + 1) ]
+    expected = [None] * (numCards + 1)
+    best = None
+    for bid in range(numCards + 1):
+      if bid == forbidden:
+        continue
+      expected[bid] = sum([ chances[bid][k] * handScore(bid, k)
+                            for k in range(numCards + 1) ])
+      if best is None or expected[bid] > expected[best]:
+        best = bid
+    return Advice(best, made, expected)
+
+  #
+  # card to play that makes the bid most often against policyCard players
+  # Parameters:
+  #   numPlayers, hand, trump, seat, bids - as for distributions, with
+  #                                         hand the cards dealt
+  #   bid   - bid of player
+  #   trick - list of the cards played so far in the current trick
+  #   held  - bit mask of the cards player still holds
+  # Return value:
+  #   card to play, None if the hand is too big to solve
+  #
+  def bestCard( self, numPlayers, hand, trump, seat, bids, bid, trick,
+                held ):
+    if trick:
+      legal = legalMask(held, trick[0])
+    else:
+      legal = held
+    if popcount(legal) == 1:
+      return firstCard(legal)
+    found = self._lookup(numPlayers, hand, trump, seat, bids)
+    if found is None:
+      return None
+    canonHand, canonTrump, (tricks, plays) = found
+
+    # relabel the trick into the canonical suits
+    if trump >= 0:
+      trumpSuit = CARD_SUIT[trump]
+    else:
+      trumpSuit = -1
+    order = suitOrder(suitMasks(hand), trumpSuit)
+    canonical = lambda card: 13*order.index(CARD_SUIT[card]) + CARD_RANK[card]
+    segs = segments(canonHand, canonTrump, seat < numPlayers - 1)
+    signature = trickSignature(map(canonical, trick), segs)
+    card = plays[bid].get(signature)
+    if card is None:
+      # a trick the other players would not have played; any legal card
+      return firstCard(legal)
+    return 13*order[CARD_SUIT[card]] + CARD_RANK[card]
+
+  def close( self ):
+    if hasattr(self.results, 'close'):
+      self.results.close()
+
+
+###############################################################
+# program code
+###############################################################
+
+def printUsage():
+  print 'Usage: exact.py -n <num_players> [-k <cards>] [-o <file>]'
+  sys.exit(1)
+
+
+if __name__ == '__main__':
+  import getopt, time
+
+  numPlayers = 0
+  maxCards = 1
+  fileName = None
+  try:
+    flags, args = getopt.getopt(sys.argv[1:], 'n:k:o:')
+    for flag, value in flags:
+      if flag == '-n':
+        numPlayers = int(value)
+      elif flag == '-k':
+        maxCards = int(value)
+      elif flag == '-o':
+        fileName = value
+  except (getopt.GetoptError, ValueError):
+    printUsage()
+  if numPlayers < 2 or maxCards < 1 or not covers(numPlayers, maxCards):
+    printUsage()
+  if fileName is None:
+    fileName = 'exact-%dp.db' % numPlayers
+
+  # solve every canonical hand with every history of bids before it
+  solver = ExactSolver(fileName)
+  start = time.time()
+  count = 0
+  for numCards in range(1, maxCards + 1):
+    for trumpRank in range(13):
+      trump = trumpRank
+      hands = {}
+      for cards in itertools.combinations(range(52), numCards):
+        if trump in cards:
+          continue
+        hand = 0
+        for card in cards:
+          hand = hand | (1 << card)
+        (canonHand, canonTrump, s, b), key = canonicalize(hand, trump, 0, [])
+        hands[canonHand] = 1
+      for hand in sorted(hands):
+        for seat in range(numPlayers):
+          # every bid above 1 has the results of 1 (see _lookup)
+          for bids in itertools.product(range(2), repeat = seat):
+            solver.advise(numPlayers, hand, trump, seat, list(bids))
+            count = count + 1
+      sys.stderr.write('%d cards, trump rank %d: %d hands  %.1f s\n'
+                       % (numCards, trumpRank, count, time.time() - start))
+  solver.close()
+  print 'Solved', count, 'positions into', fileName
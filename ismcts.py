@@ -0,0 +1,351 @@
+###############################################
+# ismcts.py
+# information set Monte Carlo tree search for
+# bids and card play
+#
+# Each iteration deals the unseen cards at random
+# (consistent with the suits players have shown
+# out of, see tracker.py), walks a tree shared
+# by all those deals and plays the rest of the
+# hand out at random on a Position.  The bid or
+# card tried most often in the time allowed is
+# chosen.
+###############################################
+
+import math, time, random
+from card import *
+from position import Position
+from scoring import handScore
+from tracker import CardTracker
+
+#
+# exploration constant of the tree policy
+#
+EXPLORATION = 0.7
+
+#
+# tree policy value of a child never visited
+#
+UNVISITED = 1e9
+
+#
+# part of the time budget kept for collecting the results of worker
+# processes
+#
+POOL_MARGIN = 0.1
+
+
+#
+# Observation class
+# what one player knows about the current hand
+#
+# Attributes:
+#   numPlayers
+#     number of players
+#
+#   numCards
+#     number of cards dealt to each player
+#
+#   dealer
+#     index of dealer
+#
+#   trump
+#     trump card (-1 for no trump)
+#
+#   player
+#     index of the observing player
+#
+#   hand
+#     bit mask of the cards the player still holds
+#
+#   bids
+#     bids made so far (-1 for players still to bid)
+#
+#   plays
+#     list of (player, card) pairs played so far in the hand
+#
+#   tracker
+#     CardTracker of the player after those plays
+#
+class Observation:
+
+  def __init__( self, numPlayers, numCards, dealer, trump, player, hand,
+                bids, plays ):
+    self.numPlayers = numPlayers
+    self.numCards = numCards
+    self.dealer = dealer
+    self.trump = trump
+    self.player = player
+    self.hand = hand
+    self.bids = list(bids)
+    self.plays = list(plays)
+
+    self.tracker = CardTracker(numPlayers, player)
+    self.tracker.newHand(numCards, dealer)
+    for card in iterCards(hand):
+      self.tracker.draw(card)
+    for p, card in plays:
+      if p == player:
+        self.tracker.draw(card)
+    self.tracker.dealOver(trump)
+    for p, card in plays:
+      self.tracker.cardPlayed(p, card)
+
+  #
+  # return the suits each player is known to hold no cards of, as a list
+  # of 4 bit masks (bit s set for suit s)
+  #
+  def voids( self ):
+    return list(self.tracker.voids)
+
+  #
+  # return bit mask of the cards the player has not seen
+  #
+  def unseen( self ):
+    return self.tracker.out
+
+  #
+  # deal the unseen cards to the other players at random (see
+  # CardTracker.sampleDeal)
+  # Parameter:
+  #   rng - random.Random instance
+  # Return value:
+  #   list of bit masks of the cards each player holds now
+  #
+  def determinize( self, rng ):
+    return self.tracker.sampleDeal(rng)
+
+  #
+  # build the Position of a deal of the hidden cards
+  # Parameters:
+  #   hands - bit masks of the cards each player holds now
+  #   bids  - bids of all players
+  #
+  def position( self, hands, bids ):
+    deals = list(hands)
+    for player, card in self.plays:
+      deals[player] = deals[player] | (1 << card)
+    position = Position(deals, self.trump, self.dealer, bids)
+    for player, card in self.plays:
+      position.play(card)
+    return position
+
+  #
+  # return bit mask of the cards the player may play now
+  #
+  def legalCards( self ):
+    played = len(self.plays) % self.numPlayers
+    if played:
+      return legalMask(self.hand, self.plays[-played][1])
+    return self.hand
+
+  #
+  # return the bids the player may make
+  #
+  def legalBids( self ):
+    forbidden = -1
+    if self.player == self.dealer:
+      forbidden = self.numCards - sum([ bid for bid in self.bids
+                                        if bid >= 0 ])
+    return [ bid for bid in range(self.numCards + 1) if bid != forbidden ]
+
+  #
+  # guess the bids of the players still to bid from their cards
+  # Parameter:
+  #   hands - bit masks of the cards of every player
+  #
+  def guessBids( self, hands ):
+    bids = list(self.bids)
+    for player in range(self.numPlayers):
+      if bids[player] < 0 and player != self.player:
+        bids[player] = quickBid(hands[player], self.trump)
+    return bids
+
+
+#
+# rough bid of a hand: its aces and the trumps of jack and higher
+#
+def quickBid( hand, trump ):
+  bid = 0
+  for card in iterCards(hand):
+    if trump >= 0 and CARD_SUIT[card] == CARD_SUIT[trump]:
+      if CARD_RANK[card] >= 9:
+        bid = bid + 1
+    elif CARD_RANK[card] == 12:
+      bid = bid + 1
+  return bid
+
+
+#
+# Node class
+# node of the search tree
+#
+# Attributes:
+#   move
+#     card played (or bid made) to reach node
+#
+#   player
+#     player who made move
+#
+#   children
+#     dict from move to child Node
+#
+#   visits
+#     number of iterations through node
+#
+#   reward
+#     total reward of player over those iterations
+#
+#   avail
+#     number of iterations in which move was legal at the parent
+#
+class Node:
+
+  def __init__( self, move = -1, player = -1 ):
+    self.move = move
+    self.player = player
+    self.children = {}
+    self.visits = 0
+    self.reward = 0.0
+    self.avail = 1
+
+  #
+  # pick the child to follow among the legal moves (all of which have
+  # a child), children never visited first
+  #
+  def select( self, moves ):
+    best = None
+    bestValue = None
+    for move in moves:
+      child = self.children[move]
+      child.avail = child.avail + 1
+      if child.visits:
+        value = (child.reward / child.visits
+                 + EXPLORATION * math.sqrt(math.log(child.avail) /
+                                           child.visits))
+      else:
+        value = UNVISITED
+      if bestValue is None or value > bestValue:
+        best = child
+        bestValue = value
+    return best
+
+
+#
+# reward of every player for a finished hand: the hand score over the
+# most a player can score, so rewards are at most 1
+#
+def rewards( position ):
+  top = float(10 + position.numCards*position.numCards)
+  return [ handScore(position.bids[player], position.tricksWon[player]) / top
+           for player in range(position.numPlayers) ]
+
+#
+# play one iteration from a position
+# Parameters:
+#   node     - root of the card play tree
+#   position - Position (changed)
+#   rng      - random.Random instance
+# Return value:
+#   list of the nodes visited
+#
+def iterate( node, position, rng ):
+  path = [ node ]
+  while not position.isOver():
+    moves = list(iterCards(position.legalMoves()))
+    untried = [ move for move in moves if move not in node.children ]
+    if untried:
+      move = untried[rng.randrange(len(untried))]
+      child = Node(move, position.toMove)
+      node.children[move] = child
+      position.play(move)
+      path.append(child)
+      break
+    node = node.select(moves)
+    position.play(node.move)
+    path.append(node)
+
+  # random playout
+  while not position.isOver():
+    moves = list(iterCards(position.legalMoves()))
+    position.play(moves[rng.randrange(len(moves))])
+  return path
+
+#
+# update the nodes visited by an iteration
+#
+def backup( path, values ):
+  for node in path:
+    node.visits = node.visits + 1
+    if node.player >= 0:
+      node.reward = node.reward + values[node.player]
+
+#
+# search for the best move of the observing player
+# Parameters:
+#   observation - Observation of player
+#   deadline    - time.time() to stop searching at
+#   rng         - random.Random instance
+#   bidding     - 1 to search for a bid, 0 for a card
+# Return value:
+#   dict from move (bid or card) to (visits, total reward), possibly
+#   empty if the deadline has already passed
+#
+def search( observation, deadline, rng, bidding ):
+  root = Node()
+  player = observation.player
+  if bidding:
+    bids = observation.legalBids()
+    for bid in bids:
+      root.children[bid] = Node(bid, player)
+
+  # stop when another iteration as long as the last one would overrun
+  now = time.time()
+  last = 0.0
+  while now + last < deadline:
+    hands = observation.determinize(rng)
+    if bidding:
+      guessed = observation.guessBids(hands)
+      node = root.select(bids)
+      guessed[player] = node.move
+      position = observation.position(hands, guessed)
+      path = [ root ] + iterate(node, position, rng)
+    else:
+      position = observation.position(hands, observation.bids)
+      path = iterate(root, position, rng)
+    backup(path, rewards(position))
+    last = time.time() - now
+    now = now + last
+
+  stats = {}
+  for move, child in root.children.items():
+    if child.visits:
+      stats[move] = (child.visits, child.reward)
+  return stats
+
+#
+# pick the most visited move of merged search results
+# Parameters:
+#   results - list of dicts returned by search
+# Return value:
+#   move, None if no move was visited
+#
+def bestMove( results ):
+  visits = {}
+  for stats in results:
+    for move, (count, reward) in stats.items():
+      visits[move] = visits.get(move, 0) + count
+  best = None
+  for move, count in visits.items():
+    if best is None or count > visits[best]:
+      best = move
+  return best
+
+#
+# run a search in a worker process
+# Parameter:
+#   job - (observation, deadline, seed, bidding) tuple
+#
+def searchJob( job ):
+  observation, deadline, seed, bidding = job
+  return search(observation, deadline, random.Random(seed), bidding)
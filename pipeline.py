@@ -0,0 +1,375 @@
+#!/usr/bin/python
+
+###############################################
+# pipeline.py
+# streaming simulation pipeline
+#
+#   deal -> play -> score -> aggregate -> sink
+#
+# Every stage is a generator of hand records, so a
+# run only ever holds one hand in memory whatever
+# the number of games.
+###############################################
+#
+# Records are plain tuples.  A deal record is
+#
+#   (game, handNum, numCards, dealer, trump, hands, seed)
+#
+# with hands a tuple of card bit masks, one per player, and seed the hand
+# seed the cards were dealt from (see seeds.py).  The play stage
+# adds three fields and the score stage one more:
+#
+#   (game, handNum, numCards, dealer, trump, hands, seed,
+#    bids, plays, tricks, deltas)
+#
+# where bids, tricks and deltas are tuples with one value per player and
+# plays is the tuple of cards in the order they were played (who played
+# them follows from the dealer and the trick winners).
+#
+
+import sys, struct, random
+import bots
+from card import *
+from engine import Engine, makeTrickNums
+from GameState import HandState, TrickState, GameState
+from scoring import handScores
+import seeds
+
+#
+# field indexes of a record
+#
+GAME, HAND_NUM, NUM_CARDS, DEALER, TRUMP, HANDS, SEED, BIDS, PLAYS, \
+      TRICKS, DELTAS = range(11)
+
+
+#
+# deal stage: deal the hands of many games
+# Parameters:
+#   numGames   - number of games
+#   numPlayers - number of players per game
+#   seed       - seed of the run (None for random deals); game n is
+#                dealt from the game seed deriveSeed(seed, n)
+# Return value:
+#   generator of deal records
+#
+def deal( numGames, numPlayers, seed = None ):
+  if seed is None:
+    seed = seeds.newSeed()
+  trickNums = makeTrickNums(numPlayers)
+  for game in xrange(numGames):
+    gameSeed = seeds.deriveSeed(seed, game)
+    dealer = seeds.firstDealer(gameSeed, numPlayers)
+    for handNum in range(len(trickNums)):
+      numCards = trickNums[handNum]
+      handSeed = seeds.handSeed(gameSeed, handNum)
+      hands, trump = seeds.dealFromSeed(handSeed, numPlayers, numCards,
+                                        dealer)
+      masks = []
+      for cards in hands:
+        mask = 0
+        for card in cards:
+          mask = mask | (1 << card)
+        masks.append(mask)
+      yield (game, handNum, numCards, dealer, trump, tuple(masks), handSeed)
+      dealer = (dealer + 1) % numPlayers
+
+#
+# play stage: play dealt hands with bots
+# Parameters:
+#   records  - deal records
+#   botNames - bot class name (from bots.py) for each seat
+#   seed     - seed of the bots (None for random play)
+# Return value:
+#   generator of records with bids, plays and tricks added
+#
+def play( records, botNames, seed = None ):
+  rng = random.Random(seed)
+  lastGame = None
+  for record in records:
+    game, handNum, numCards, dealer, trump, hands, handSeed = record[:BIDS]
+    if game != lastGame:
+      players = [ getattr(bots, botNames[seat])('seat%d' % seat, rng)
+                  for seat in range(len(botNames)) ]
+      engine = Engine(players, record = 0)
+      engine.startGame(handNum, dealer)
+      lastGame = game
+    engine.handNum = handNum
+    engine.dealer = dealer
+    engine.dealHand(numCards, [ list(iterCards(mask)) for mask in hands ],
+                    trump, handSeed)
+    engine.getBids()
+    engine.playHand()
+    yield record[:BIDS] + (tuple(engine.bids),
+                           tuple([ card for player, card in engine.plays ]),
+                           tuple(engine.tricksWon))
+
+#
+# score stage: add the change in score of each player
+#
+def score( records ):
+  for record in records:
+    yield record + (tuple(handScores(record[BIDS], record[TRICKS])),)
+
+
+#
+# Summary class
+# running totals over all records passed through aggregate()
+#
+# Attributes:
+#   numHands
+#     number of hands seen
+#
+#   numGames
+#     number of games seen
+#
+#   totals
+#     total score of each seat over all games
+#
+#   made
+#     number of hands in which each seat made its bid
+#
+class Summary:
+
+  def __init__( self, numPlayers ):
+    self.numHands = 0
+    self.numGames = 0
+    self.totals = [0] * numPlayers
+    self.made = [0] * numPlayers
+    self.lastGame = None
+
+  def add( self, record ):
+    if record[GAME] != self.lastGame:
+      self.numGames = self.numGames + 1
+      self.lastGame = record[GAME]
+    self.numHands = self.numHands + 1
+    for seat in range(len(self.totals)):
+      self.totals[seat] = self.totals[seat] + record[DELTAS][seat]
+      if record[BIDS][seat] == record[TRICKS][seat]:
+        self.made[seat] = self.made[seat] + 1
+
+  #
+  # return the average score of each seat per game (0 before any game)
+  #
+  def averageScores( self ):
+    return [ float(total) / max(self.numGames, 1) for total in self.totals ]
+
+  #
+  # return the fraction of hands in which each seat made its bid
+  #
+  def madeRates( self ):
+    return [ float(made) / max(self.numHands, 1) for made in self.made ]
+
+#
+# aggregate stage: add every record to a summary and pass it on
+#
+def aggregate( records, summary ):
+  for record in records:
+    summary.add(record)
+    yield record
+
+
+#
+# rebuild the HandState of a played record (for writing XML)
+#
+def recordToHandState( record ):
+  numPlayers = len(record[HANDS])
+  trump = record[TRUMP]
+  if trump >= 0:
+    trumpSuit = CARD_SUIT[trump]
+  else:
+    trumpSuit = -1
+  hand = HandState(numPlayers, record[NUM_CARDS], trump, record[DEALER],
+                   record[SEED])
+  for player in range(numPlayers):
+    hand.setHand(player, list(iterCards(record[HANDS][player])))
+    hand.setBid(player, record[BIDS][player])
+    hand.setTricksMade(player, record[TRICKS][player])
+
+  leader = (record[DEALER] + 1) % numPlayers
+  plays = record[PLAYS]
+  for i in range(0, len(plays), numPlayers):
+    trick = TrickState()
+    for k in range(numPlayers):
+      trick.addCard((leader + k) % numPlayers, plays[i + k])
+    hand.addTrick(trick)
+    leader = trickWinner(trick.getCards(), trumpSuit)
+  return hand
+
+
+#
+# XMLSink class
+# writes every game to its own file in the server's XML log format
+#
+# Attributes:
+#   pattern
+#     file name pattern with one %d for the game number
+#
+class XMLSink:
+
+  def __init__( self, pattern = 'sim-%06d-game.xml', time = '' ):
+    self.pattern = pattern
+    self.time = time
+    self.file = None
+    self.game = None
+
+  def write( self, record ):
+    if record[GAME] != self.game:
+      self.close()
+      self.game = record[GAME]
+      self.file = open(self.pattern % self.game, 'w')
+      gameState = GameState()
+      gameState.init_new(len(record[HANDS]), self.time)
+      for player in range(len(record[HANDS])):
+        gameState.addPlayer(player, 'seat%d' % player, None)
+      header = gameState.generateXML()
+      self.file.write(header[:header.rindex('</game>')])
+    self.file.write(recordToHandState(record).generateXML())
+
+  def close( self ):
+    if self.file is not None:
+      self.file.write('</game>\n')
+      self.file.close()
+      self.file = None
+
+
+#
+# BinarySink class
+# writes records to a compact binary file
+#
+# File layout (little endian): the 4 byte magic 'OHS2', then one block
+# per record:
+#   header  - game (I), handNum, numCards, numPlayers, dealer (B each),
+#             trump (b), hand seed (Q)
+#   players - per player: hand mask (Q), bid (b), tricks (B), delta (h)
+#   plays   - numPlayers*numCards cards (B each) in the order played
+#
+MAGIC = 'OHS2'
+HEADER = struct.Struct('<IBBBBbQ')
+PLAYER = struct.Struct('<QbBh')
+
+class BinarySink:
+
+  def __init__( self, file ):
+    self.file = file
+    self.file.write(MAGIC)
+
+  def write( self, record ):
+    numPlayers = len(record[HANDS])
+    data = [ HEADER.pack(record[GAME], record[HAND_NUM], record[NUM_CARDS],
+                         numPlayers, record[DEALER], record[TRUMP],
+                         record[SEED]) ]
+    for player in range(numPlayers):
+      data.append(PLAYER.pack(record[HANDS][player], record[BIDS][player],
+                              record[TRICKS][player],
+                              record[DELTAS][player]))
+    data.append(struct.pack('%dB' % len(record[PLAYS]), *record[PLAYS]))
+    self.file.write(''.join(data))
+
+  def close( self ):
+    if self.file is not None:
+      self.file.close()
+      self.file = None
+
+#
+# read size bytes of a record file, raising ValueError if it ends first
+#
+def _readRecord( file, size ):
+  data = file.read(size)
+  if len(data) < size:
+    raise ValueError('Truncated simulation record file')
+  return data
+
+#
+# read back the records of a file written by BinarySink
+# Parameter:
+#   file - file opened in binary mode
+# Return value:
+#   generator of scored records
+#
+def readBinary( file ):
+  if file.read(len(MAGIC)) != MAGIC:
+    raise ValueError('Not a simulation record file')
+  while 1:
+    data = file.read(HEADER.size)
+    if not data:
+      return
+    if len(data) < HEADER.size:
+      raise ValueError('Truncated simulation record file')
+    game, handNum, numCards, numPlayers, dealer, trump, seed = \
+          HEADER.unpack(data)
+    hands = []
+    bids = []
+    tricks = []
+    deltas = []
+    for player in range(numPlayers):
+      data = _readRecord(file, PLAYER.size)
+      hand, bid, trickCount, delta = PLAYER.unpack(data)
+      hands.append(hand)
+      bids.append(bid)
+      tricks.append(trickCount)
+      deltas.append(delta)
+    numPlays = numPlayers*numCards
+    plays = struct.unpack('%dB' % numPlays, _readRecord(file, numPlays))
+    yield (game, handNum, numCards, dealer, trump, tuple(hands), seed,
+           tuple(bids), plays, tuple(tricks), tuple(deltas))
+
+
+#
+# run a pipeline into a sink
+# Parameters:
+#   records - generator of scored records
+#   sink    - sink to write to (None to only consume the records)
+#
+def drain( records, sink = None ):
+  try:
+    for record in records:
+      if sink is not None:
+        sink.write(record)
+  finally:
+    if sink is not None:
+      sink.close()
+
+
+###############################################################
+# program code
+###############################################################
+
+def printUsage():
+  print 'Usage: pipeline.py [-n <games>] [-b <bot,bot,...>] [-s <seed>]'
+  print '                   [-x <xml file pattern> | -o <binary file>]'
+  sys.exit(1)
+
+
+if __name__ == '__main__':
+  import getopt
+
+  numGames = 1000
+  botNames = [ 'RandomPlayer' ] * 4
+  seed = None
+  sink = None
+  try:
+    flags, args = getopt.getopt(sys.argv[1:], 'n:b:s:x:o:')
+    for flag, value in flags:
+      if flag == '-n':
+        numGames = int(value)
+      elif flag == '-b':
+        botNames = value.split(',')
+      elif flag == '-s':
+        seed = int(value)
+      elif flag == '-x':
+        sink = XMLSink(value)
+      elif flag == '-o':
+        sink = BinarySink(open(value, 'wb'))
+  except (getopt.GetoptError, ValueError):
+    printUsage()
+
+  summary = Summary(len(botNames))
+  drain(aggregate(score(play(deal(numGames, len(botNames), seed),
+                             botNames, seed)), summary), sink)
+  print '%d games, %d hands' % (summary.numGames, summary.numHands)
+  print '%-6s %-14s %10s %10s' % ('Seat', 'Bot', 'Avg score', 'Bids made')
+  scores = summary.averageScores()
+  made = summary.madeRates()
+  for seat in range(len(botNames)):
+    print '%-6d %-14s %10.1f %9.1f%%' % (seat, botNames[seat], scores[seat],
+                                         100.0 * made[seat])
@@ -0,0 +1,241 @@
+###############################################
+# position.py
+# compact mutable position of a hand of Oh Hell
+# with O(1) play/undo, for searches and simulations
+###############################################
+
+import copy, random
+from card import *
+from GameState import HandState, TrickState
+
+#
+# Zobrist keys (a fixed seed so hashes are the same in every process)
+#   HAND_KEYS[player][card]  - card is held by player
+#   TRICK_KEYS[player][card] - card was played by player to current trick
+#   MOVE_KEYS[player]        - player is to move
+#   TRUMP_KEYS[card + 1]     - trump card (index 0 for no trump)
+#
+_rng = random.Random(0x0DE12)
+MAX_PLAYERS = 10
+HAND_KEYS = [ [ _rng.getrandbits(64) for card in range(52) ]
+              for player in range(MAX_PLAYERS) ]
+TRICK_KEYS = [ [ _rng.getrandbits(64) for card in range(52) ]
+               for player in range(MAX_PLAYERS) ]
+MOVE_KEYS = [ _rng.getrandbits(64) for player in range(MAX_PLAYERS) ]
+TRUMP_KEYS = [ _rng.getrandbits(64) for card in range(53) ]
+del _rng
+
+
+#
+# Position class
+# the cards, bids and trick being played of one hand
+#
+# Attributes:
+#   numPlayers
+#     number of players
+#
+#   numCards
+#     number of cards dealt to each player
+#
+#   trump
+#     trump card (-1 for no trump)
+#
+#   trumpSuit
+#     suit of trump (-1 for no trump)
+#
+#   dealer
+#     index of dealer
+#
+#   deals
+#     bit masks of the cards dealt to each player
+#
+#   hands
+#     bit masks of the cards each player still holds
+#
+#   bids
+#     bids of the players (-1 if not known)
+#
+#   tricksWon
+#     number of tricks won so far by each player
+#
+#   trick
+#     list of (player, card) pairs played to the current trick
+#
+#   leader
+#     player who led the current trick
+#
+#   toMove
+#     player to play next
+#
+#   tricks
+#     stack of completed tricks as (leader, cards) pairs
+#
+#   hash
+#     Zobrist hash of the cards held, the current trick, the player to
+#     move and the trump (tricks already won are not included, so
+#     transpositions reached through different tricks share a hash)
+#
+class Position:
+
+  #
+  # constructor
+  # Parameters:
+  #   deals  - bit masks of the cards dealt to each player
+  #   trump  - trump card (-1 for no trump)
+  #   dealer - index of dealer
+  #   bids   - bids of the players (None if not known)
+  #
+  def __init__( self, deals, trump, dealer, bids=None ):
+    self.numPlayers = len(deals)
+    self.numCards = popcount(deals[0])
+    self.trump = trump
+    if trump >= 0:
+      self.trumpSuit = CARD_SUIT[trump]
+    else:
+      self.trumpSuit = -1
+    self.dealer = dealer
+    self.deals = list(deals)
+    self.hands = list(deals)
+    if bids is None:
+      self.bids = [-1] * self.numPlayers
+    else:
+      self.bids = list(bids)
+    self.tricksWon = [0] * self.numPlayers
+    self.trick = []
+    self.leader = (dealer + 1) % self.numPlayers
+    self.toMove = self.leader
+    self.tricks = []
+
+    self.hash = TRUMP_KEYS[trump + 1] ^ MOVE_KEYS[self.toMove]
+    for player in range(self.numPlayers):
+      for card in iterCards(self.hands[player]):
+        self.hash = self.hash ^ HAND_KEYS[player][card]
+
+  #
+  # return a copy of position that can be changed independently
+  #
+  def clone( self ):
+    other = copy.copy(self)
+    other.deals = list(self.deals)
+    other.hands = list(self.hands)
+    other.bids = list(self.bids)
+    other.tricksWon = list(self.tricksWon)
+    other.trick = list(self.trick)
+    other.tricks = list(self.tricks)
+    return other
+
+  #
+  # return bit mask of cards the player to move may play
+  #
+  def legalMoves( self ):
+    if self.trick:
+      return legalMask(self.hands[self.toMove], self.trick[0][1])
+    return self.hands[self.toMove]
+
+  #
+  # return number of tricks left to play, counting the current one
+  #
+  def tricksLeft( self ):
+    return self.numCards - len(self.tricks)
+
+  #
+  # has every card been played?
+  #
+  def isOver( self ):
+    return len(self.tricks) == self.numCards
+
+  #
+  # play a card for the player to move (the card is not checked)
+  # Parameter:
+  #   card - index of card
+  #
+  def play( self, card ):
+    player = self.toMove
+    self.hands[player] = self.hands[player] & ~(1 << card)
+    self.trick.append( (player, card) )
+    self.hash = (self.hash ^ HAND_KEYS[player][card]
+                 ^ TRICK_KEYS[player][card] ^ MOVE_KEYS[player])
+
+    if len(self.trick) == self.numPlayers:
+      winner = trickWinner(self.trick, self.trumpSuit)
+      for p, c in self.trick:
+        self.hash = self.hash ^ TRICK_KEYS[p][c]
+      self.tricks.append( (self.leader, self.trick) )
+      self.tricksWon[winner] = self.tricksWon[winner] + 1
+      self.trick = []
+      self.leader = winner
+      self.toMove = winner
+    else:
+      self.toMove = (player + 1) % self.numPlayers
+    self.hash = self.hash ^ MOVE_KEYS[self.toMove]
+
+  #
+  # take back the last card played
+  #
+  def undo( self ):
+    self.hash = self.hash ^ MOVE_KEYS[self.toMove]
+    if not self.trick:
+      winner = self.leader
+      self.leader, self.trick = self.tricks.pop()
+      self.tricksWon[winner] = self.tricksWon[winner] - 1
+      for p, c in self.trick:
+        self.hash = self.hash ^ TRICK_KEYS[p][c]
+      self.trick = list(self.trick)
+
+    player, card = self.trick.pop()
+    self.hands[player] = self.hands[player] | (1 << card)
+    self.toMove = player
+    self.hash = (self.hash ^ HAND_KEYS[player][card]
+                 ^ TRICK_KEYS[player][card] ^ MOVE_KEYS[player])
+
+  #
+  # convert position into a HandState
+  # Return value:
+  #   HandState with the deals, bids and tricks played so far (an
+  #   unfinished current trick is included as the last trick)
+  #
+  def toHandState( self ):
+    hand = HandState(self.numPlayers, self.numCards, self.trump, self.dealer)
+    for player in range(self.numPlayers):
+      hand.setHand(player, list(iterCards(self.deals[player])))
+      hand.setBid(player, self.bids[player])
+      hand.setTricksMade(player, self.tricksWon[player])
+    tricks = [ cards for leader, cards in self.tricks ]
+    if self.trick:
+      tricks.append(self.trick)
+    for cards in tricks:
+      trick = TrickState()
+      for player, card in cards:
+        trick.addCard(player, card)
+      hand.addTrick(trick)
+    return hand
+
+
+#
+# build a position from a HandState
+# Parameters:
+#   hand         - HandState, e.g. from a game log
+#   cardsPlayed  - number of cards of the hand to replay (None for all)
+# Return value:
+#   Position after the cards have been played
+#
+def fromHandState( hand, cardsPlayed=None ):
+  deals = []
+  for cards in hand.getHands():
+    mask = 0
+    for card in cards:
+      mask = mask | (1 << card)
+    deals.append(mask)
+  position = Position(deals, hand.getTrump(), hand.getDealer(),
+                      hand.getBids())
+
+  played = 0
+  for trick in hand.getTricks():
+    for player, card in trick.getCards():
+      if cardsPlayed is not None and played == cardsPlayed:
+        return position
+      if player != position.toMove:
+        raise ValueError('Player %d played out of turn' % player)
+      position.play(card)
+      played = played + 1
+  return position
@@ -0,0 +1,92 @@
+###############################################
+# scoring.py
+# the Oh Hell scoring rule
+#
+# A player who makes their bid exactly scores
+# 10 plus the bid squared, a player who takes too
+# few tricks loses 5 points per missing trick and
+# a player who takes too many scores nothing.
+###############################################
+
+try:
+  import numpy
+except ImportError:
+  numpy = None
+
+
+#
+# score of one player for one hand
+# Parameters:
+#   bid    - bid of player
+#   tricks - tricks made by player
+# Return value:
+#   points scored (may be negative)
+#
+def handScore( bid, tricks ):
+  if bid == tricks:
+    return 10 + bid*bid
+  elif tricks < bid:
+    return -5*(bid - tricks)
+  return 0
+
+#
+# scores of all players for one hand
+# Parameters:
+#   bids   - list of bids
+#   tricks - list of tricks made (same order as bids)
+# Return value:
+#   list of points scored
+#
+def handScores( bids, tricks ):
+  return map(handScore, bids, tricks)
+
+#
+# running totals of a game
+# Parameters:
+#   hands - list of (bids, tricks) pairs, one per hand
+# Return value:
+#   list with the total scores after each hand
+#
+def runningTotals( hands ):
+  totals = []
+  scores = None
+  for bids, tricks in hands:
+    deltas = handScores(bids, tricks)
+    if scores is None:
+      scores = deltas
+    else:
+      scores = [ score + delta for score, delta in zip(scores, deltas) ]
+    totals.append(scores)
+  return totals
+
+
+#
+# NumPy versions for scoring many hands or games in one call
+# (these need NumPy installed)
+#
+
+#
+# scores of every player of every hand
+# Parameters:
+#   bids   - integer array of bids, any shape
+#   tricks - integer array of tricks made, same shape as bids
+# Return value:
+#   integer array of points scored
+#
+def scoreArray( bids, tricks ):
+  bids = numpy.asarray(bids, numpy.int32)
+  tricks = numpy.asarray(tricks, numpy.int32)
+  return numpy.where(bids == tricks, 10 + bids*bids,
+                     numpy.where(tricks < bids, 5*(tricks - bids), 0))
+
+#
+# running totals of many games
+# Parameters:
+#   bids   - (games, hands, players) array of bids (or (hands, players)
+#            for a single game)
+#   tricks - array of tricks made, same shape as bids
+# Return value:
+#   array of the same shape with each player's total after each hand
+#
+def scoreGames( bids, tricks ):
+  return scoreArray(bids, tricks).cumsum(axis=-2)
@@ -0,0 +1,87 @@
+###############################################
+# seeds.py
+# seed hierarchy for reproducible games
+#
+#   game seed -> hand seed -> deck
+#
+# Every seed is a 64 bit integer derived from its
+# parent with the SplitMix64 mixing function, so a
+# game seed alone regenerates every hand of the game,
+# and different games or hands never share a stream.
+###############################################
+
+import random
+from card import Deck
+
+MASK64 = (1 << 64) - 1
+GOLDEN = 0x9E3779B97F4A7C15
+
+#
+# stream labels for seeds that are not hand seeds
+#
+DEALER_STREAM = 1 << 32
+PLAYER_STREAM = 2 << 32
+
+
+#
+# SplitMix64 finalizer: scramble a 64 bit integer
+#
+def mix64( x ):
+  x = (x + GOLDEN) & MASK64
+  x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+  x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & MASK64
+  return x ^ (x >> 31)
+
+#
+# derive the seed of a child stream
+# Parameters:
+#   parent - seed of parent
+#   index  - index of child (e.g. a hand or game number)
+# Return value:
+#   64 bit seed of child
+#
+def deriveSeed( parent, index ):
+  return mix64(mix64(parent & MASK64) ^ ((index * GOLDEN) & MASK64))
+
+#
+# return a fresh random 64 bit seed
+#
+def newSeed():
+  return random.SystemRandom().getrandbits(64)
+
+#
+# seed of a hand of a game
+# Parameters:
+#   gameSeed - seed of game
+#   handNum  - number of the hand in the game (0 = first hand)
+#
+def handSeed( gameSeed, handNum ):
+  return deriveSeed(gameSeed, handNum)
+
+#
+# pick the first dealer of a game
+# Parameters:
+#   gameSeed   - seed of game
+#   numPlayers - number of players
+#
+def firstDealer( gameSeed, numPlayers ):
+  rng = random.Random(deriveSeed(gameSeed, DEALER_STREAM))
+  return rng.randrange(numPlayers)
+
+#
+# deal a hand from its seed
+# Parameters:
+#   seed       - hand seed
+#   numPlayers - number of players
+#   numCards   - number of cards dealt to each player
+#   dealer     - index of dealer
+# Return value:
+#   (hands, trump) as returned by Deck.deal, with no trump on 10 card
+#   hands
+#
+def dealFromSeed( seed, numPlayers, numCards, dealer ):
+  hands, trump = Deck(seed).deal(numPlayers, numCards,
+                                 (dealer + 1) % numPlayers)
+  if numCards == 10:
+    trump = -1
+  return hands, trump
@@ -4,14 +4,21 @@
 # Oh-hell server
 ###################################################
 
-import sys, time, string, random, os
+import sys, time, string, random, os, threading, Queue, anydbm
 from select import select
 from socket import socket, AF_INET, SOCK_STREAM
 from card import *
 from GameState import *
+from engine import *
+from advisor import BidAdvisor, engineHand
+from bidtables import BidTables
+from exact import ExactSolver
 
-def now():
-  return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(time.time()))
+#
+# longest a player waits for the advisor's hint before BID is sent (in
+# seconds)
+#
+HINT_WAIT = 0.5
 
 
 #####################################
@@ -51,33 +58,25 @@ class OhHellServer:
     gameState
       state of the game, really a history of the hands
 
-    trickNums
-      a list of the num of tricks for each hand to play
-
-    numHands
-      how many hands to play
-
-    handNum
-      the number of the current hand
+    engine
+      the Engine playing the game once all players have registered
 
-    dealer
-      the index of the dealer for the current hand
-
-    trump
-      the trump for the current hand
-
-    deck
-      the deck of cards for the current hand
+    seed
+      seed of the game (see seeds.py), so a seeded server always plays the
+      same deals; None to use the seed in the log of a restarted game, or
+      a random one for a new game
   """
   
-  def __init__(self, port = 7000):
+  def __init__(self, port = 7000, seed = None):
     """
     Constructor
     Parameter:
       port - TCP port for server to listen on
+      seed - seed for dealer choice and shuffling (None for a random game)
     """
     self.serverAddress = ''
     self.serverPort = port
+    self.seed = seed
     self.players = []
     self.numReadyPlayers = 0
 
@@ -204,11 +203,6 @@ class OhHellServer:
             self.playGame(0, -1)
 
           else: # restarting interrupted game
-            scores = self.gameState.currentScores()
-            
-            for i in range(self.numPlayers):
-              self.players[i].score = scores[i]
-              
             self.playGame( self.gameState.numHands(),
                            self.gameState.nextDealer())
           raise 'End server'
@@ -241,88 +235,6 @@ class OhHellServer:
     for player in self.players:
       player.sendMessage(msg)
 
-  #
-  # make a list of numbers of tricks for each hand
-  # Parameter:
-  #   handNum - number of the hand to start with (0 = first)
-  # Return value:
-  #   a list of the number of tricks for each hand
-  #
-  def makeTrickNums(self, handNum):
-    trickNums = []
-    
-    for i in range(10,1,-1):
-      trickNums.append(i)
-      
-    for i in range(self.numPlayers):
-      trickNums.append(1)
-      
-    for i in range(2,11):
-      trickNums.append(i)
-      
-    return trickNums[handNum:]
-
-  #
-  # start game
-  # Parameters:
-  #   handNum - number of hand to start with (0 = first)
-  #   dealer  - index of player to start dealing (-1 to pick randomly)
-  #
-  def startGame(self, handNum, dealer):
-    print 'startGame()'
-    startMessage = 'START_GAME ' + str(self.numPlayers) + ' '
-    id = 0
-    for player in self.players:
-      startMessage = startMessage + player.name + ' ' + str(player.score) + ' '
-      if handNum == 0:
-        self.gameState.addPlayer( id, player.name, None)
-      id = id + 1
-    self.broadcastMessage(startMessage)
-    self.trickNums = self.makeTrickNums(handNum)
-
-    self.handNum = 0
-
-    self.numHands = 18 + self.numPlayers - self.handNum
-    
-    if dealer < 0:
-      self.dealer = random.randrange(self.numPlayers)
-    else:
-      self.dealer = dealer
-    print 'Initial dealer:', self.dealer
-
-  #
-  # calculate index of next player in sequence
-  # Parameter:
-  #   playerNum - current player
-  # Return value:
-  #   index of next player
-  #
-  def nextPlayer(self, playerNum ):
-    return (playerNum + 1) % self.numPlayers
-
-  #
-  # start playing hand
-  # creates new deck, deals cards and picks trump (if necessary)
-  #
-  def startHand(self):
-    print 'startHand()'
-    self.broadcastMessage('NEW_HAND %d %d' % ( self.trickNums[self.handNum],
-                          self.dealer))
-    self.deck = Deck()
-    for player in self.players:
-      player.reset()
-    playerNum = self.nextPlayer(self.dealer)
-    for trick in range(self.trickNums[self.handNum]):
-      for player in range(self.numPlayers):
-        card = self.deck.draw()
-        self.players[playerNum].drawCard(card)
-        playerNum = self.nextPlayer(playerNum)
-    if self.trickNums[self.handNum] != 10:
-      self.trump = self.deck.draw()
-    else:
-      self.trump = -1
-    self.broadcastMessage('DEAL_OVER %d' % self.trump)
-
   #
   # logins in player
   # Parameters:
@@ -356,17 +268,9 @@ class OhHellServer:
 
   #
   # ends game
-  # finds winner and closes connections
+  # closes connections and waits for a new game
   #
   def endGame(self):
-    winnerNum = 0
-    bestScore = self.players[0].score
-    for i in range(1,self.numPlayers):
-      if self.players[i].score > bestScore:
-        winnerNum = i
-        bestScore = self.players[i].score
-    # look for ties!
-    self.broadcastMessage('GAME_OVER %d' % winnerNum)
     for player in self.players:
       player.close()
     self.players = []
@@ -384,170 +288,20 @@ class OhHellServer:
 
     print 'XML log file is', self.xmlFileName
     self.state = 'PLAYING'
-    self.startGame( handNum, dealer)
-    
-    for i in range(len(self.trickNums)):
-      self.handNum = i
-      self.startHand()
-      self.getBids()
-      self.playHand()
-      self.dealer = self.nextPlayer(self.dealer)
-      
+    self.engine = ServerEngine(self.players, self.gameState, self.seed,
+                               self.writeXML)
+    self.engine.playGame( handNum, dealer)
     self.endGame()
 
   #
-  # get bids from players
+  # write the XML log file
+  # Parameter:
+  #   gameState - state of game to write
   #
-  def getBids( self ):
-    playerNum = self.nextPlayer(self.dealer)
-    bidTotal = 0
-    
-    for player in range(self.numPlayers-1):
-      bid = self.players[playerNum].getBid()
-      bidTotal = bidTotal + bid
-      self.players[playerNum].sendMessage('OK')
-      self.broadcastMessage('BID_ANNOUNCE %d %d' % (playerNum, bid) )
-      playerNum = self.nextPlayer(playerNum)
-      
-    while 1:
-      bid = self.players[self.dealer].getBid()
-      
-      if bid + bidTotal != self.trickNums[self.handNum]:
-        self.players[self.dealer].sendMessage('OK')
-        self.broadcastMessage('BID_ANNOUNCE %d %d' % (playerNum, bid) )
-        break
-      else:
-        self.players[self.dealer].sendMessage('BADBID %d' % bid)
-
-  #
-  # play a hand
-  #
-  def playHand( self ):
-    hand = HandState(len(self.players), self.trickNums[self.handNum],
-                     self.trump, self.dealer)
-    for i in range(len(self.players)):
-      cards = []
-      for c in range(52):
-        if self.players[i].hasCard(c):
-          cards.append(c)
-      hand.setHand(i, cards)
-      hand.setBid(i, self.players[i].bid)
-    playerNum = self.nextPlayer(self.dealer)
-    for i in range(self.trickNums[self.handNum]):
-      winnerNum, trick = self.playTrick(playerNum)
-      hand.addTrick(trick)
-      self.players[winnerNum].wonTrick()
-      playerNum = winnerNum
-      self.broadcastMessage( 'TRICK_WINNER %d' % winnerNum)
-
-##    if self.trump == -1:
-##      trumpSuite = None
-##    else:
-##      trumpSuite = cardSuit(self.trump)
-
-    for i in range(len(self.players)):
-      hand.setTricksMade(i, self.players[i].numTricks)
-    self.gameState.addHand(hand)
-    
+  def writeXML( self, gameState ):
     xmlFile = open(self.xmlFileName, "w")
-    xmlFile.write( self.gameState.generateXML() )
+    xmlFile.write( gameState.generateXML() )
     xmlFile.close()
-    
-    deltas = self.updateScores()
-    message = 'END_HAND '
-    for delta in deltas:
-      message = message + '%d ' % delta
-    self.broadcastMessage(message)
-
-  #
-  # play a trick of a hand
-  # Parameter:
-  #   leadPlayerNum - index of player to lead
-  #
-  def playTrick(self, leadPlayerNum):
-    playerNum = leadPlayerNum
-    firstCard = -1
-    cards = []
-    trick = TrickState()
-    for i in range(self.numPlayers):
-      player = self.players[playerNum]
-      cardOK = 0
-      while not cardOK:
-        card = self.playCard(player, firstCard)
-        cardOK = card >= 0
-      if firstCard == -1:
-        firstCard = card
-      self.broadcastMessage('CARD_PLAYED %d %d' % (playerNum, card))
-      cards.append( (playerNum, card) )
-      trick.addCard( playerNum, card )
-      playerNum = self.nextPlayer(playerNum)
-    return self.findWinner(cards), trick
-
-  #
-  # play a card in a trick
-  # Parameters:
-  #   player    - player to play card
-  #   firstCard - index of first card played in trick (-1 if player is leading)
-  # Return value:
-  #   index of card played or -1 if illegal card played
-  #
-  def playCard( self, player, firstCard):
-    card = player.getCard()
-    valid = 0
-    if player.hasCard(card):
-      if firstCard == -1:
-        valid = 1
-      else:
-        if cardSuit(firstCard) == cardSuit(card):
-          valid = 1
-        elif not player.hasSuit( cardSuit(firstCard) ):
-          valid = 1
-    if valid:
-      player.sendMessage('OK')
-      player.removeCard(card)
-      return card
-    else:
-      player.sendMessage('ERROR Improper card')
-      return -1
-  
-  #
-  # finds winner of trick
-  # Parameter:
-  #   cards - list of (player index, card) ordered pairs
-  # Return value:
-  #   index of winning player
-  #
-  def findWinner( self, cards ):
-    winnerNum, bestCard = cards[0]
-    for info in cards[1:]:
-      playerNum, card = info
-      if ( cardSuit(bestCard) == cardSuit(card)
-           and cardValue(card) > cardValue(bestCard) ):
-        winnerNum, bestCard = info
-      elif ( cardSuit(bestCard) != cardSuit(self.trump)
-             and cardSuit(card) == cardSuit(self.trump) ):
-        winnerNum, bestCard = info
-    return winnerNum
-
-  #
-  # update the scores based on current hand
-  # Return value:
-  #   a list of the changes in score of the players
-  #
-  def updateScores( self ):
-    deltas = []
-    for p in self.players:
-      if p.bid == p.numTricks:
-        delta = 10 + p.bid**2
-      elif p.bid > p.numTricks:
-        delta = -5*(p.bid - p.numTricks)
-      else:
-        delta = 0
-      deltas.append(delta)
-      p.score = p.score + delta
-      p.reset()
-    return deltas
-        
 
   #
   # find an used file name for the XML log file
@@ -587,15 +341,35 @@ def findPlayer( socket ):
 
 #
 # Player class
-# Represents an Oh-Hell player
+# Represents an Oh-Hell player connected over the network
+# (the engine's player callbacks turned into protocol messages)
 #
-class Player:
+class Player(EnginePlayer):
 
   #
   # Dictionary that maps sockets to players
   #
   socketDictionary = { }
 
+  #
+  # BidAdvisor shared by all players, whose estimates are sent as a hint
+  # before each bid (set up by the program code; None for no hints)
+  #
+  advisor = None
+
+  #
+  # hands of the current deal queued for adviseLater
+  #
+  pending = Queue.Queue()
+
+  #
+  # advice of the hands queued in the current deal (None until
+  # adviseLater has it), with the condition adviseLater notifies when it
+  # adds some
+  #
+  hints = {}
+  hintReady = threading.Condition()
+
   #
   # Constructor
   # Parameters:
@@ -603,10 +377,8 @@ class Player:
   #   name   - name of player
   #
   def __init__(self, socket, name = ""):
-    self.name = name
+    EnginePlayer.__init__(self, name)
     self.socket = socket
-    self.score = 0
-    self.reset()
     Player.socketDictionary[socket] = self
 
   #
@@ -621,39 +393,49 @@ class Player:
       self.socket.send(msg + '\n')
 
   #
-  # draws a card for player
-  # Parameter:
-  #   card - card drawn by player
+  # sends a game event to player
+  # Parameters:
+  #   message - name of message
+  #   args    - arguments of message
   #
-  def drawCard( self, card):
-    self.socket.send('DRAW %d\n' % card )
-    self.cards.addCard(card)
+  def notify( self, message, *args ):
+    self.sendMessage(string.join([message] + map(str, args)))
 
   #
-  # resets player for new hand
+  # sends the advisor's recommendation:
+  #   BID_HINT <bid> <p0> ... <pN>
+  # where pK is the chance in percent of taking exactly K tricks when
+  # bidding K
   #
-  def reset( self ):
-    self.cards = CardList()
-    self.bid = 0
-    self.numTricks = 0
+  def sendHint( self, advice ):
+    self.notify('BID_HINT', advice.bid,
+                *[ int(round(100*made)) for made in advice.made ])
 
   #
   # gets a bid from player
-  #
-  def getBid( self ):
+  # The hand was usually queued for adviseLater as soon as it was known
+  # (see ServerEngine), so the hint is often ready; otherwise BID waits
+  # for it for at most HINT_WAIT seconds and goes without it.  The
+  # clients read the reply to BID right after sending their bid, so no
+  # hint may follow BID.
+  #
+  def getBid( self, engine, playerNum ):
+    if Player.advisor is not None:
+      advice = waitHint(engineHand(engine, playerNum), HINT_WAIT)
+      if advice is not None:
+        self.sendHint(advice)
     self.sendMessage('BID')
     response = self.socket.recv(1024)
     tokens = string.split(response)
     if tokens[0] != 'BID':
       self.sendMessage('ERROR Illegal command')
       return -1
-    self.bid = int(tokens[1])
-    return self.bid
+    return int(tokens[1])
 
   #
   # gets a card from player
   #
-  def getCard( self ):
+  def getCard( self, engine, playerNum ):
     self.sendMessage('GET_CARD')
     response = self.socket.recv(1024)
     tokens = string.split(response)
@@ -663,44 +445,106 @@ class Player:
     return int(tokens[1])
 
   #
-  # does player have card?
-  # Parameters:
-  #   card - card to check
-  # Return value:
-  #   1 if has card, else 0
+  # closes socket of player
   #
-  def hasCard( self, card ):
-    return self.cards.hasCard(card)
+  def close(self):
+    self.socket.close()
 
-  #
-  # removes card from card list of player
-  # Parameter:
-  #   card - index of card to remove
-  #
-  def removeCard( self, card ):
-    self.cards.removeCard(card)
 
-  #
-  # does player have suit?
-  # Parameter:
-  #   suit - index of suit
-  # Return value:
-  #   1 if player has at least one card in suit, else 0
-  #
-  def hasSuit( self, suit):
-    return self.cards.hasSuit(suit)
+#
+# ServerEngine class
+# Engine that queues the hand of each bidder for the advisor as soon as
+# the hand and the bids before it are known, so the hint is worked out
+# while the players before are still bidding
+#
+class ServerEngine(Engine):
+
+  def broadcast( self, message, *args ):
+    Engine.broadcast(self, message, *args)
+    if Player.advisor is None:
+      return
+    if message == 'NEW_HAND':
+      clearHints()
+    elif message == 'DEAL_OVER':
+      queueHint(engineHand(self, self.nextPlayer(self.dealer)))
+    elif message == 'BID_ANNOUNCE' and args[0] != self.dealer:
+      queueHint(engineHand(self, self.nextPlayer(args[0])))
 
-  #
-  # called when player won a trick
-  #
-  def wonTrick( self ):
-    self.numTricks = self.numTricks + 1
+#
+# forget the hints of the last deal
+#
+def clearHints():
+  Player.hintReady.acquire()
+  try:
+    Player.hints.clear()
+  finally:
+    Player.hintReady.release()
 
-  #
-  # closes socket of player
-  #
-  def close(self):
-    self.socket.close()
+#
+# queue a hand for adviseLater (unless it is already queued)
+# Parameter:
+#   hand - (numPlayers, hand, trump, seat, bids) as engineHand returns it
+#
+def queueHint( hand ):
+  Player.hintReady.acquire()
+  try:
+    if hand not in Player.hints:
+      Player.hints[hand] = None
+      Player.pending.put(hand)
+  finally:
+    Player.hintReady.release()
+
+#
+# wait for the advice of a hand, queueing it if it is not yet
+# Parameters:
+#   hand    - as for queueHint
+#   timeout - longest wait (in seconds)
+# Return value:
+#   Advice, None if adviseLater does not have it in time
+#
+def waitHint( hand, timeout ):
+  queueHint(hand)
+  deadline = time.time() + timeout
+  Player.hintReady.acquire()
+  try:
+    while Player.hints.get(hand) is None:
+      left = deadline - time.time()
+      if left <= 0:
+        return None
+      Player.hintReady.wait(left)
+    return Player.hints[hand]
+  finally:
+    Player.hintReady.release()
+
+#
+# work out the hint of the next queued hand: look it up, or else solve or
+# sample it (hands of an earlier deal are dropped)
+#
+def adviseNext():
+  hand = Player.pending.get()
+  Player.hintReady.acquire()
+  try:
+    wanted = hand in Player.hints
+  finally:
+    Player.hintReady.release()
+  if wanted:
+    advice = Player.advisor.lookup(*hand)
+    if advice is None:
+      advice = Player.advisor.solve(*hand)
+    Player.hintReady.acquire()
+    try:
+      if hand in Player.hints:
+        Player.hints[hand] = advice
+        Player.hintReady.notifyAll()
+    finally:
+      Player.hintReady.release()
+
+#
+# main loop of the thread that works out the hints
+#
+def adviseLater():
+  while 1:
+    adviseNext()
 
 ###############################################################
 # program code
@@ -708,15 +552,32 @@ class Player:
 import sys
 
 def printUsage():
-  print 'Usage: server.py -n <num_players> | -f <xml-recovery-file>'
+  print 'Usage: server.py [-s <seed>] [-b <bid-table-file>] [-x <exact-file>]'
+  print '                 [-m <bid-model-file>]'
+  print '                 -n <num_players> | -f <xml-recovery-file>'
   sys.exit(1)
   
 
 if __name__ == '__main__':
   import getopt
 
+  seed = None
+  tableFile = None
+  exactFile = None
+  modelFile = None
   try:
-    flags, args = getopt.getopt( sys.argv[1:], 'n:f:')
+    flags, args = getopt.getopt( sys.argv[1:], 'n:f:s:b:x:m:')
+    for flag in flags:
+      if flag[0] == '-s':
+        seed = flag[1]
+      elif flag[0] == '-b':
+        tableFile = flag[1]
+      elif flag[0] == '-x':
+        exactFile = flag[1]
+      elif flag[0] == '-m':
+        modelFile = flag[1]
+    flags = [ flag for flag in flags
+              if flag[0] not in ('-s', '-b', '-x', '-m') ]
     if len(flags) != 1:
       printUsage()
   except getopt.GetoptError:
@@ -731,8 +592,40 @@ if __name__ == '__main__':
   elif flags[0][0] == '-f':
     fileName = flags[0][1]
 
+  if seed is not None:
+    try:
+      seed = int(seed)
+    except ValueError:
+      print 'Illegal seed:', seed
+      sys.exit(1)
+
+  tables = model = None
+  if tableFile is not None:
+    try:
+      tables = BidTables(tableFile)
+    except (IOError, ValueError), e:
+      print 'Cannot read bid tables:', e
+      sys.exit(1)
+  try:
+    exact = ExactSolver(exactFile)
+  except (IOError, anydbm.error), e:
+    print 'Cannot open exact results file:', e
+    sys.exit(1)
+  if modelFile is not None:
+    try:
+      # the model needs NumPy, which the server does not otherwise
+      from calibrate import loadModel
+      model = loadModel(modelFile)
+    except (ImportError, IOError, ValueError), e:
+      print 'Cannot read bid model:', e
+      sys.exit(1)
+  Player.advisor = BidAdvisor(tables = tables, exact = exact, model = model)
+  thread = threading.Thread(target = adviseLater)
+  thread.setDaemon(1)
+  thread.start()
+
   try:
-    server = OhHellServer()
+    server = OhHellServer(seed = seed)
     if flags[0][0] == '-f':
       server.restart(fileName)
     else:
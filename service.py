@@ -0,0 +1,419 @@
+#!/usr/bin/python
+
+###############################################
+# service.py
+# batched decisions for the computer players of
+# many tables at once
+#
+# Each table runs its Engine in a thread of its
+# own.  When a ServicePlayer is asked for a bid
+# or a card it queues the decision with the
+# DecisionService and waits; the service answers
+# the queued decisions together once batchSize
+# of them are waiting or the oldest has waited
+# latency seconds, scoring all the bids in one
+# call of strength.expectedTricks and all the
+# cards in one call of tracker.batchWinChances.
+#
+# The service needs NumPy.
+#
+#   service.py [-t <tables>] [-p <players>] [-n <games per table>]
+#              [-b <batch size>] [-l <latency in ms>] [-s <seed>]
+###############################################
+
+import sys, time, threading
+
+try:
+  import numpy
+except ImportError:
+  numpy = None
+
+import strength
+from tracker import batchWinChances
+from card import *
+from bots import HeuristicPlayer, chanceCard
+from engine import Engine
+from seeds import newSeed, deriveSeed
+
+#
+# default most decisions answered together
+#
+BATCH_SIZE = 64
+
+#
+# default most seconds a decision waits for others to batch with
+#
+LATENCY = 0.002
+
+#
+# kinds of decision
+#
+BID, CARD = range(2)
+
+
+#
+# Decision class
+# a bid or card waiting for the service
+#
+# Attributes:
+#   kind
+#     BID or CARD
+#
+#   args
+#     (hand, trump, forbidden) for a bid, (tracker, want) for a card
+#
+#   queued
+#     time.time() when the decision was queued
+#
+#   done
+#     threading.Event set once result is known
+#
+#   result
+#     bid or card decided
+#
+#   error
+#     sys.exc_info() of the exception raised answering the decision (None
+#     if there was none), raised again in the thread waiting for it
+#
+class Decision:
+
+  def __init__( self, kind, args ):
+    self.kind = kind
+    self.args = args
+    self.queued = time.time()
+    self.done = threading.Event()
+    self.result = None
+    self.error = None
+
+
+#
+# DecisionService class
+# answers the decisions of many players in batches, in a thread of its own
+#
+# Attributes:
+#   batchSize
+#     most decisions answered together
+#
+#   latency
+#     most seconds a decision waits before its batch is answered
+#
+#   weights
+#     weights of strength.expectedTricks for the bids
+#
+#   decisions, batches
+#     numbers of decisions and of batches answered
+#
+#   delay, maxDelay
+#     total and longest time decisions waited in the queue (the delay
+#     batching adds)
+#
+#   evalTime
+#     total time spent answering batches
+#
+#   started, finished
+#     time.time() of the first decision and of the last batch answered
+#     (None before them)
+#
+# A table has at most one decision waiting at a time, so a batch can
+# never be larger than the number of tables: with fewer tables than
+# batchSize every batch waits for the latency cap.
+#
+class DecisionService:
+
+  #
+  # constructor
+  # Parameters:
+  #   batchSize - most decisions answered together
+  #   latency   - most seconds a decision waits for others
+  #   weights   - weights of strength.expectedTricks
+  #
+  def __init__( self, batchSize = BATCH_SIZE, latency = LATENCY,
+                weights = strength.WEIGHTS ):
+    if numpy is None:
+      raise ImportError('The decision service needs NumPy')
+    if batchSize < 1:
+      raise ValueError('Batch size must be positive')
+    self.batchSize = batchSize
+    self.latency = latency
+    self.weights = weights
+    self.queue = []
+    self.ready = threading.Condition()
+    self.closed = 0
+    self.decisions = 0
+    self.batches = 0
+    self.delay = 0.0
+    self.maxDelay = 0.0
+    self.evalTime = 0.0
+    self.started = self.finished = None
+    self.thread = threading.Thread(target = self.run)
+    self.thread.setDaemon(1)
+    self.thread.start()
+
+  #
+  # queue a decision and wait for it to be answered
+  # Return value:
+  #   result of decision (an exception raised answering it is raised
+  #   again here)
+  #
+  def decide( self, decision ):
+    self.ready.acquire()
+    try:
+      if self.closed:
+        raise ValueError('Decision service is closed')
+      if self.started is None:
+        self.started = decision.queued
+      self.queue.append(decision)
+      self.ready.notify()
+    finally:
+      self.ready.release()
+    decision.done.wait()
+    if decision.error is not None:
+      raise decision.error[0], decision.error[1], decision.error[2]
+    return decision.result
+
+  #
+  # bid for a hand (see strength.strengthBid)
+  # Parameters:
+  #   hand      - bit mask of cards
+  #   trump     - trump card (-1 for no trump)
+  #   forbidden - bid the player may not make (-1 for none)
+  #
+  def bid( self, hand, trump, forbidden = -1 ):
+    return self.decide(Decision(BID, (hand, trump, forbidden)))
+
+  #
+  # card to play (see bots.chanceCard)
+  # Parameters:
+  #   tracker - CardTracker of the player (left alone until the card is
+  #             chosen)
+  #   want    - 1 if the player still needs tricks
+  #
+  def card( self, tracker, want ):
+    return self.decide(Decision(CARD, (tracker, want)))
+
+  #
+  # main loop of the service thread: wait until a batch is full or its
+  # oldest decision is due, then answer it; once closed, answer what is
+  # left without waiting and stop
+  #
+  def run( self ):
+    self.ready.acquire()
+    try:
+      while 1:
+        if not self.queue:
+          if self.closed:
+            break
+          self.ready.wait()
+          continue
+        due = self.queue[0].queued + self.latency - time.time()
+        if not self.closed and len(self.queue) < self.batchSize and due > 0:
+          self.ready.wait(due)
+          continue
+        batch = self.queue[:self.batchSize]
+        del self.queue[:self.batchSize]
+        self.ready.release()
+        try:
+          self.answer(batch)
+        finally:
+          self.ready.acquire()
+    finally:
+      self.ready.release()
+
+  #
+  # answer a batch of decisions and wake the players waiting for them
+  # An exception answering the cards, or a group of bids, is kept in the
+  # decisions it failed (see Decision.error) instead of stopping the
+  # service thread.
+  #
+  def answer( self, batch ):
+    start = time.time()
+    # hands of different sizes go in different arrays
+    bySize = {}
+    cards = []
+    for decision in batch:
+      if decision.kind == BID:
+        hand, trump, forbidden = decision.args
+        bySize.setdefault(popcount(hand), []).append(decision)
+      else:
+        cards.append(decision)
+    if cards:
+      try:
+        chances = batchWinChances([ decision.args[0] for decision in cards ])
+        for decision, cardChances in zip(cards, chances):
+          decision.result = chanceCard(cardChances, decision.args[1])
+      except Exception:
+        error = sys.exc_info()
+        for decision in cards:
+          decision.error = error
+    for numCards, decisions in bySize.items():
+      try:
+        hands = numpy.array([ list(iterCards(decision.args[0]))
+                              for decision in decisions ])
+        hands = hands.reshape(-1, numCards)
+        trumps = numpy.array([ decision.args[1] for decision in decisions ])
+        tricks = strength.expectedTricks(hands, trumps, self.weights)
+        for decision, expected in zip(decisions, tricks):
+          decision.result = strength.tricksToBid(expected, numCards,
+                                                 decision.args[2])
+      except Exception:
+        error = sys.exc_info()
+        for decision in decisions:
+          decision.error = error
+    end = time.time()
+
+    self.finished = end
+    self.batches = self.batches + 1
+    self.decisions = self.decisions + len(batch)
+    self.evalTime = self.evalTime + end - start
+    for decision in batch:
+      self.delay = self.delay + start - decision.queued
+      self.maxDelay = max(self.maxDelay, start - decision.queued)
+      decision.done.set()
+
+  #
+  # stop the service thread (it answers the decisions still queued first;
+  # deciding after this raises ValueError)
+  #
+  def close( self ):
+    self.ready.acquire()
+    try:
+      self.closed = 1
+      self.ready.notify()
+    finally:
+      self.ready.release()
+    self.thread.join()
+
+  #
+  # return the counters of the service as a dict, with the decisions per
+  # second from the first to the last and the mean and longest delay they
+  # waited
+  #
+  def stats( self ):
+    elapsed = 0.0
+    if self.finished is not None:
+      elapsed = self.finished - self.started
+    batches = max(self.batches, 1)
+    decisions = max(self.decisions, 1)
+    return { 'decisions': self.decisions, 'batches': self.batches,
+             'meanBatch': float(self.decisions) / batches,
+             'throughput': self.decisions / max(elapsed, 1e-9),
+             'meanDelay': self.delay / decisions,
+             'maxDelay': self.maxDelay,
+             'meanEval': self.evalTime / batches }
+
+
+#
+# ServicePlayer class
+# HeuristicPlayer that leaves its decisions to a DecisionService
+#
+# Attributes:
+#   service
+#     DecisionService shared with the players of other tables
+#
+class ServicePlayer(HeuristicPlayer):
+
+  #
+  # constructor
+  # Parameters:
+  #   name    - name of player
+  #   service - DecisionService to ask
+  #   rng     - random.Random instance (None for a random one)
+  #
+  def __init__( self, name, service, rng = None ):
+    HeuristicPlayer.__init__(self, name, rng)
+    self.service = service
+
+  def getBid( self, engine, playerNum ):
+    self.playerNum = self.tracker.player = playerNum
+    return self.service.bid(engine.cards[playerNum].mask, engine.trump,
+                            engine.forbiddenBid(playerNum))
+
+  def getCard( self, engine, playerNum ):
+    return self.service.card(self.tracker, self.tricksWon < self.bid)
+
+
+#
+# play games at many tables at once, every seat a ServicePlayer
+# Parameters:
+#   service    - DecisionService of the players
+#   numTables  - number of tables
+#   numPlayers - number of players at each table
+#   numGames   - games played at each table
+#   seed       - seed of the run; game g of table t is played with the
+#                seed deriveSeed(deriveSeed(seed, t), g)
+# Return value:
+#   list of the winners of the games of each table
+#
+def playTables( service, numTables, numPlayers, numGames, seed ):
+  winners = [ [] for table in range(numTables) ]
+
+  def playTable( table ):
+    tableSeed = deriveSeed(seed, table)
+    for game in range(numGames):
+      players = [ ServicePlayer('t%ds%d' % (table, seat), service)
+                  for seat in range(numPlayers) ]
+      engine = Engine(players, seed = deriveSeed(tableSeed, game), record = 0)
+      winners[table].append(engine.playGame())
+
+  threads = [ threading.Thread(target = playTable, args = (table,))
+              for table in range(numTables) ]
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+  return winners
+
+
+###############################################################
+# program code
+###############################################################
+
+def printUsage():
+  print 'Usage: service.py [-t <tables>] [-p <players>] [-n <games per table>]'
+  print '                  [-b <batch size>] [-l <latency in ms>] [-s <seed>]'
+  sys.exit(1)
+
+
+if __name__ == '__main__':
+  import getopt
+
+  numTables = 16
+  numPlayers = 4
+  numGames = 1
+  batchSize = BATCH_SIZE
+  latency = LATENCY
+  seed = None
+  try:
+    flags, args = getopt.getopt(sys.argv[1:], 't:p:n:b:l:s:')
+    for flag, value in flags:
+      if flag == '-t':
+        numTables = int(value)
+      elif flag == '-p':
+        numPlayers = int(value)
+      elif flag == '-n':
+        numGames = int(value)
+      elif flag == '-b':
+        batchSize = int(value)
+      elif flag == '-l':
+        latency = float(value) / 1000
+      elif flag == '-s':
+        seed = int(value)
+  except (getopt.GetoptError, ValueError):
+    printUsage()
+  if seed is None:
+    seed = newSeed()
+
+  service = DecisionService(batchSize, latency)
+  start = time.time()
+  playTables(service, numTables, numPlayers, numGames, seed)
+  elapsed = time.time() - start
+  service.close()
+
+  stats = service.stats()
+  print '%d games at %d tables in %.1f s' % (numTables*numGames, numTables,
+                                             elapsed)
+  print '%d decisions in %d batches (%.1f per batch)' % (stats['decisions'],
+                                                         stats['batches'],
+                                                         stats['meanBatch'])
+  print '%.0f decisions/s, delay %.2f ms mean, %.2f ms max' % \
+        (stats['throughput'], 1000*stats['meanDelay'], 1000*stats['maxDelay'])
@@ -0,0 +1,259 @@
+#!/usr/bin/python
+
+###############################################
+# simulate.py
+# plays many bot games on all cores and tallies
+# the score sheets
+###############################################
+
+import sys, time, random, multiprocessing
+import bots
+from engine import Engine
+from seeds import newSeed, deriveSeed, PLAYER_STREAM
+
+#
+# default number of games per work unit
+#
+CHUNK_SIZE = 50
+
+
+#
+# Tally class
+# the sum of the score sheets of many games
+#
+# Attributes:
+#   numPlayers
+#     number of players per game
+#
+#   numGames
+#     number of games tallied
+#
+#   wins
+#     number of games won by each seat
+#
+#   sheet
+#     summed score sheet, shaped like GameState.getScoreSheet():
+#     a list of (numCards, [ (bids, tricks, score), ... ]) with one
+#     entry per hand and one triple per seat, each value summed over
+#     all games
+#
+#   made
+#     made[hand][seat] is the number of games seat made its bid exactly
+#
+class Tally:
+
+  def __init__( self, numPlayers ):
+    self.numPlayers = numPlayers
+    self.numGames = 0
+    self.wins = [0] * numPlayers
+    self.sheet = []
+    self.made = []
+
+  #
+  # add a finished game
+  # Parameters:
+  #   gameState - GameState of game
+  #   winner    - index of winner
+  #
+  def addGame( self, gameState, winner ):
+    self.numGames = self.numGames + 1
+    self.wins[winner] = self.wins[winner] + 1
+    i = 0
+    for numCards, handScore in gameState.getScoreSheet():
+      if i == len(self.sheet):
+        self.sheet.append( (numCards, [ (0, 0, 0) ] * self.numPlayers) )
+        self.made.append( [0] * self.numPlayers )
+      totals = self.sheet[i][1]
+      for seat in range(self.numPlayers):
+        bid, tricks, score = handScore[seat]
+        b, t, s = totals[seat]
+        totals[seat] = (b + bid, t + tricks, s + score)
+        if bid == tricks:
+          self.made[i][seat] = self.made[i][seat] + 1
+      i = i + 1
+
+  #
+  # add the games of another tally
+  #
+  def merge( self, other ):
+    self.numGames = self.numGames + other.numGames
+    for seat in range(self.numPlayers):
+      self.wins[seat] = self.wins[seat] + other.wins[seat]
+    for i in range(len(other.sheet)):
+      if i == len(self.sheet):
+        self.sheet.append( (other.sheet[i][0],
+                            [ (0, 0, 0) ] * self.numPlayers) )
+        self.made.append( [0] * self.numPlayers )
+      totals = self.sheet[i][1]
+      for seat in range(self.numPlayers):
+        b, t, s = totals[seat]
+        ob, ot, os = other.sheet[i][1][seat]
+        totals[seat] = (b + ob, t + ot, s + os)
+        self.made[i][seat] = self.made[i][seat] + other.made[i][seat]
+
+  #
+  # return the average final score of each seat
+  #
+  def averageScores( self ):
+    if not self.sheet or not self.numGames:
+      return [0.0] * self.numPlayers
+    return [ float(score) / self.numGames
+             for bid, tricks, score in self.sheet[-1][1] ]
+
+
+#
+# set up a worker process
+# Parameter:
+#   modelFile - bid model file for HeuristicPlayer (None for none); each
+#               worker loads it, as workers do not always inherit the
+#               state of the parent
+#
+def initWorker( modelFile ):
+  if modelFile is not None:
+    import calibrate
+    bots.HeuristicPlayer.model = calibrate.loadModel(modelFile)
+
+#
+# play one work unit of games (runs in a worker process)
+# Parameter:
+#   unit - (seed, firstGame, numGames, botNames), botNames naming a
+#          class of bots.py for each seat; game n of the simulation is
+#          played with the game seed deriveSeed(seed, n)
+# Return value:
+#   Tally of the games
+#
+def playUnit( unit ):
+  seed, firstGame, numGames, botNames = unit
+  tally = Tally(len(botNames))
+  for game in range(firstGame, firstGame + numGames):
+    gameSeed = deriveSeed(seed, game)
+    rng = random.Random(deriveSeed(gameSeed, PLAYER_STREAM))
+    players = [ getattr(bots, botNames[seat])('seat%d' % seat, rng)
+                for seat in range(len(botNames)) ]
+    engine = Engine(players, seed = gameSeed)
+    winner = engine.playGame()
+    tally.addGame(engine.gameState, winner)
+  return tally
+
+#
+# split a simulation into work units
+# Parameters:
+#   numGames  - total number of games
+#   botNames  - bot class name for each seat
+#   seed      - seed of the simulation
+#   chunkSize - games per work unit
+# Return value:
+#   list of (seed, firstGame, numGames, botNames) work units; every game
+#   has its own seed, so the results do not depend on the chunk size or
+#   the number of processes
+#
+def makeUnits( numGames, botNames, seed, chunkSize ):
+  if seed is None:
+    seed = newSeed()
+  units = []
+  done = 0
+  while done < numGames:
+    n = min(chunkSize, numGames - done)
+    units.append( (seed, done, n, tuple(botNames)) )
+    done = done + n
+  return units
+
+#
+# run a simulation
+# Parameters:
+#   numGames  - total number of games
+#   botNames  - bot class name (from bots.py) for each seat
+#   seed      - seed of the simulation (None for a random one)
+#   processes - number of worker processes (None for one per core)
+#   chunkSize - games per work unit
+#   progress  - file to write a progress line to (None for no output)
+#   modelFile - bid model file for HeuristicPlayer (None for none)
+# Return value:
+#   merged Tally of all games
+#
+def simulate( numGames, botNames, seed = None, processes = None,
+              chunkSize = CHUNK_SIZE, progress = sys.stderr,
+              modelFile = None ):
+  units = makeUnits(numGames, botNames, seed, chunkSize)
+  tally = Tally(len(botNames))
+  pool = multiprocessing.Pool(processes, initWorker, (modelFile,))
+  start = time.time()
+  try:
+    for result in pool.imap_unordered(playUnit, units):
+      tally.merge(result)
+      if progress is not None:
+        elapsed = time.time() - start
+        progress.write('\r%d/%d games  %.1f games/s  '
+                       % (tally.numGames, numGames,
+                          tally.numGames / max(elapsed, 1e-9)))
+        progress.flush()
+  finally:
+    pool.terminate()
+  if progress is not None:
+    progress.write('\n')
+  return tally
+
+
+###############################################################
+# program code
+###############################################################
+
+def printUsage():
+  print 'Usage: simulate.py [-n <games>] [-b <bot,bot,...>] [-j <processes>]'
+  print '                   [-c <chunk size>] [-s <seed>] [-m <bid model file>]'
+  sys.exit(1)
+
+
+if __name__ == '__main__':
+  import getopt
+
+  numGames = 1000
+  botNames = [ 'RandomPlayer' ] * 4
+  processes = None
+  chunkSize = CHUNK_SIZE
+  seed = None
+  modelFile = None
+  try:
+    flags, args = getopt.getopt(sys.argv[1:], 'n:b:j:c:s:m:')
+    for flag, value in flags:
+      if flag == '-n':
+        numGames = int(value)
+      elif flag == '-b':
+        botNames = value.split(',')
+      elif flag == '-j':
+        processes = int(value)
+      elif flag == '-c':
+        chunkSize = int(value)
+      elif flag == '-s':
+        seed = int(value)
+      elif flag == '-m':
+        modelFile = value
+  except (getopt.GetoptError, ValueError):
+    printUsage()
+
+  if modelFile is not None:
+    # read it here once to report a bad file before starting the workers
+    import calibrate
+    try:
+      calibrate.loadModel(modelFile)
+    except (IOError, ValueError), e:
+      print 'Cannot read bid model:', e
+      sys.exit(1)
+
+  for name in botNames:
+    if not hasattr(bots, name):
+      print 'Unknown bot:', name
+      sys.exit(1)
+
+  start = time.time()
+  tally = simulate(numGames, botNames, seed, processes, chunkSize,
+                   modelFile = modelFile)
+  elapsed = time.time() - start
+
+  print '%d games in %.1f s (%.1f games/s)' % (tally.numGames, elapsed,
+                                               tally.numGames / elapsed)
+  print '%-6s %-14s %6s %10s' % ('Seat', 'Bot', 'Wins', 'Avg score')
+  scores = tally.averageScores()
+  for seat in range(len(botNames)):
+    print '%-6d %-14s %6d %10.1f' % (seat, botNames[seat], tally.wins[seat],
+                                     scores[seat])
@@ -0,0 +1,513 @@
+###############################################
+# solver.py
+# double dummy solver: the most tricks a seat can
+# take when every hand is visible
+#
+# The other seats are assumed to play together
+# against the seat being solved.  The search asks
+# "can the seat still take n tricks?" with an
+# alpha-beta search of a won/lost outcome, n going
+# up until the answer is no.
+#
+# Deals of up to 7 cards per player are solved in
+# well under a second.  Full 10-card deals are
+# not: 4-player ones take seconds and 5-player
+# ones far longer, so searches of them should be
+# given a node limit (see maxNodes).
+###############################################
+
+from card import *
+from position import fromHandState
+
+#
+# most buckets of a transposition table sized from the number of cards,
+# as a power of 2 (a smaller table costs 5-player 10-card deals several
+# times the nodes)
+#
+TABLE_BITS = 20
+
+#
+# fields of a transposition table entry
+#
+KEY, LOWER, UPPER, DEPTH = range(4)
+
+#
+# cache of packSuit results, emptied when it holds PACKED_SIZE entries
+#
+PACKED_SIZE = 1 << 18
+_packed = {}
+
+
+#
+# number of buckets of a transposition table for a hand, as a power of 2
+# Parameters:
+#   numCards - number of tricks left in the hand
+#
+def tableSize( numCards ):
+  return min(TABLE_BITS, max(4, 2*numCards))
+
+
+#
+# raised by a Solver that searches more positions than its node limit
+#
+class SearchLimit(Exception):
+  pass
+
+
+#
+# renumber the cards of a suit by rank among the cards left
+# Parameters:
+#   left  - 13 bit mask of the cards of the suit still in play
+#   cards - 13 bit mask of some of those cards
+# Return value:
+#   mask with bit i set if cards holds the i-th lowest card of left
+#
+def packBits( left, cards ):
+  packed = 0
+  i = 0
+  while left:
+    low = left & -left
+    if cards & low:
+      packed = packed | (1 << i)
+    left = left ^ low
+    i = i + 1
+  return packed
+
+#
+# renumber the cards of one suit of every hand by rank among the cards
+# left
+# Parameters:
+#   cards - tuple of 13 bit masks of the cards of the suit of each hand
+# Return value:
+#   tuple of the masks as packed by packBits
+#
+def packSuit( cards ):
+  packed = _packed.get(cards)
+  if packed is None:
+    left = 0
+    for mask in cards:
+      left = left | mask
+    packed = tuple([ packBits(left, mask) for mask in cards ])
+    if len(_packed) >= PACKED_SIZE:
+      _packed.clear()
+    _packed[cards] = packed
+  return packed
+
+
+#
+# number of tricks a player on lead can win in a row by cashing the runs
+# of top cards it holds
+# Parameters:
+#   hands     - bit masks of the cards held by every player
+#   player    - index of player on lead
+#   trumpSuit - suit of trump (-1 for no trump)
+#
+def cashTricks( hands, player, trumpSuit ):
+  hand = hands[player]
+  left = 0
+  for other in hands:
+    left = left | other
+  tricks = 0
+  for suit in range(4):
+    shift = 13*suit
+    cards = (hand >> shift) & 0x1FFF
+    if not cards:
+      continue
+    others = (left >> shift) & 0x1FFF & ~cards
+    run = popcount(cards >> others.bit_length())
+    if trumpSuit >= 0 and suit != trumpSuit:
+      # stop before a player that can trump runs out of the suit
+      trumpShift = 13*trumpSuit
+      for i in range(len(hands)):
+        if i != player and (hands[i] >> trumpShift) & 0x1FFF:
+          run = min(run, popcount((hands[i] >> shift) & 0x1FFF))
+    tricks = tricks + run
+  return tricks
+
+#
+# number of trumps of a player that are sure to win a trick
+# Parameters:
+#   mine   - 13 bit mask of the trumps of player
+#   theirs - 13 bit mask of the trumps of the other players
+# Return value:
+#   trumps of player less the most of them higher trumps can be
+#   matched against
+#
+def trumpWinners( mine, theirs ):
+  won = 0
+  rank = 12
+  higher = 0
+  while rank >= 0:
+    bit = 1 << rank
+    if theirs & bit:
+      higher = higher + 1
+    elif mine & bit:
+      if higher:
+        higher = higher - 1
+      else:
+        won = won + 1
+    rank = rank - 1
+  return won
+
+
+#
+# Solver class
+# double dummy search with a bounded transposition table
+#
+# The table has two entries per bucket: the first keeps the entry with
+# the most tricks left (the most search saved) and the second is replaced
+# by every entry that loses to the first.  Entries hold a lower and an
+# upper bound on the tricks the seat takes from a position at the start
+# of a trick.
+#
+# Attributes:
+#   tableBits
+#     number of buckets of the table, as a power of 2 (None to size it
+#     from the number of cards of the first hand solved with tableSize)
+#
+#   table
+#     transposition table, a list of [ key, lower, upper, depth ] entries
+#     (None for an empty entry; None until a hand is solved)
+#
+#   mask
+#     mask of the bits of a hash that index a bucket of the table
+#
+#   nodes
+#     number of positions searched
+#
+#   hits
+#     number of table lookups that ended a search
+#
+#   tablebase
+#     Tablebase with the results of the last tricks (or None)
+#
+#   maxNodes
+#     most positions searched before SearchLimit is raised (None for no
+#     limit)
+#
+class Solver:
+
+  #
+  # constructor
+  # Parameters:
+  #   tableBits - number of buckets of the table, as a power of 2 (None to
+  #               size it from the cards)
+  #   tablebase - Tablebase (see tablebase.py) to look up the last
+  #               tricks in instead of searching them (None for none)
+  #   maxNodes  - most positions to search (None for no limit)
+  #
+  def __init__( self, tableBits = None, tablebase = None,
+                maxNodes = None ):
+    self.tableBits = tableBits
+    self.tablebase = tablebase
+    self.maxNodes = maxNodes
+    self.clear()
+
+  #
+  # empty the transposition table and the counters
+  #
+  def clear( self ):
+    self.table = None
+    self.mask = 0
+    self.nodes = 0
+    self.hits = 0
+
+  #
+  # make the transposition table, if it has not been made or is too small
+  # for a position
+  # Parameters:
+  #   position - Position about to be solved
+  #
+  def makeTable( self, position ):
+    bits = self.tableBits
+    if bits is None:
+      bits = tableSize(position.tricksLeft())
+    if self.table is not None and (1 << bits) - 1 <= self.mask:
+      return
+    self.table = [None] * (2 << bits)
+    self.mask = (1 << bits) - 1
+
+  #
+  # most tricks a seat can take in a hand
+  # Parameters:
+  #   position - Position to solve from (not changed)
+  #   seat     - index of seat
+  # Return value:
+  #   tricks already won by seat plus the most it can take in the rest
+  #   of the hand
+  #
+  # Raises SearchLimit if the search runs past maxNodes.
+  #
+  def maxTricks( self, position, seat ):
+    self.makeTable(position)
+    position = position.clone()
+    self.seat = seat
+    tricks = 0
+    most = position.tricksLeft()
+    if not position.trick:
+      # the targets the sure tricks already settle need no search
+      tricks, most = self.sureTricks(position, most)
+    while tricks < most and self.search(position, tricks + 1):
+      tricks = tricks + 1
+    return position.tricksWon[seat] + tricks
+
+  #
+  # most tricks every seat can take in a hand
+  # Parameter:
+  #   position - Position to solve from (not changed)
+  # Return value:
+  #   list with the result of maxTricks for each seat
+  #
+  def solve( self, position ):
+    self.makeTable(position)
+    return [ self.maxTricks(position, seat)
+             for seat in range(position.numPlayers) ]
+
+  #
+  # can the seat take target more tricks from position?
+  #
+  def search( self, position, target ):
+    if target <= 0:
+      return 1
+    tricksLeft = position.numCards - len(position.tricks)
+    if target > tricksLeft:
+      return 0
+    self.nodes = self.nodes + 1
+    if self.maxNodes is not None and self.nodes > self.maxNodes:
+      raise SearchLimit('Searched more than %d positions' % self.maxNodes)
+
+    boundary = not position.trick
+    if boundary:
+      if self.tablebase is not None and tricksLeft <= self.tablebase.maxCards:
+        results = self.tablebase.results(position.hands, position.leader,
+                                         position.trumpSuit)
+        if results is not None:
+          return results[self.seat] >= target
+      key = self.positionKey(position)
+      entry = self.probe(key)
+      if entry is not None:
+        if entry[LOWER] >= target:
+          self.hits = self.hits + 1
+          return 1
+        if entry[UPPER] < target:
+          self.hits = self.hits + 1
+          return 0
+      lower, upper = self.sureTricks(position, tricksLeft)
+      if lower >= target:
+        return 1
+      if upper < target:
+        return 0
+
+    seat = self.seat
+    maximizing = position.toMove == seat
+    result = not maximizing
+    for card in self.orderMoves(position):
+      position.play(card)
+      if position.trick:
+        won = self.search(position, target)
+      else:
+        won = self.search(position, target - (position.leader == seat))
+      position.undo()
+      if won == maximizing:
+        result = won
+        break
+
+    if boundary:
+      if result:
+        self.store(key, target, tricksLeft, tricksLeft)
+      else:
+        self.store(key, 0, target - 1, tricksLeft)
+    return result
+
+  #
+  # key of a position at the start of a trick in the transposition table
+  #
+  # Only the order of the cards still held matters, so the cards of every
+  # suit are renumbered by rank among the cards left: positions that
+  # differ only in which low cards were played share a key.
+  #
+  def positionKey( self, position ):
+    hands = position.hands
+    return (self.seat, position.leader, position.trumpSuit,
+            packSuit(tuple([ hand & 0x1FFF for hand in hands ])),
+            packSuit(tuple([ (hand >> 13) & 0x1FFF for hand in hands ])),
+            packSuit(tuple([ (hand >> 26) & 0x1FFF for hand in hands ])),
+            packSuit(tuple([ hand >> 39 for hand in hands ])))
+
+  #
+  # bounds on the tricks the seat takes from the start of a trick, from
+  # the tricks some player is sure to win:
+  #   - the leader wins a trick with every card of a run of top cards it
+  #     can cash before an opponent is void and can trump
+  #   - a trump wins its trick unless a higher trump is played to it,
+  #     so a player wins as many tricks as it has trumps the other
+  #     players' higher trumps cannot all be matched against
+  # Return value:
+  #   (lower, upper) bounds
+  #
+  def sureTricks( self, position, tricksLeft ):
+    seat = self.seat
+    cashed = cashTricks(position.hands, position.leader, position.trumpSuit)
+    if position.trumpSuit < 0:
+      if position.leader == seat:
+        return cashed, tricksLeft
+      return 0, tricksLeft - cashed
+
+    hands = position.hands
+    shift = 13*position.trumpSuit
+    trumps = [ (hand >> shift) & 0x1FFF for hand in hands ]
+    allTrumps = 0
+    for mask in trumps:
+      allTrumps = allTrumps | mask
+    lower = 0
+    others = 0
+    for player in range(len(hands)):
+      won = trumpWinners(trumps[player], allTrumps & ~trumps[player])
+      if player == seat:
+        lower = won
+      else:
+        others = others + won
+    if position.leader == seat:
+      lower = max(lower, cashed)
+    else:
+      others = max(others, cashed)
+    return lower, tricksLeft - others
+
+  #
+  # cards worth trying for the player to move, leaving out all but the
+  # highest of cards that are equivalent (no card still in play ranks
+  # between them), best guesses first
+  #
+  def orderMoves( self, position ):
+    legal = position.legalMoves()
+    present = 0
+    for hand in position.hands:
+      present = present | hand
+    for player, card in position.trick:
+      present = present | (1 << card)
+
+    cards = []
+    for card in iterCards(legal):
+      higher = present & SUIT_MASKS[CARD_SUIT[card]] & ~((2 << card) - 1)
+      if not (higher & -higher & legal):
+        cards.append(card)
+
+    trick = position.trick
+    seat = self.seat
+    trumpSuit = position.trumpSuit
+    if not trick:
+      if position.toMove == seat:
+        # lead the highest cards first
+        cards.sort(key = lambda card: -CARD_RANK[card])
+      else:
+        # lead cards the seat cannot beat first
+        hand = position.hands[seat]
+        cards.sort(key = lambda card: (self.canBeat(hand, card, trumpSuit),
+                                       -CARD_RANK[card]))
+      return cards
+
+    winner = trickWinner(trick, trumpSuit)
+    for player, card in trick:
+      if player == winner:
+        best = card
+    if winner != seat and position.toMove != seat:
+      for player, card in trick:
+        if player == seat:
+          break
+      else:
+        if self.canBeat(position.hands[seat], best, trumpSuit,
+                        trick[0][1]):
+          # partner is winning but the seat can still beat it: play high
+          cards.sort(key = lambda card: -self.strength(card, trumpSuit))
+          return cards
+      # partner wins the trick: play low
+      cards.sort(key = lambda card: self.strength(card, trumpSuit))
+      return cards
+
+    # try the lowest card that wins the trick so far, then low cards
+    winners = []
+    others = []
+    for card in cards:
+      if beats(card, best, trumpSuit):
+        winners.append(card)
+      else:
+        others.append(card)
+    winners.sort(key = lambda card: self.strength(card, trumpSuit))
+    others.sort(key = lambda card: self.strength(card, trumpSuit))
+    return winners + others
+
+  #
+  # rank of a card for ordering moves, trumps above all other cards
+  #
+  def strength( self, card, trumpSuit ):
+    if CARD_SUIT[card] == trumpSuit:
+      return CARD_RANK[card] + 13
+    return CARD_RANK[card]
+
+  #
+  # can a hand beat the card winning a trick?
+  # Parameters:
+  #   hand      - bit mask of cards of hand
+  #   best      - card winning the trick
+  #   trumpSuit - suit of trump (-1 for no trump)
+  #   ledCard   - card led to the trick (-1 if best is being led)
+  #
+  def canBeat( self, hand, best, trumpSuit, ledCard = -1 ):
+    if ledCard < 0:
+      ledCard = best
+    legal = legalMask(hand, ledCard)
+    for card in iterCards(legal):
+      if beats(card, best, trumpSuit):
+        return 1
+    return 0
+
+  #
+  # look up a position in the transposition table
+  # Return value:
+  #   entry of position, None if not found
+  #
+  def probe( self, key ):
+    i = (hash(key) & self.mask) << 1
+    entry = self.table[i]
+    if entry is not None and entry[KEY] == key:
+      return entry
+    entry = self.table[i + 1]
+    if entry is not None and entry[KEY] == key:
+      return entry
+    return None
+
+  #
+  # add bounds for a position to the transposition table
+  # Parameters:
+  #   key   - key of position
+  #   lower - lower bound on the tricks the seat takes
+  #   upper - upper bound on the tricks the seat takes
+  #   depth - tricks left in position
+  #
+  def store( self, key, lower, upper, depth ):
+    entry = self.probe(key)
+    if entry is not None:
+      entry[LOWER] = max(entry[LOWER], lower)
+      entry[UPPER] = min(entry[UPPER], upper)
+      return
+    i = (hash(key) & self.mask) << 1
+    first = self.table[i]
+    if first is None or depth >= first[DEPTH]:
+      self.table[i + 1] = first
+      self.table[i] = [ key, lower, upper, depth ]
+    else:
+      self.table[i + 1] = [ key, lower, upper, depth ]
+
+
+#
+# solve a hand from its deal
+# Parameters:
+#   hand   - HandState, e.g. from a game log
+#   solver - Solver to use (None for a new one)
+# Return value:
+#   list of the most tricks each seat can take
+#
+def solveHand( hand, solver = None ):
+  if solver is None:
+    solver = Solver()
+  return solver.solve(fromHandState(hand, 0))
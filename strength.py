@@ -0,0 +1,198 @@
+###############################################
+# strength.py
+# vectorized (NumPy) hand strength: expected
+# tricks of many hands at once from table
+# lookups, for bots that bid every hand
+#
+# A hand is scored as a weighted sum of a few
+# counts: its high cards outside trumps, its
+# trumps by rank and the ruffs its short suits
+# allow.  The counts come from per-card tables
+# indexed by trump suit, so a batch of hands is
+# a handful of array operations.
+#
+# The one-hand functions (handFeatures,
+# handStrength, strengthBid) are plain Python;
+# only the batch functions need NumPy.
+###############################################
+
+try:
+  import numpy
+except ImportError:
+  numpy = None
+
+from card import *
+
+#
+# names of the features of a hand, in the order of the columns of
+# features() and of the weights
+#
+FEATURES = [ 'bias', 'aces', 'kings', 'queens', 'topTrumps', 'midTrumps',
+             'lowTrumps', 'ruffs' ]
+
+BIAS, ACES, KINGS, QUEENS, TOP_TRUMPS, MID_TRUMPS, LOW_TRUMPS, RUFFS = \
+      range(len(FEATURES))
+
+#
+# default tricks per unit of each feature
+#
+WEIGHTS = [ 0.0, 0.8, 0.35, 0.1, 0.95, 0.6, 0.3, 0.45 ]
+
+#
+# feature counted for each card: CARD_FEATURE_LISTS[trumpSuit + 1][card]
+# (no trump is trumpSuit -1), BIAS for cards that count for nothing
+#
+CARD_FEATURE_LISTS = []
+for trumpSuit in range(-1, 4):
+  row = []
+  for card in range(52):
+    rank = CARD_RANK[card]
+    if CARD_SUIT[card] == trumpSuit:
+      if rank >= 11:
+        feature = TOP_TRUMPS
+      elif rank >= 9:
+        feature = MID_TRUMPS
+      else:
+        feature = LOW_TRUMPS
+    else:
+      feature = { 12: ACES, 11: KINGS, 10: QUEENS }.get(rank, BIAS)
+    row.append(feature)
+  CARD_FEATURE_LISTS.append(row)
+del row
+
+#
+# CARD_FEATURE_LISTS and the suit of each card packed in one word, 4 bits
+# per count: bits 4*f count feature f (cards of BIAS are not counted) and
+# bits SUIT_SHIFT + 4*s count suit s, so a hand is counted by summing its
+# words (no count can pass 13)
+#
+SUIT_SHIFT = 32
+if numpy is not None:
+  # CARD_FEATURE_LISTS as an array, CARD_FEATURE[trumpSuit + 1, card]
+  CARD_FEATURE = numpy.array(CARD_FEATURE_LISTS, numpy.uint8)
+  PACKED = numpy.zeros((5, 52), numpy.uint64)
+  for trumpSuit in range(-1, 4):
+    for card in range(52):
+      word = 1 << (SUIT_SHIFT + 4*CARD_SUIT[card])
+      feature = CARD_FEATURE_LISTS[trumpSuit + 1][card]
+      if feature != BIAS:
+        word = word | (1 << 4*feature)
+      PACKED[trumpSuit + 1, card] = word
+  FEATURE_SHIFTS = numpy.arange(0, 4*len(FEATURES), 4, dtype = numpy.uint64)
+  SUIT_SHIFTS = numpy.arange(SUIT_SHIFT, SUIT_SHIFT + 16, 4,
+                             dtype = numpy.uint64)
+
+
+#
+# features of a batch of hands (needs NumPy)
+# Parameters:
+#   hands - (..., numCards) array of cards
+#   trump - array of trump cards of the same shape less the last axis (or
+#           a scalar), -1 for no trump
+# Return value:
+#   (..., len(FEATURES)) float array of feature values
+#
+def features( hands, trump ):
+  hands = numpy.asarray(hands, numpy.intp)
+  trump = numpy.asarray(trump, numpy.intp)
+  trumpSuit = numpy.where(trump < 0, -1, trump // 13)
+  trumpSuit = numpy.broadcast_to(trumpSuit, hands.shape[:-1])
+
+  packed = PACKED[trumpSuit[..., numpy.newaxis] + 1, hands].sum(axis = -1,
+                                                      dtype = numpy.uint64)
+  packed = packed[..., numpy.newaxis]
+  counts = ((packed >> FEATURE_SHIFTS) & 15).astype(numpy.float64)
+  counts[..., BIAS] = 1.0
+
+  # each void outside trumps can be ruffed twice and each singleton once,
+  # as long as there are trumps to spare
+  lengths = ((packed >> SUIT_SHIFTS) & 15).astype(numpy.intp)
+  short = numpy.maximum(2 - lengths, 0)
+  trumpShort = numpy.take_along_axis(short, numpy.maximum(trumpSuit, 0)
+                                     [..., numpy.newaxis], -1)[..., 0]
+  slots = numpy.where(trumpSuit < 0, 0, short.sum(axis = -1) - trumpShort)
+  counts[..., RUFFS] = numpy.minimum(slots, counts[..., MID_TRUMPS]
+                                     + counts[..., LOW_TRUMPS])
+  return counts
+
+#
+# expected tricks of a batch of hands (needs NumPy)
+# Parameters:
+#   hands   - (..., numCards) array of cards
+#   trump   - trump cards (see features)
+#   weights - tricks per unit of each feature
+# Return value:
+#   array of expected tricks, between 0 and numCards
+#
+def expectedTricks( hands, trump, weights = WEIGHTS ):
+  hands = numpy.asarray(hands)
+  tricks = features(hands, trump).dot(weights)
+  return numpy.clip(tricks, 0, hands.shape[-1])
+
+#
+# features of one hand, the same as features() without the cost of
+# making arrays for a single hand
+# Parameters:
+#   hand  - bit mask of cards
+#   trump - trump card (-1 for no trump)
+# Return value:
+#   list of feature values
+#
+def handFeatures( hand, trump ):
+  trumpSuit = -1
+  if trump >= 0:
+    trumpSuit = CARD_SUIT[trump]
+  table = CARD_FEATURE_LISTS[trumpSuit + 1]
+  counts = [0] * len(FEATURES)
+  for card in iterCards(hand):
+    counts[table[card]] = counts[table[card]] + 1
+  counts[BIAS] = 1
+  if trumpSuit >= 0:
+    slots = 0
+    for suit in range(4):
+      if suit != trumpSuit:
+        slots = slots + max(2 - popcount(hand & SUIT_MASKS[suit]), 0)
+    counts[RUFFS] = min(slots, counts[MID_TRUMPS] + counts[LOW_TRUMPS])
+  return counts
+
+#
+# expected tricks of one hand
+# Parameters:
+#   hand    - bit mask of cards
+#   trump   - trump card (-1 for no trump)
+#   weights - tricks per unit of each feature
+#
+def handStrength( hand, trump, weights = WEIGHTS ):
+  tricks = 0.0
+  for weight, count in zip(weights, handFeatures(hand, trump)):
+    tricks = tricks + weight*count
+  return min(max(tricks, 0.0), popcount(hand))
+
+#
+# bid for a number of expected tricks: rounded, or the nearest other bid
+# if that one is forbidden
+# Parameters:
+#   tricks    - expected tricks of the hand
+#   numCards  - number of cards in the hand
+#   forbidden - bid the player may not make (-1 for none)
+#
+def tricksToBid( tricks, numCards, forbidden = -1 ):
+  bid = int(tricks + 0.5)
+  if bid == forbidden:
+    if tricks < bid and bid > 0 or bid == numCards:
+      bid = bid - 1
+    else:
+      bid = bid + 1
+  return bid
+
+#
+# bid of one hand (see tricksToBid)
+# Parameters:
+#   hand      - bit mask of cards
+#   trump     - trump card (-1 for no trump)
+#   forbidden - bid the player may not make (-1 for none)
+#   weights   - tricks per unit of each feature
+#
+def strengthBid( hand, trump, forbidden = -1, weights = WEIGHTS ):
+  return tricksToBid(handStrength(hand, trump, weights), popcount(hand),
+                     forbidden)
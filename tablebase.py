@@ -0,0 +1,399 @@
+#!/usr/bin/python
+
+###############################################
+# tablebase.py
+# precomputed double dummy results for the last
+# tricks of a hand, in a file read through mmap
+#
+# Every process that opens a tablebase maps the
+# same file, so the table is loaded once into the
+# page cache whatever the number of solvers and
+# bots, and opening it costs nothing.
+###############################################
+#
+# A position at the start of a trick is stored in a canonical form:
+#
+#   - players are numbered from the leader (the leader is player 0)
+#   - the cards of each suit still in play are renumbered by rank, and a
+#     suit is written as the tuple of the players holding its cards,
+#     lowest card first
+#   - the trump suit comes first (empty without trump), then the other
+#     suits ordered by length and then by tuple, highest first
+#
+# Only the order of the cards left and who holds them matter to the play,
+# so all positions with the same canonical form have the same result.
+# The result of a position is the most tricks each player can take in the
+# rest of the hand, the other players playing together against it (as
+# solver.py computes).
+#
+# File layout (little endian):
+#   header - magic 'OHTB', version (H), number of players (B), most cards
+#            per player (B), number of slots (I)
+#   slots  - open addressing hash table of (key (Q), results (I)) entries,
+#            key 0 for an empty slot; the results hold 4 bits per player
+#            numbered from the leader
+#
+
+import sys, mmap, struct
+from card import *
+from position import Position
+from seeds import mix64
+
+MAGIC = 'OHTB'
+VERSION = 1
+HEADER = struct.Struct('<4sHBBI')
+ENTRY = struct.Struct('<QI')
+
+
+#
+# canonical form of a position at the start of a trick
+# Parameters:
+#   hands     - bit masks of the cards held by every player
+#   leader    - index of player to lead
+#   trumpSuit - suit of trump (-1 for no trump)
+# Return value:
+#   (trump suit, other suits) tuple of suits as described above
+#
+def canonicalForm( hands, leader, trumpSuit ):
+  numPlayers = len(hands)
+  left = 0
+  for hand in hands:
+    left = left | hand
+  suits = []
+  for suit in range(4):
+    owners = []
+    for card in iterCards(left & SUIT_MASKS[suit]):
+      bit = 1 << card
+      player = 0
+      while not hands[player] & bit:
+        player = player + 1
+      owners.append( (player - leader) % numPlayers )
+    suits.append(tuple(owners))
+  if trumpSuit >= 0:
+    trump = suits.pop(trumpSuit)
+    suits.append( () )
+  else:
+    trump = ()
+  suits.sort(key = lambda owners: (len(owners), owners), reverse = True)
+  return (trump, tuple(suits))
+
+#
+# 64 bit key of a canonical form: the length of each suit (4 bits) then
+# its players (3 bits each)
+#
+def formKey( form ):
+  key = 0
+  trump, others = form
+  for owners in (trump,) + others:
+    key = (key << 4) | len(owners)
+    for player in owners:
+      key = (key << 3) | player
+  return key
+
+#
+# pack the results of a position (numbered from the leader) into 32 bits
+#
+def packResults( results ):
+  packed = 0
+  for i in range(len(results)):
+    packed = packed | (results[i] << (4*i))
+  return packed
+
+#
+# unpack results packed by packResults
+#
+def unpackResults( packed, numPlayers ):
+  return [ (packed >> (4*i)) & 0xF for i in range(numPlayers) ]
+
+
+#
+# Tablebase class
+# read only view of a tablebase file
+#
+# Attributes:
+#   numPlayers
+#     number of players of the positions in the table
+#
+#   maxCards
+#     positions with up to this many cards per player are in the table
+#
+#   numSlots
+#     size of the hash table (a power of 2)
+#
+class Tablebase:
+
+  #
+  # constructor
+  # Parameter:
+  #   fileName - name of a file written by writeTablebase
+  #
+  def __init__( self, fileName ):
+    self.file = open(fileName, 'rb')
+    self.data = mmap.mmap(self.file.fileno(), 0, access = mmap.ACCESS_READ)
+    if len(self.data) < HEADER.size:
+      raise ValueError('Not a tablebase file: ' + fileName)
+    magic, version, self.numPlayers, self.maxCards, self.numSlots = \
+           HEADER.unpack_from(self.data, 0)
+    if magic != MAGIC or version != VERSION:
+      raise ValueError('Not a tablebase file: ' + fileName)
+    if len(self.data) != HEADER.size + self.numSlots*ENTRY.size:
+      raise ValueError('Truncated tablebase file: ' + fileName)
+    self.mask = self.numSlots - 1
+
+  #
+  # find the packed results of a key
+  # Return value:
+  #   packed results, None if the key is not in the table
+  #
+  def probe( self, key ):
+    i = mix64(key) & self.mask
+    while 1:
+      entry, packed = ENTRY.unpack_from(self.data, HEADER.size +
+                                        i*ENTRY.size)
+      if entry == key:
+        return packed
+      if entry == 0:
+        return None
+      i = (i + 1) & self.mask
+
+  #
+  # most tricks each player can take from the start of a trick
+  # Parameters:
+  #   hands     - bit masks of the cards held by every player
+  #   leader    - index of player to lead
+  #   trumpSuit - suit of trump (-1 for no trump)
+  # Return value:
+  #   list of tricks for each player, None if the position is not in
+  #   the table
+  #
+  def results( self, hands, leader, trumpSuit ):
+    numPlayers = len(hands)
+    if numPlayers != self.numPlayers:
+      return None
+    packed = self.probe(formKey(canonicalForm(hands, leader, trumpSuit)))
+    if packed is None:
+      return None
+    results = unpackResults(packed, numPlayers)
+    return [ results[(player - leader) % numPlayers]
+             for player in range(numPlayers) ]
+
+  #
+  # most tricks each player can take in the rest of the hand of a
+  # Position
+  # Return value:
+  #   list of tricks for each player (not counting tricks already won),
+  #   None if the position is in the middle of a trick or not in the
+  #   table
+  #
+  def lookup( self, position ):
+    if position.trick or position.tricksLeft() > self.maxCards:
+      return None
+    return self.results(position.hands, position.leader, position.trumpSuit)
+
+  def close( self ):
+    self.data.close()
+    self.file.close()
+
+
+###############################################################
+# generator
+###############################################################
+
+#
+# all ways to hand out a row of cards
+# Parameters:
+#   counts - number of cards still to give each player (changed while
+#            the generator runs)
+#   length - number of cards in the row (the sum of counts)
+# Return value:
+#   generator of tuples of player indexes
+#
+def _deals( counts, length ):
+  if length == 0:
+    yield ()
+    return
+  for player in range(len(counts)):
+    if counts[player]:
+      counts[player] = counts[player] - 1
+      for rest in _deals(counts, length - 1):
+        yield (player,) + rest
+      counts[player] = counts[player] + 1
+
+#
+# lengths of the four non trump suits, longest first
+#
+def _lengths( total, parts, most ):
+  if parts == 0:
+    if total == 0:
+      yield ()
+    return
+  for length in range(min(total, most), -1, -1):
+    for rest in _lengths(total - length, parts - 1, length):
+      yield (length,) + rest
+
+#
+# every canonical form of positions with numCards cards per player
+# Return value:
+#   generator of canonical forms
+#
+def canonicalForms( numPlayers, numCards ):
+  total = numPlayers*numCards
+  for numTrumps in range(min(total, 13) + 1):
+    for lengths in _lengths(total - numTrumps, 4, 13):
+      if numTrumps and lengths[3]:
+        continue
+      for owners in _deals([numCards] * numPlayers, total):
+        trump = owners[:numTrumps]
+        others = []
+        start = numTrumps
+        for length in lengths:
+          others.append(owners[start:start + length])
+          start = start + length
+        for i in range(3):
+          if (len(others[i]) == len(others[i + 1])
+              and others[i] < others[i + 1]):
+            break
+        else:
+          yield (trump, tuple(others))
+
+#
+# build a Position from a canonical form (player 0 on lead, the trump suit
+# in suit 0)
+#
+def formPosition( form, numPlayers ):
+  trump, others = form
+  hands = [0] * numPlayers
+  if trump:
+    suits = (trump,) + others[:3]
+    trumpCard = 12
+  else:
+    suits = others
+    trumpCard = -1
+  for suit in range(4):
+    for rank in range(len(suits[suit])):
+      player = suits[suit][rank]
+      hands[player] = hands[player] | (1 << (13*suit + rank))
+  return Position(hands, trumpCard, numPlayers - 1)
+
+#
+# solve a position at the start of a trick from the results of the
+# positions with one card less per player
+# Parameters:
+#   position - Position at the start of a trick
+#   table    - dict from key to packed results of the smaller positions
+# Return value:
+#   list of most tricks for each player
+#
+def solveTrick( position, table ):
+  numPlayers = position.numPlayers
+  mover = position.toMove
+  best = None
+  for card in iterCards(position.legalMoves()):
+    position.play(card)
+    if position.trick:
+      results = solveTrick(position, table)
+    elif position.isOver():
+      results = [0] * numPlayers
+      results[position.leader] = 1
+    else:
+      leader = position.leader
+      form = canonicalForm(position.hands, leader, position.trumpSuit)
+      packed = unpackResults(table[formKey(form)], numPlayers)
+      results = [ packed[(player - leader) % numPlayers]
+                  for player in range(numPlayers) ]
+      results[leader] = results[leader] + 1
+    position.undo()
+    if best is None:
+      best = results
+    else:
+      for player in range(numPlayers):
+        if player == mover:
+          best[player] = max(best[player], results[player])
+        else:
+          best[player] = min(best[player], results[player])
+  return best
+
+#
+# solve every canonical position up to a number of cards per player
+# Parameters:
+#   numPlayers - number of players
+#   maxCards   - most cards per player
+#   progress   - file to write progress to (None for no output)
+# Return value:
+#   dict from key to packed results
+#
+def generate( numPlayers, maxCards, progress = None ):
+  table = {}
+  for numCards in range(1, maxCards + 1):
+    count = 0
+    for form in canonicalForms(numPlayers, numCards):
+      position = formPosition(form, numPlayers)
+      table[formKey(form)] = packResults(solveTrick(position, table))
+      count = count + 1
+    if progress is not None:
+      progress.write('%d cards: %d positions\n' % (numCards, count))
+      progress.flush()
+  return table
+
+#
+# write a tablebase file
+# Parameters:
+#   fileName   - name of file
+#   numPlayers - number of players
+#   maxCards   - most cards per player
+#   table      - dict from key to packed results
+#
+def writeTablebase( fileName, numPlayers, maxCards, table ):
+  numSlots = 1
+  while numSlots < 2*len(table):
+    numSlots = numSlots*2
+  mask = numSlots - 1
+  slots = [ (0, 0) ] * numSlots
+  for key, packed in table.iteritems():
+    i = mix64(key) & mask
+    while slots[i][0]:
+      i = (i + 1) & mask
+    slots[i] = (key, packed)
+  file = open(fileName, 'wb')
+  file.write(HEADER.pack(MAGIC, VERSION, numPlayers, maxCards, numSlots))
+  for key, packed in slots:
+    file.write(ENTRY.pack(key, packed))
+  file.close()
+
+
+###############################################################
+# program code
+###############################################################
+
+def printUsage():
+  print 'Usage: tablebase.py -n <num_players> [-k <cards>] [-o <file>]'
+  sys.exit(1)
+
+
+if __name__ == '__main__':
+  import getopt
+
+  numPlayers = 0
+  maxCards = 2
+  fileName = None
+  try:
+    flags, args = getopt.getopt(sys.argv[1:], 'n:k:o:')
+    for flag, value in flags:
+      if flag == '-n':
+        numPlayers = int(value)
+      elif flag == '-k':
+        maxCards = int(value)
+      elif flag == '-o':
+        fileName = value
+  except (getopt.GetoptError, ValueError):
+    printUsage()
+  # keys have room for 14 cards of up to 8 players
+  if numPlayers < 2 or numPlayers > 8 or maxCards < 1 or \
+     numPlayers*maxCards > 14:
+    printUsage()
+  if fileName is None:
+    fileName = 'endgame-%dp-%dc.tb' % (numPlayers, maxCards)
+
+  table = generate(numPlayers, maxCards, sys.stderr)
+  writeTablebase(fileName, numPlayers, maxCards, table)
+  print 'Wrote', len(table), 'positions to', fileName
@@ -0,0 +1,191 @@
+###############################################
+# test_advisor.py
+# the LRU cache and the bid advisor's cached,
+# tabled and sampled advice
+###############################################
+
+import os, sys, unittest, random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+from card import *
+from canonical import canonicalize
+from engine import Engine, EnginePlayer
+from seeds import deriveSeed
+from advisor import LRUCache, BidAdvisor, engineHand
+import server
+
+#
+# seed of the test hands
+#
+TEST_SEED = 0xAD5
+
+#
+# random hand of numCards cards with a trump card
+#
+def randomHand( rng, numCards ):
+  cards = rng.sample(range(52), numCards + 1)
+  return sum([ 1 << card for card in cards[:numCards] ]), cards[numCards]
+
+#
+# socket of a client that bids the same every time, keeping the lines
+# sent to it
+#
+class FakeSocket:
+
+  def __init__( self, bid ):
+    self.bid = bid
+    self.lines = []
+
+  def send( self, text ):
+    self.lines.append(text)
+
+  def recv( self, size ):
+    return 'BID %d\n' % self.bid
+
+  def close( self ):
+    pass
+
+
+class LRUCacheTest(unittest.TestCase):
+
+  def testEvictionOrder( self ):
+    cache = LRUCache(3)
+    for key in 'abc':
+      cache.put(key, key.upper())
+    # a is used again, so b is the least recently used
+    self.assertEqual(cache.get('a'), 'A')
+    cache.put('d', 'D')
+    self.assertFalse('b' in cache)
+    self.assertEqual(sorted(cache.entries), ['a', 'c', 'd'])
+    # storing a key again uses it too
+    cache.put('c', 'C2')
+    cache.put('e', 'E')
+    self.assertEqual(sorted(cache.entries), ['c', 'd', 'e'])
+    self.assertEqual(cache.get('c'), 'C2')
+    self.assertEqual(len(cache), 3)
+    self.assertEqual(cache.evictions, 2)
+
+  def testCounters( self ):
+    cache = LRUCache(2)
+    self.assertEqual(cache.hitRate(), 0.0)
+    self.assertEqual(cache.get(1), None)
+    self.assertEqual(cache.get(1, 'default'), 'default')
+    cache.put(1, 'one')
+    cache.put(2, 'two')
+    self.assertEqual(cache.get(1), 'one')
+    cache.put(3, 'three')
+    self.assertEqual(cache.get(2), None)
+    self.assertEqual(cache.stats(),
+                     { 'size': 2, 'capacity': 2, 'hits': 1, 'misses': 3,
+                       'evictions': 1, 'hitRate': 0.25 })
+    cache.clear()
+    self.assertEqual(len(cache), 0)
+    self.assertEqual(cache.get(1), None)
+    self.assertEqual(cache.misses, 4)
+    self.assertRaises(ValueError, LRUCache, 0)
+
+
+class BidAdvisorTest(unittest.TestCase):
+
+  def testAdviseIsEstimate( self ):
+    # a hand not seen before is estimated in canonical form, with the
+    # seed of its key
+    rng = random.Random(TEST_SEED)
+    advisor = BidAdvisor(samples = 20, seed = 7)
+    for numPlayers, numCards, seat in [ (2, 3, 0), (3, 4, 2), (4, 5, 1) ]:
+      hand, trump = randomHand(rng, numCards)
+      bids = tuple([ rng.randint(0, numCards) for i in range(seat) ])
+      advice = advisor.advise(numPlayers, hand, trump, seat, bids)
+      (canonHand, canonTrump, canonSeat, canonBids), key = \
+                  canonicalize(hand, trump, seat, bids)
+      expected = advisor.estimate(numPlayers, canonHand, canonTrump,
+                                  canonSeat, canonBids,
+                                  random.Random(deriveSeed(7, key)))
+      self.assertEqual(advice.bid, expected.bid)
+      self.assertEqual(advice.made, expected.made)
+      self.assertEqual(advice.expected, expected.expected)
+
+  def testEstimate( self ):
+    rng = random.Random(TEST_SEED + 1)
+    advisor = BidAdvisor(samples = 20)
+    hand, trump = randomHand(rng, 3)
+    # the dealer of 2 players may not make the bid that adds up to 3
+    advice = advisor.estimate(2, hand, trump, 1, (1,), rng)
+    self.assertEqual(len(advice.made), 4)
+    self.assertEqual(advice.expected[2], None)
+    self.assertNotEqual(advice.bid, 2)
+    for made in advice.made:
+      self.assertTrue(0.0 <= made <= 1.0)
+    for bid in [0, 1, 3]:
+      self.assertTrue(advice.expected[advice.bid] >= advice.expected[bid])
+
+  def testLookup( self ):
+    # lookup only answers from the cache (without tables or a model), for
+    # the hand or any renaming of its suits
+    advisor = BidAdvisor(samples = 10)
+    hand = (1 << 0) | (1 << 14) | (1 << 40)
+    # suits 0 and 1 swapped
+    renamed = (1 << 13) | (1 << 1) | (1 << 40)
+    self.assertEqual(advisor.lookup(3, hand, 51, 0, ()), None)
+    advice = advisor.advise(3, hand, 51, 0, ())
+    self.assertTrue(advisor.lookup(3, hand, 51, 0, ()) is advice)
+    self.assertTrue(advisor.lookup(3, renamed, 51, 0, ()) is advice)
+    self.assertTrue(advisor.advise(3, renamed, 51, 0, ()) is advice)
+    self.assertEqual(advisor.lookup(4, hand, 51, 0, ()), None)
+    stats = advisor.stats()
+    self.assertEqual(stats['size'], 1)
+    self.assertEqual(stats['hits'], 3)
+
+  def testServerHint( self ):
+    # each bidder's hand is queued as soon as it is known, and BID waits
+    # a little for the hint
+    players = [ server.Player(FakeSocket(0), 'p%d' % i) for i in range(3) ]
+    engine = server.ServerEngine(players, seed = 1)
+    engine.startGame(0, 2)
+    saved = server.Player.advisor, server.HINT_WAIT
+    server.Player.advisor = BidAdvisor(samples = 10)
+    server.HINT_WAIT = 0.05
+    hint = lambda advice: 'BID_HINT %d %s\n' \
+           % (advice.bid, ' '.join([ str(int(round(100*made)))
+                                     for made in advice.made ]))
+    try:
+      engine.dealHand(2, [ [0, 14], [1, 27], [2, 40] ], 51)
+      self.assertEqual(server.Player.hints.keys(), [engineHand(engine, 0)])
+      server.adviseNext()
+      players[0].socket.lines = []
+      self.assertEqual(players[0].getBid(engine, 0), 0)
+      advice = server.Player.advisor.lookup(*engineHand(engine, 0))
+      self.assertEqual(players[0].socket.lines, [ hint(advice), 'BID\n' ])
+      # the worker's miss is the only one counted
+      self.assertEqual(server.Player.advisor.stats()['misses'], 1)
+
+      engine.bids[0] = 0
+      engine.broadcast('BID_ANNOUNCE', 0, 0)
+      self.assertTrue(engineHand(engine, 1) in server.Player.hints)
+      # not worked out in time: BID goes without a hint
+      players[1].socket.lines = []
+      self.assertEqual(players[1].getBid(engine, 1), 0)
+      self.assertEqual(players[1].socket.lines, ['BID\n'])
+      server.adviseNext()
+      players[1].socket.lines = []
+      self.assertEqual(players[1].getBid(engine, 1), 0)
+      advice = server.Player.hints[engineHand(engine, 1)]
+      self.assertEqual(players[1].socket.lines, [ hint(advice), 'BID\n' ])
+
+      # hands of an earlier deal are dropped
+      engine.bids[1] = 0
+      engine.broadcast('BID_ANNOUNCE', 1, 0)
+      engine.broadcast('NEW_HAND', 1, 0)
+      self.assertEqual(server.Player.hints, {})
+      server.adviseNext()
+      self.assertTrue(server.Player.pending.empty())
+      self.assertEqual(server.Player.advisor.stats()['misses'], 2)
+    finally:
+      server.Player.advisor, server.HINT_WAIT = saved
+      server.clearHints()
+      for player in players:
+        del server.Player.socketDictionary[player.socket]
+
+if __name__ == '__main__':
+  unittest.main()
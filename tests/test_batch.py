@@ -0,0 +1,163 @@
+###############################################
+# test_batch.py
+# batched trick winners and legal moves against
+# the one-at-a-time versions in card.py
+###############################################
+
+import os, sys, unittest, random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+from card import *
+from GameState import TrickState
+
+try:
+  import numpy
+  import batch
+except ImportError:
+  numpy = None
+
+#
+# seed of the test tricks
+#
+TEST_SEED = 0xBA7C
+
+#
+# random full tricks, their cards drawn from one to four suits so that
+# most of them follow the led suit or ruff it
+# Parameters:
+#   rng   - random.Random instance
+#   count - number of tricks
+# Return value:
+#   list of (cards, lead, trump) where cards[p] is played by player p and
+#   trump is a trump card (-1 for no trump)
+#
+def randomTricks( rng, count ):
+  tricks = []
+  for i in range(count):
+    numPlayers = rng.randint(2, 5)
+    suits = rng.sample(range(4), rng.randint(1, 4))
+    pool = [ card for card in range(52) if CARD_SUIT[card] in suits ]
+    if len(pool) < numPlayers + 1:
+      pool = range(52)
+    cards = rng.sample(pool, numPlayers + 1)
+    trump = cards.pop()
+    if rng.randrange(3) == 0:
+      trump = -1
+    tricks.append( (cards, rng.randrange(numPlayers), trump) )
+  return tricks
+
+
+class BatchTest(unittest.TestCase):
+
+  def setUp( self ):
+    if numpy is None:
+      self.skipTest('batch.py needs NumPy')
+
+  def testTrickWinners( self ):
+    rng = random.Random(TEST_SEED)
+    tricks = randomTricks(rng, 4000)
+    ruffed = 0
+    for numPlayers in range(2, 6):
+      group = [ trick for trick in tricks if len(trick[0]) == numPlayers ]
+      expected = []
+      for cards, lead, trump in group:
+        trick = TrickState()
+        for i in range(numPlayers):
+          player = (lead + i) % numPlayers
+          trick.addCard(player, cards[player])
+        expected.append(trick.getWinner(trump))
+        if trump >= 0:
+          winner = cards[expected[-1]]
+          if CARD_SUIT[winner] == CARD_SUIT[trump] and \
+             CARD_SUIT[cards[lead]] != CARD_SUIT[trump]:
+            ruffed = ruffed + 1
+        trumpSuit = -1
+        if trump >= 0:
+          trumpSuit = CARD_SUIT[trump]
+        self.assertEqual(trickWinner(trick.getCards(), trumpSuit),
+                         expected[-1])
+      trumpSuits = [ CARD_SUIT[trump] for cards, lead, trump in group ]
+      for i in range(len(group)):
+        if group[i][2] < 0:
+          trumpSuits[i] = -1
+      winners = batch.trickWinners([ cards for cards, lead, trump in group ],
+                                   [ lead for cards, lead, trump in group ],
+                                   trumpSuits)
+      self.assertEqual(list(winners), expected)
+    self.assertTrue(ruffed > 100)
+
+  def testTrickWinnersScalarTrump( self ):
+    # one trump suit, or none, for every trick
+    cards = [ [0, 12, 13], [5, 14, 3], [40, 41, 39] ]
+    lead = [1, 0, 2]
+    self.assertEqual(list(batch.trickWinners(cards, lead, -1)), [1, 0, 1])
+    self.assertEqual(list(batch.trickWinners(cards, lead, 1)), [2, 1, 1])
+
+  def testLegalMasks( self ):
+    rng = random.Random(TEST_SEED + 1)
+    hands = []
+    ledCards = []
+    for i in range(2000):
+      cards = rng.sample(range(52), rng.randint(1, 14))
+      ledCards.append(cards.pop())
+      if rng.randrange(4) == 0:
+        ledCards[-1] = -1
+      hands.append(sum([ 1 << card for card in cards ]))
+    masks = batch.legalMasks(hands, ledCards)
+    self.assertEqual([ int(mask) for mask in masks ],
+                     [ legalMask(hand, led)
+                       for hand, led in zip(hands, ledCards) ])
+
+  def testGenerateDecks( self ):
+    # the decks of a seed are shuffled decks, whatever the chunk size
+    decks = numpy.concatenate(list(batch.generateDecks(1000, TEST_SEED)))
+    self.assertEqual(decks.shape, (1000, 52))
+    self.assertEqual(decks.dtype, numpy.uint8)
+    self.assertTrue((numpy.sort(decks, axis=1) == numpy.arange(52)).all())
+    for chunkSize in [1, 7, 256, 5000]:
+      chunks = list(batch.generateDecks(1000, TEST_SEED, chunkSize))
+      self.assertTrue(max([ len(chunk) for chunk in chunks ]) <= chunkSize)
+      self.assertTrue((numpy.concatenate(chunks) == decks).all())
+    other = numpy.concatenate(list(batch.generateDecks(1000, TEST_SEED + 1)))
+    self.assertFalse((other == decks).all())
+    # every card turns up in every place about equally often
+    counts = numpy.zeros((52, 52))
+    for chunk in batch.generateDecks(20000, TEST_SEED):
+      for place in range(52):
+        counts[place] += numpy.bincount(chunk[:, place], minlength=52)
+    self.assertTrue(abs(counts - 20000 / 52.0).max() < 100)
+
+  def testDealDecks( self ):
+    # dealt as Deck.deal deals the same deck, with no trump on 10 card
+    # hands or when the deck runs out
+    rng = random.Random(TEST_SEED + 2)
+    decks = numpy.concatenate(list(batch.generateDecks(50, TEST_SEED)))
+    for numPlayers, numCards in [ (2, 13), (3, 7), (4, 10), (5, 10),
+                                  (4, 13), (6, 8) ]:
+      dealers = [ rng.randrange(numPlayers) for i in range(len(decks)) ]
+      for dealer in [ numpy.array(dealers), dealers[0] ]:
+        hands, trumps = batch.dealDecks(decks, numPlayers, numCards, dealer)
+        self.assertEqual(hands.shape, (len(decks), numPlayers, numCards))
+        for n in range(len(decks)):
+          if isinstance(dealer, int):
+            dealers[n] = dealer
+          deck = Deck(0)
+          deck.deck = [ int(card) for card in decks[n] ]
+          expected, trump = deck.deal(numPlayers, numCards,
+                                      (dealers[n] + 1) % numPlayers)
+          if numCards == 10:
+            trump = -1
+          self.assertEqual(hands[n].tolist(), expected)
+          self.assertEqual(int(trumps[n]), trump)
+    self.assertRaises(ValueError, batch.dealDecks, decks, 5, 11, 0)
+    # generateDeals deals the decks of generateDecks
+    for deals, chunk in zip(batch.generateDeals(300, 4, 9, 2, TEST_SEED, 128),
+                            batch.generateDecks(300, TEST_SEED, 128)):
+      hands, trumps = batch.dealDecks(chunk, 4, 9, 2)
+      self.assertTrue((deals[0] == hands).all())
+      self.assertTrue((deals[1] == trumps).all())
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,115 @@
+###############################################
+# test_bidtables.py
+# hand classes, table rows and the bid table
+# file written and read back
+###############################################
+
+import os, sys, unittest, random, tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+from card import *
+import bidtables
+from bidtables import handClass, rowIndex, blockRows, quantize, \
+                      TRUMP_CLASSES, STRENGTH_CLASSES
+
+#
+# seed of the test hands
+#
+TEST_SEED = 0xB1D7
+
+#
+# bit mask of a list of cards
+#
+def mask( cards ):
+  return sum([ 1 << card for card in cards ])
+
+
+class BidTablesTest(unittest.TestCase):
+
+  def testHandClass( self ):
+    # ace, king, queen and jack of suit 1 and the ace of suit 2
+    hand = mask([25, 24, 23, 22, 38, 0])
+    self.assertEqual(handClass(hand, -1), (0, 7))
+    self.assertEqual(handClass(hand, 13), (4, 7))
+    self.assertEqual(handClass(hand, 26), (1, 7))
+    self.assertEqual(handClass(hand, 39), (0, 7))
+    self.assertEqual(handClass(mask([0, 1, 2]), 3), (3, 0))
+    # both classes are capped
+    self.assertEqual(handClass(mask(range(13)), 13), (0, 5))
+    self.assertEqual(handClass(mask(range(13)), 0), (TRUMP_CLASSES - 1, 5))
+    honours = mask([ 13*suit + rank for suit in range(4)
+                     for rank in range(9, 13) ])
+    self.assertEqual(handClass(honours, -1), (0, STRENGTH_CLASSES - 1))
+    rng = random.Random(TEST_SEED)
+    for i in range(500):
+      cards = rng.sample(range(52), rng.randint(1, 11))
+      trumpClass, strengthClass = handClass(mask(cards[1:]), cards[0])
+      self.assertTrue(0 <= trumpClass < TRUMP_CLASSES)
+      self.assertTrue(0 <= strengthClass < STRENGTH_CLASSES)
+
+  def testRowIndex( self ):
+    # one row for each seat, class and bid, filling the block
+    for numPlayers, numCards in [ (3, 1), (4, 7), (5, 10) ]:
+      rows = [ rowIndex(numCards, seat, trumpClass, strengthClass, bid)
+               for seat in range(numPlayers)
+               for trumpClass in range(TRUMP_CLASSES)
+               for strengthClass in range(STRENGTH_CLASSES)
+               for bid in range(numCards + 1) ]
+      self.assertEqual(rows, range(blockRows(numPlayers, numCards)))
+
+  def testQuantize( self ):
+    rng = random.Random(TEST_SEED + 1)
+    self.assertEqual(quantize([0, 0, 0]), [0, 0, 0])
+    self.assertEqual(quantize([1, 1, 1]), [85, 85, 85])
+    self.assertEqual(quantize([0, 7, 0]), [0, 255, 0])
+    for i in range(500):
+      row = [ rng.randint(0, rng.choice([1, 10, 10000]))
+              for tricks in range(rng.randint(2, 11)) ]
+      scaled = quantize(row)
+      if not sum(row):
+        continue
+      self.assertEqual(sum(scaled), 255)
+      for count, byte in zip(row, scaled):
+        self.assertTrue(abs(byte - 255.0*count / sum(row)) < 1)
+
+  def testFileRoundTrip( self ):
+    tables = {}
+    for numPlayers, numCards in [ (2, 1), (3, 2) ]:
+      unit = (numPlayers, numCards, TEST_SEED, 0, 30)
+      tables[(numPlayers, numCards)] = bidtables.buildUnit(unit)[2]
+    fd, fileName = tempfile.mkstemp('.tbl')
+    os.close(fd)
+    try:
+      bidtables.writeTables(fileName, tables)
+      table = bidtables.BidTables(fileName)
+      rng = random.Random(TEST_SEED + 2)
+      found = 0
+      for i in range(200):
+        numPlayers, numCards = rng.choice(tables.keys())
+        cards = rng.sample(range(52), numCards + 1)
+        hand, trump = mask(cards[1:]), cards[0]
+        seat = rng.randrange(numPlayers)
+        bid = rng.randint(0, numCards)
+        row = tables[(numPlayers, numCards)][rowIndex(numCards, seat,
+                                                     *(handClass(hand, trump)
+                                                       + (bid,)))]
+        chances = table.distribution(numPlayers, hand, trump, seat, bid)
+        if not sum(row):
+          self.assertEqual(chances, None)
+          continue
+        found = found + 1
+        self.assertEqual(chances, [ byte / 255.0 for byte in quantize(row) ])
+      self.assertTrue(found > 50)
+      self.assertEqual(table.distribution(4, mask([0]), 1, 0, 0), None)
+      table.close()
+      # a cut file is refused
+      data = open(fileName, 'rb').read()
+      open(fileName, 'wb').write(data[:-1])
+      self.assertRaises(ValueError, bidtables.BidTables, fileName)
+    finally:
+      os.remove(fileName)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,159 @@
+###############################################
+# test_calibrate.py
+# the bid model fit on hands of known weights,
+# model files and reading the game archive
+###############################################
+
+import os, sys, unittest, random, tempfile, shutil
+from StringIO import StringIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+from card import *
+from GameState import HandState
+import strength, pipeline
+
+try:
+  import numpy
+  import calibrate
+except ImportError:
+  numpy = None
+
+#
+# seed of the test hands
+#
+TEST_SEED = 0xCA1B
+
+#
+# weights the tricks of the synthetic hands are made from, by number of
+# players (whole numbers, so the tricks are too)
+#
+TRUE_WEIGHTS = { 3: [1, 1, 0, 0, 1, 0, 0, 1],
+                 4: [0, 1, 1, 0, 1, 1, 0, 0] }
+
+#
+# random hands whose tricks are their features times TRUE_WEIGHTS
+# Parameters:
+#   rng        - random.Random instance
+#   numPlayers - number of players
+#   count      - number of hands
+# Return value:
+#   list of HandStates
+#
+def syntheticHands( rng, numPlayers, count ):
+  result = []
+  for i in range(count):
+    numCards = rng.randint(1, 10)
+    cards = rng.sample(range(52), numPlayers*numCards + 1)
+    trump = cards.pop()
+    if rng.randrange(4) == 0:
+      trump = -1
+    hand = HandState(numPlayers, numCards, trump, 0)
+    for player in range(numPlayers):
+      dealt = cards[player*numCards:(player + 1)*numCards]
+      features = strength.handFeatures(sum([ 1 << card for card in dealt ]),
+                                       trump)
+      hand.setHand(player, dealt)
+      hand.setTricksMade(player,
+                         sum([ f*w for f, w in
+                               zip(features, TRUE_WEIGHTS[numPlayers]) ]))
+    result.append(hand)
+  return result
+
+
+class CalibrateTest(unittest.TestCase):
+
+  def setUp( self ):
+    if numpy is None:
+      self.skipTest('calibrate.py needs NumPy')
+    self.dir = tempfile.mkdtemp()
+
+  def tearDown( self ):
+    shutil.rmtree(self.dir)
+
+  def testFit( self ):
+    rng = random.Random(TEST_SEED)
+    trainer = calibrate.Trainer()
+    for numPlayers in TRUE_WEIGHTS:
+      for hand in syntheticHands(rng, numPlayers, 300):
+        trainer.addHand(hand)
+    # an unfinished hand is left out
+    hand = syntheticHands(rng, 3, 1)[0]
+    hand.setTricksMade(0, -1)
+    trainer.addHand(hand)
+    self.assertEqual(list(trainer.hands), [2100, 0, 0, 900, 1200, 0, 0, 0])
+    model = trainer.fit(1e-9)
+    for numPlayers in TRUE_WEIGHTS:
+      self.assertTrue(numpy.allclose(model.weights[numPlayers],
+                                     TRUE_WEIGHTS[numPlayers], atol = 1e-6))
+      self.assertTrue(model.spread[numPlayers] < 1e-9)
+    # the pooled row is between them and misses both
+    self.assertTrue(model.spread[0] > 0.01)
+    # rows without hands keep the default weights and fall back to row 0
+    self.assertEqual(list(model.weights[5]), strength.WEIGHTS)
+    self.assertEqual(model.row(5), 0)
+    self.assertEqual(model.row(9), 0)
+    self.assertEqual(model.row(4), 4)
+    hand = (1 << 12) | (1 << 25) | (1 << 3)
+    self.assertAlmostEqual(model.expectedTricks(3, hand, 51), 3.0)
+    self.assertAlmostEqual(sum(model.distribution(3, hand, 51)), 1.0)
+
+  def testModelFile( self ):
+    rng = random.Random(TEST_SEED + 1)
+    trainer = calibrate.Trainer()
+    for hand in syntheticHands(rng, 4, 100):
+      trainer.addHand(hand)
+    model = trainer.fit()
+    fileName = os.path.join(self.dir, 'bids.npz')
+    model.save(fileName)
+    loaded = calibrate.loadModel(fileName)
+    self.assertTrue((loaded.weights == model.weights).all())
+    self.assertTrue((loaded.spread == model.spread).all())
+    self.assertTrue((loaded.counts == model.counts).all())
+
+    # another version or other features are refused
+    for version, features in [ (calibrate.MODEL_VERSION + 1,
+                                strength.FEATURES),
+                               (calibrate.MODEL_VERSION,
+                                strength.FEATURES[:-1]) ]:
+      out = open(fileName, 'wb')
+      numpy.savez(out, version = numpy.array(version),
+                  features = numpy.array(features), weights = model.weights,
+                  spread = model.spread, counts = model.counts)
+      out.close()
+      self.assertRaises(ValueError, calibrate.loadModel, fileName)
+    out = open(fileName, 'wb')
+    numpy.savez(out, version = numpy.array(calibrate.MODEL_VERSION))
+    out.close()
+    self.assertRaises(ValueError, calibrate.loadModel, fileName)
+
+  def testReadGames( self ):
+    # logs that are not games are skipped, each with a message
+    pattern = os.path.join(self.dir, 'game-%d.xml')
+    records = pipeline.score(pipeline.play(pipeline.deal(2, 3, TEST_SEED),
+                                           ['RandomPlayer'] * 3, TEST_SEED))
+    pipeline.drain(records, pipeline.XMLSink(pattern))
+    good = open(pattern % 0).read()
+    broken = [ good.replace('<bid playerID="0"', '<bid playerID="7"'),
+               good.replace('dealer=', 'deal='),
+               good.replace('<hand ', '<bid playerID="0" value="1" />'
+                                      '<hand ', 1),
+               good[:len(good) // 2] ]
+    for i in range(len(broken)):
+      open(os.path.join(self.dir, 'broken-%d.xml' % i), 'w').write(broken[i])
+    open(os.path.join(self.dir, 'notes.txt'), 'w').write('not a log')
+    log = StringIO()
+    games = list(calibrate.readGames([self.dir], log))
+    self.assertEqual(len(games), 2)
+    self.assertEqual([ len(game.getHands()) for game in games ], [21, 21])
+    messages = log.getvalue().splitlines()
+    self.assertEqual(len(messages), len(broken))
+    for i in range(len(broken)):
+      self.assertTrue(messages[i].startswith('Skipping %s'
+                                             % os.path.join(self.dir,
+                                                            'broken-%d.xml'
+                                                            % i)))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,113 @@
+###############################################
+# test_canonical.py
+# canonical forms and keys of positions under
+# relabeling of the suits
+###############################################
+
+import os, sys, unittest, random, itertools
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+from card import *
+import canonical
+
+#
+# seed of the test hands
+#
+TEST_SEED = 0xCA7
+
+#
+# rename the suits of a card: suit s becomes suit perm[s]
+#
+def relabel( card, perm ):
+  return 13*perm[CARD_SUIT[card]] + CARD_RANK[card]
+
+#
+# return a random (hand, trump) pair, the trump card not in the hand
+#
+def randomHand( rng ):
+  cards = rng.sample(range(52), rng.randint(1, 13) + 1)
+  trump = cards.pop()
+  if rng.random() < 0.3:
+    trump = -1
+  return sum([ 1 << card for card in cards ]), trump
+
+
+class CanonicalTest(unittest.TestCase):
+
+  def testRelabeling( self ):
+    rng = random.Random(TEST_SEED)
+    for i in range(200):
+      hand, trump = randomHand(rng)
+      seat = rng.randrange(5)
+      bids = [ rng.randrange(4) for p in range(seat) ]
+      form, key = canonical.canonicalize(hand, trump, seat, bids)
+      self.assertEqual(canonical.positionKey(hand, trump, seat, bids), key)
+      for perm in itertools.permutations(range(4)):
+        other = sum([ 1 << relabel(card, perm) for card in iterCards(hand) ])
+        otherTrump = -1
+        if trump >= 0:
+          otherTrump = relabel(trump, perm)
+        self.assertEqual(canonical.canonicalize(other, otherTrump, seat,
+                                                bids), (form, key))
+
+  def testFixedPoint( self ):
+    # a canonical hand is its own canonical form
+    rng = random.Random(TEST_SEED)
+    for i in range(500):
+      hand, trump = randomHand(rng)
+      form, key = canonical.canonicalize(hand, trump, 0, [])
+      canonHand, canonTrump = form[:2]
+      self.assertEqual(popcount(canonHand), popcount(hand))
+      self.assertEqual(canonical.canonicalize(canonHand, canonTrump, 0, []),
+                       (form, key))
+
+  def testUniqueKeys( self ):
+    # different canonical forms never share a key
+    rng = random.Random(TEST_SEED)
+    forms = {}
+    for i in range(20000):
+      hand, trump = randomHand(rng)
+      seat = rng.randrange(3)
+      form, key = canonical.canonicalize(hand, trump, seat,
+                                         [ rng.randrange(2)
+                                           for p in range(seat) ])
+      self.assertEqual(forms.setdefault(key, form), form)
+    # every 1 and 2 card hand, with the trump of every suit at a few ranks
+    forms = {}
+    for first in range(52):
+      for second in range(first, 52):
+        hand = (1 << first) | (1 << second)
+        for trump in [-1] + range(0, 52, 4):
+          if trump < 0 or not hand & (1 << trump):
+            form, key = canonical.canonicalize(hand, trump, 0, [])
+            self.assertEqual(forms.setdefault(key, form), form)
+
+  def testIncremental( self ):
+    rng = random.Random(TEST_SEED)
+    for i in range(100):
+      hand, trump = randomHand(rng)
+      canonHand = canonical.CanonicalHand(hand, trump)
+      for step in range(40):
+        card = rng.randrange(52)
+        if card == trump:
+          continue
+        if hand & (1 << card):
+          canonHand.removeCard(card)
+          hand = hand & ~(1 << card)
+        else:
+          canonHand.addCard(card)
+          hand = hand | (1 << card)
+        self.assertEqual(canonHand.positionKey(2, [1, 0]),
+                         canonical.positionKey(hand, trump, 2, [1, 0]))
+        form, key = canonical.canonicalize(hand, trump, 0, [])
+        self.assertEqual(canonHand.canonicalHand(), form[0])
+        order = canonical.suitOrder(canonical.suitMasks(hand),
+                                    canonHand.trumpSuit)
+        self.assertEqual(canonHand.order, order)
+        for suit in range(4):
+          self.assertEqual(order[canonHand.suitSlot(suit)], suit)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,210 @@
+###############################################
+# test_card.py
+# card sets, dealing and the card helpers
+# against the list-based originals
+###############################################
+
+import os, sys, unittest, random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+from card import *
+from seeds import dealFromSeed
+
+#
+# seed of the test cards
+#
+TEST_SEED = 0xCA4D
+
+
+class CardListTest(unittest.TestCase):
+
+  def testAgainstFlags( self ):
+    # random adds and removes give the answers of the original list of
+    # 52 flags
+    rng = random.Random(TEST_SEED)
+    for init in (0, 1):
+      cards = CardList(init)
+      flags = [init] * 52
+      for i in range(2000):
+        card = rng.randrange(52)
+        if rng.randrange(2):
+          cards.addCard(card)
+          flags[card] = 1
+        else:
+          cards.removeCard(card)
+          flags[card] = 0
+        held = [ c for c in range(52) if flags[c] ]
+        self.assertEqual(cards.numCards(), len(held))
+        self.assertEqual(len(cards), len(held))
+        self.assertEqual(list(cards), held)
+        if held:
+          self.assertEqual(cards.getFirstCard(), held[0])
+        else:
+          self.assertEqual(cards.getFirstCard(), -1)
+        for suit in range(4):
+          inSuit = [ c for c in held if c // 13 == suit ]
+          self.assertEqual(cards.hasSuit(suit), int(len(inSuit) > 0))
+          self.assertEqual(cards.suitMask(suit),
+                           sum([ 1 << c for c in inSuit ]))
+        probe = rng.randrange(52)
+        self.assertEqual(cards.hasCard(probe), flags[probe])
+        self.assertEqual(probe in cards, flags[probe] == 1)
+
+  def testSetOperations( self ):
+    rng = random.Random(TEST_SEED + 1)
+    for i in range(200):
+      a = set(rng.sample(range(52), rng.randint(0, 52)))
+      b = set(rng.sample(range(52), rng.randint(0, 52)))
+      first = CardList(mask = sum([ 1 << c for c in a ]))
+      second = CardList(mask = sum([ 1 << c for c in b ]))
+      self.assertEqual(list(first | second), sorted(a | b))
+      self.assertEqual(list(first.union(second)), sorted(a | b))
+      self.assertEqual(list(first & second), sorted(a & b))
+      self.assertEqual(list(first.intersection(second)), sorted(a & b))
+      self.assertEqual(first == second, a == b)
+      self.assertEqual(first != second, a != b)
+      # the operands are left alone
+      self.assertEqual(list(first), sorted(a))
+
+  def testEdges( self ):
+    cards = CardList(1)
+    self.assertEqual(cards.mask, FULL_MASK)
+    self.assertEqual(len(cards), 52)
+    self.assertEqual(cards.hasCard(-1), 0)
+    self.assertEqual(cards.hasCard(52), 0)
+    cards.clear()
+    self.assertEqual(len(cards), 0)
+    self.assertEqual(cards, CardList())
+    self.assertNotEqual(cards, 0)
+    self.assertEqual(repr(CardList(mask = 0x11)), 'CardList(mask=0x11)')
+    self.assertEqual(popcount(FULL_MASK), 52)
+    self.assertEqual(firstCard(0), -1)
+    self.assertEqual(firstCard(1 << 51), 51)
+    self.assertEqual(cardMask(5), 32)
+
+
+#
+# deal the way OhHellServer.startHand did: one card at a time from the
+# player after the dealer, then the trump card unless every player has
+# 10 cards
+# Return value:
+#   (hands, trump) as seeds.dealFromSeed returns them
+#
+def serverDeal( deck, numPlayers, numCards, dealer ):
+  hands = [ [] for player in range(numPlayers) ]
+  player = (dealer + 1) % numPlayers
+  for trick in range(numCards):
+    for i in range(numPlayers):
+      hands[player].append(deck.draw())
+      player = (player + 1) % numPlayers
+  trump = -1
+  if numCards != 10:
+    trump = deck.draw()
+  return hands, trump
+
+
+class DeckTest(unittest.TestCase):
+
+  def testDealOrder( self ):
+    rng = random.Random(TEST_SEED + 2)
+    for numPlayers in range(2, 6):
+      for numCards in range(1, 11):
+        seed = rng.getrandbits(64)
+        dealer = rng.randrange(numPlayers)
+        expected = serverDeal(Deck(seed), numPlayers, numCards, dealer)
+        self.assertEqual(dealFromSeed(seed, numPlayers, numCards, dealer),
+                         expected)
+        hands, trump = Deck(seed).deal(numPlayers, numCards,
+                                       (dealer + 1) % numPlayers)
+        self.assertEqual(hands, expected[0])
+        if numCards != 10:
+          self.assertEqual(trump, expected[1])
+
+  def testDeck( self ):
+    deck = Deck(TEST_SEED)
+    self.assertEqual(sorted(deck.deck), range(52))
+    self.assertEqual(Deck(rng = random.Random(TEST_SEED)).deck, deck.deck)
+    self.assertNotEqual(Deck(TEST_SEED + 1).deck, deck.deck)
+    self.assertEqual(deck.cardsLeft(), 52)
+    first = deck.deck[:3]
+    self.assertEqual([ deck.draw() for i in range(3) ], first)
+    self.assertEqual(deck.cardsLeft(), 49)
+    # dealing goes on from the cards drawn
+    hands, trump = deck.deal(3, 16, 0)
+    self.assertEqual(hands[0], deck.deck[3:51:3])
+    self.assertEqual(trump, deck.deck[51])
+    self.assertEqual(deck.cardsLeft(), 0)
+    # a full deck leaves no trump, and a deck cannot be overdealt
+    hands, trump = Deck(TEST_SEED).deal(4, 13, 1)
+    self.assertEqual(trump, -1)
+    self.assertEqual(sorted(sum(hands, [])), range(52))
+    self.assertRaises(ValueError, Deck(TEST_SEED).deal, 5, 11, 0)
+
+
+class CardTablesTest(unittest.TestCase):
+
+  def testAgainstArithmetic( self ):
+    # the tables hold what the clients and server used to work out
+    names = [ 'Two', 'Three', 'Four', 'Five', 'Six', 'Seven', 'Eight',
+              'Nine', 'Ten', 'Jack', 'Queen', 'King', 'Ace' ]
+    suits = [ 'Clubs', 'Diamonds', 'Hearts', 'Spades' ]
+    images = [ suit + rank + '.png' for suit in ['c', 'd', 'h', 's']
+               for rank in [ str(i) for i in range(2, 11) ]
+                           + ['j', 'q', 'k', 'a'] ]
+    for card in range(52):
+      self.assertEqual(cardSuit(card), card / 13)
+      self.assertEqual(cardValue(card), card % 13)
+      self.assertEqual(cardToString(card),
+                       names[card % 13] + ' of ' + suits[card / 13])
+      code = CARD_CODE[card]
+      self.assertEqual('23456789TJQKA'.find(code[0]), card % 13)
+      self.assertEqual('CDHS'.find(code[1]), card / 13)
+      self.assertEqual(parseCard(code), card)
+      self.assertEqual(CARD_IMAGE[card], images[card])
+    for code in [ 'QX', '1H', 'qh', '', 'QHS' ]:
+      self.assertEqual(parseCard(code), -1)
+    self.assertEqual(CardList.suit, tuple(suits))
+    self.assertEqual(CardList.value, tuple(names))
+
+  def testImages( self ):
+    directory = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             '..', 'images', 'cards')
+    for name in CARD_IMAGE:
+      self.assertTrue(os.path.exists(os.path.join(directory, name)), name)
+
+
+#
+# was card a legal play by the rule of the original OhHellServer.playCard?
+#
+def serverLegal( cards, card, firstCard ):
+  if not cards.hasCard(card):
+    return 0
+  if firstCard == -1 or cardSuit(firstCard) == cardSuit(card):
+    return 1
+  return not cards.hasSuit(cardSuit(firstCard))
+
+
+class LegalMaskTest(unittest.TestCase):
+
+  def testAgainstServer( self ):
+    rng = random.Random(TEST_SEED + 3)
+    for i in range(2000):
+      cards = rng.sample(range(52), rng.randint(2, 14))
+      firstCard = cards.pop()
+      if rng.randrange(4) == 0:
+        firstCard = -1
+      # a short hand, often void in the led suit
+      if rng.randrange(2):
+        cards = cards[:rng.randint(1, 3)]
+      hand = CardList(mask = sum([ 1 << card for card in cards ]))
+      legal = legalMask(hand.mask, firstCard)
+      self.assertEqual(hand.legalCards(firstCard), legal)
+      self.assertTrue(legal)
+      for card in range(52):
+        self.assertEqual(bool(legal & cardMask(card)),
+                         bool(serverLegal(hand, card, firstCard)))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,125 @@
+###############################################
+# test_engine.py
+# the rules the engine keeps: the dealer's bid,
+# following suit and playing whole games
+###############################################
+
+import os, sys, unittest, random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+from card import *
+from engine import Engine, EnginePlayer, makeTrickNums
+from scoring import runningTotals
+import bots
+
+#
+# seed of the test games
+#
+TEST_SEED = 0xE791
+
+#
+# player that makes the bids and plays the cards it is given, in order,
+# keeping the replies of the engine
+#
+# Attributes:
+#   moves
+#     bids and cards still to make
+#
+#   replies
+#     messages OK, BADBID and ERROR the engine sent to this player
+#
+class ScriptedPlayer(EnginePlayer):
+
+  def __init__( self, name, moves ):
+    EnginePlayer.__init__(self, name)
+    self.moves = list(moves)
+    self.replies = []
+
+  def notify( self, message, *args ):
+    if message in ('OK', 'BADBID', 'ERROR'):
+      self.replies.append(message)
+
+  def getBid( self, engine, playerNum ):
+    return self.moves.pop(0)
+
+  def getCard( self, engine, playerNum ):
+    return self.moves.pop(0)
+
+
+class EngineTest(unittest.TestCase):
+
+  #
+  # an engine with a hand of 2 cards dealt to 3 scripted players, player
+  # 0 dealing
+  #
+  def dealt( self, moves ):
+    players = [ ScriptedPlayer('p%d' % i, moves[i]) for i in range(3) ]
+    engine = Engine(players, seed = TEST_SEED, record = 0)
+    engine.startGame(0, 0)
+    # player 1 holds 2 and 3 of clubs, player 2 the 4 of clubs and the ace
+    # of hearts, player 0 the 5 and 6 of diamonds; spades are trump
+    engine.dealHand(2, [ [13, 14], [0, 1], [2, 38] ], 51)
+    return engine, players
+
+  def testForbiddenBid( self ):
+    engine, players = self.dealt([ [1, 1, 0], [1], [0] ])
+    self.assertEqual(engine.forbiddenBid(0), 2)
+    self.assertEqual(engine.forbiddenBid(1), -1)
+    engine.getBids()
+    # the dealer's 1 would make the bids add up to the tricks
+    self.assertEqual(engine.forbiddenBid(0), 1)
+    self.assertEqual(players[0].replies, ['BADBID', 'BADBID', 'OK'])
+    self.assertEqual(engine.bids, [0, 1, 0])
+    self.assertEqual(players[0].moves, [])
+    # bids over the tricks leave no bid forbidden
+    engine, players = self.dealt([ [0], [2], [2] ])
+    engine.getBids()
+    self.assertEqual(engine.forbiddenBid(0), -2)
+    self.assertEqual(engine.bids, [0, 2, 2])
+
+  def testPlayCard( self ):
+    # player 2 tries a card it does not hold and the heart it may not
+    # play while holding a club; player 0, void in clubs, may play any card
+    engine, players = self.dealt([ [0, 13, 14], [1, 0, 1],
+                                   [0, 39, 38, 2, 38] ])
+    engine.getBids()
+    engine.playHand()
+    self.assertEqual(players[1].replies, ['OK', 'OK', 'OK'])
+    self.assertEqual(players[2].replies, ['OK', 'ERROR', 'ERROR', 'OK',
+                                          'OK'])
+    self.assertEqual(engine.plays, [ (1, 0), (2, 2), (0, 13), (2, 38),
+                                     (0, 14), (1, 1) ])
+    self.assertEqual(engine.tricksWon, [0, 0, 2])
+    for player in range(3):
+      self.assertEqual(engine.cards[player].numCards(), 0)
+    self.assertEqual(engine.scores, [10, -5, 0])
+
+  def testGames( self ):
+    # whole games with every card checked against legalMask
+    rng = random.Random(TEST_SEED)
+    for numPlayers in range(2, 6):
+      players = [ bots.RandomPlayer('r%d' % i, rng)
+                  for i in range(numPlayers) ]
+      engine = Engine(players, seed = rng.getrandbits(64))
+      engine.playGame()
+      hands = engine.gameState.getHands()
+      self.assertEqual([ hand.getNumCards() for hand in hands ],
+                       makeTrickNums(numPlayers))
+      for hand in hands:
+        self.assertEqual(sum(hand.getTricksMade()), hand.getNumCards())
+        held = [ sum([ 1 << card for card in cards ])
+                 for cards in hand.getHands() ]
+        for trick in hand.getTricks():
+          ledCard = trick.getCards()[0][1]
+          for player, card in trick.getCards():
+            self.assertTrue(legalMask(held[player], ledCard) & (1 << card))
+            held[player] = held[player] & ~(1 << card)
+        self.assertEqual(held, [0] * numPlayers)
+      self.assertEqual(engine.scores,
+                       runningTotals([ (hand.getBids(), hand.getTricksMade())
+                                       for hand in hands ])[-1])
+
+
+if __name__ == '__main__':
+  unittest.main()
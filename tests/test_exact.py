@@ -0,0 +1,152 @@
+###############################################
+# test_exact.py
+# exact hand results against a brute force
+# playout of every deal of the unseen cards
+###############################################
+
+import os, sys, unittest, random, itertools
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+from card import *
+from canonical import canonicalize, suitMasks, suitOrder
+from engine import Engine
+import exact, bots
+
+#
+# seed of the test hands
+#
+TEST_SEED = 0xE4AC
+
+#
+# every deal of the unseen cards to the other players
+# Parameters:
+#   numPlayers - number of players
+#   hand       - bit mask of the cards of player
+#   trump      - trump card (-1 for no trump)
+#   seat       - index of player
+# Return value:
+#   generator of (hands, 1) as exact.segmentDeals generates them
+#
+def everyDeal( numPlayers, hand, trump, seat ):
+  numCards = popcount(hand)
+  unseen = [ card for card in range(52)
+             if not hand & (1 << card) and card != trump ]
+  others = [ player for player in range(numPlayers) if player != seat ]
+
+  def deal( i, left, hands ):
+    if i == len(others):
+      yield dict(hands), 1
+      return
+    for cards in itertools.combinations(left, numCards):
+      hands[others[i]] = sum([ 1 << card for card in cards ])
+      rest = [ card for card in left if card not in cards ]
+      for result in deal(i + 1, rest, hands):
+        yield result
+
+  return deal(0, unseen, {})
+
+#
+# random hands of numCards cards with a trump card (or none)
+#
+def hands( rng, numCards, count ):
+  result = []
+  for i in range(count):
+    cards = rng.sample(range(52), numCards + 1)
+    trump = cards[numCards]
+    if i % 2:
+      trump = -1
+    result.append( (sum([ 1 << card for card in cards[:numCards] ]), trump) )
+  return result
+
+
+class ExactTest(unittest.TestCase):
+
+  def testSegmentsMatchEveryDeal( self ):
+    rng = random.Random(TEST_SEED)
+    for numPlayers, numCards in [ (2, 1), (3, 1), (2, 2) ]:
+      for hand, trump in hands(rng, numCards, 4):
+        for seat in range(numPlayers):
+          bids = [ rng.randint(0, numCards) for i in range(seat) ]
+          segs = exact.segments(hand, trump, seat < numPlayers - 1)
+          others = [ player for player in range(numPlayers)
+                     if player != seat ]
+          expected = exact.outcomes(numPlayers, hand, trump, seat, bids,
+                                    segs, everyDeal(numPlayers, hand, trump,
+                                                    seat))
+          found = exact.outcomes(numPlayers, hand, trump, seat, bids, segs,
+                                 exact.segmentDeals(segs, others, numCards))
+          self.assertEqual(found, expected)
+          self.assertEqual(exact.solve(numPlayers, hand, trump, seat, bids),
+                           exact.bestPlays(expected, numCards))
+
+  def testDistributions( self ):
+    solver = exact.ExactSolver()
+    rng = random.Random(TEST_SEED + 1)
+    for hand, trump in hands(rng, 2, 4):
+      chances = solver.distributions(3, hand, trump, 2, [1, 0])
+      self.assertEqual(len(chances), 3)
+      for counts in chances:
+        self.assertAlmostEqual(sum(counts), 1.0)
+      advice = solver.advise(3, hand, trump, 2, [1, 0])
+      self.assertNotEqual(advice.bid, 1)
+    self.assertEqual(solver.advise(5, hand, trump, 0, []), None)
+
+  def testCovers( self ):
+    self.assertTrue(exact.covers(5, 1))
+    self.assertTrue(exact.covers(4, 2))
+    self.assertFalse(exact.covers(5, 2))
+    # only the first card is picked, so 3 card hands are never covered
+    self.assertFalse(exact.covers(2, 3))
+
+  def testHighBidsShareResults( self ):
+    # the other players play the same for any bid above 0
+    solver = exact.ExactSolver()
+    rng = random.Random(TEST_SEED + 4)
+    hand, trump = hands(rng, 2, 1)[0]
+    self.assertEqual(exact.solve(3, hand, trump, 2, [2, 0]),
+                     exact.solve(3, hand, trump, 2, [1, 0]))
+    self.assertEqual(solver.distributions(3, hand, trump, 2, [2, 0]),
+                     solver.distributions(3, hand, trump, 2, [1, 0]))
+    self.assertEqual(len(solver.results), 1)
+    self.assertNotEqual(solver.advise(3, hand, trump, 2, [2, 0]).expected,
+                        solver.advise(3, hand, trump, 2, [1, 0]).expected)
+
+  def testBestCardCanonical( self ):
+    # the same card whatever the order of the suits
+    solver = exact.ExactSolver()
+    rng = random.Random(TEST_SEED + 2)
+    for hand, trump in hands(rng, 2, 8):
+      (canonHand, canonTrump, seat, bids), key = canonicalize(hand, trump,
+                                                              0, [])
+      if trump >= 0:
+        trumpSuit = CARD_SUIT[trump]
+      else:
+        trumpSuit = -1
+      order = suitOrder(suitMasks(hand), trumpSuit)
+      for bid in range(3):
+        card = solver.bestCard(2, hand, trump, 0, [], bid, [], hand)
+        self.assertTrue(hand & (1 << card))
+        self.assertEqual(13*order.index(CARD_SUIT[card]) + CARD_RANK[card],
+                         solver.bestCard(2, canonHand, canonTrump, 0, [],
+                                         bid, [], canonHand))
+
+  def testAdvisorPlayer( self ):
+    rng = random.Random(TEST_SEED + 3)
+    players = [ bots.AdvisorPlayer('a%d' % i) for i in range(3) ]
+    engine = Engine(players, seed = 1)
+    engine.startGame(0, 2)
+    cards = rng.sample(range(52), 7)
+    engine.dealHand(2, [ cards[0:2], cards[2:4], cards[4:6] ], cards[6])
+    engine.getBids()
+    solver = bots.AdvisorPlayer.advisor.exact
+    numPlayers, hand, trump, seat, bids = players[0].dealt
+    self.assertEqual(players[0].getCard(engine, 0),
+                     solver.bestCard(numPlayers, hand, trump, seat, bids,
+                                     engine.bids[0], [], hand))
+    engine.playHand()
+    self.assertEqual(sum(engine.tricksWon), 2)
+
+
+if __name__ == '__main__':
+  unittest.main()
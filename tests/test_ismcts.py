@@ -0,0 +1,181 @@
+###############################################
+# test_ismcts.py
+# deals sampled for the search against what the
+# player saw, and the moves the search picks
+###############################################
+
+import os, sys, unittest, random, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+from card import *
+from position import Position
+from engine import Engine
+import ismcts, bots
+
+#
+# seed of the test hands
+#
+TEST_SEED = 0x15C7
+
+#
+# a hand played part way with random legal cards
+# Parameters:
+#   rng        - random.Random instance
+#   numPlayers - number of players
+#   numCards   - number of cards dealt to each player
+#   numPlayed  - number of cards to play
+# Return value:
+#   (Observation of the player to move, Position of the real deal)
+#
+def playedHand( rng, numPlayers, numCards, numPlayed ):
+  dealer = rng.randrange(numPlayers)
+  hands, trump = Deck(rng = rng).deal(numPlayers, numCards,
+                                      (dealer + 1) % numPlayers)
+  bids = [ rng.randint(0, numCards) for player in range(numPlayers) ]
+  position = Position([ sum([ 1 << card for card in cards ])
+                        for cards in hands ], trump, dealer, bids)
+  plays = []
+  for i in range(numPlayed):
+    card = rng.choice(list(iterCards(position.legalMoves())))
+    plays.append( (position.toMove, card) )
+    position.play(card)
+  player = position.toMove
+  return (ismcts.Observation(numPlayers, numCards, dealer, trump, player,
+                             position.hands[player], bids, plays),
+          position)
+
+#
+# suits each player showed out of, worked out from the plays
+# Return value:
+#   list of sets of suits, one per player
+#
+def shownOut( observation ):
+  voids = [ set() for player in range(observation.numPlayers) ]
+  plays = observation.plays
+  for i in range(len(plays)):
+    led = plays[i - i % observation.numPlayers][1]
+    player, card = plays[i]
+    if CARD_SUIT[card] != CARD_SUIT[led]:
+      voids[player].add(CARD_SUIT[led])
+  return voids
+
+#
+# EnginePlayer wrapper that counts the moves the engine refused
+#
+class CheckedPlayer(bots.ISMCTSPlayer):
+
+  refused = 0
+
+  def notify( self, message, *args ):
+    if message in ('ERROR', 'BADBID'):
+      CheckedPlayer.refused = CheckedPlayer.refused + 1
+    bots.ISMCTSPlayer.notify(self, message, *args)
+
+
+class ISMCTSTest(unittest.TestCase):
+
+  def testDeterminize( self ):
+    # sampled deals give every player the right number of unseen cards and
+    # nothing of the suits they showed out of, and replay to the position
+    rng = random.Random(TEST_SEED)
+    tested = 0
+    for numPlayers, numCards in [ (3, 7), (4, 10), (5, 10) ] * 20:
+      observation, real = playedHand(rng, numPlayers, numCards,
+                                     rng.randrange(numPlayers*numCards))
+      voids = shownOut(observation)
+      tested = tested + len([ suits for suits in voids if suits ])
+      player = observation.player
+      for i in range(20):
+        hands = observation.determinize(rng)
+        self.assertEqual(hands[player], observation.hand)
+        total = 0
+        for p in range(numPlayers):
+          self.assertEqual(popcount(hands[p]), popcount(real.hands[p]))
+          self.assertEqual(total & hands[p], 0)
+          total = total | hands[p]
+          for suit in voids[p]:
+            self.assertEqual(hands[p] & SUIT_MASKS[suit], 0)
+        self.assertEqual(total & ~(observation.unseen() | observation.hand),
+                         0)
+        position = observation.position(hands, observation.bids)
+        self.assertEqual(position.hands, hands)
+        self.assertEqual(position.toMove, player)
+        self.assertEqual(position.trick, real.trick)
+        self.assertEqual(position.tricksWon, real.tricksWon)
+    self.assertTrue(tested > 50)
+
+  def testSearchLegal( self ):
+    rng = random.Random(TEST_SEED + 1)
+    for numPlayers, numCards in [ (2, 5), (3, 7), (4, 10) ] * 5:
+      observation, real = playedHand(rng, numPlayers, numCards,
+                                     rng.randrange(numPlayers*numCards))
+      results = ismcts.search(observation, time.time() + 0.02, rng, 0)
+      self.assertTrue(results)
+      legal = real.legalMoves()
+      for card in results:
+        self.assertTrue(legal & (1 << card))
+      self.assertTrue(legal & (1 << ismcts.bestMove([ results ])))
+      # the dealer may not make the bid that adds up to numCards
+      dealer = observation.dealer
+      bids = list(observation.bids)
+      bids[dealer] = -1
+      observation = ismcts.Observation(numPlayers, numCards, dealer,
+                                       observation.trump, dealer,
+                                       real.deals[dealer], bids, [])
+      forbidden = numCards - sum(bids) - 1
+      self.assertFalse(forbidden in observation.legalBids())
+      results = ismcts.search(observation, time.time() + 0.02, rng, 1)
+      self.assertTrue(ismcts.bestMove([ results ]) in observation.legalBids())
+    self.assertEqual(ismcts.bestMove([ {} ]), None)
+
+  def testPlayer( self ):
+    # the engine takes every bid and card of the players, with workers
+    # or without
+    rng = random.Random(TEST_SEED + 2)
+    CheckedPlayer.refused = 0
+    players = [ CheckedPlayer('m0', rng, budget = 0.01),
+                CheckedPlayer('m1', rng, budget = 0.05, processes = 2),
+                bots.HeuristicPlayer('h', rng) ]
+    try:
+      engine = Engine(players, seed = TEST_SEED)
+      # the hands of 3, 2 and 1 cards
+      engine.startGame(7, 0)
+      for i in range(3):
+        engine.handNum = i
+        engine.startHand()
+        start = time.time()
+        engine.getBids()
+        engine.playHand()
+        # each player bids once and plays numCards cards within its budget
+        self.assertTrue(time.time() - start
+                        < 0.06*(engine.numCards + 1) + 0.5)
+        self.assertEqual(sum(engine.tricksWon), engine.numCards)
+        engine.dealer = engine.nextPlayer(engine.dealer)
+    finally:
+      players[1].close()
+    self.assertEqual(CheckedPlayer.refused, 0)
+
+  def testPoolDeadline( self ):
+    # workers that overrun the budget are not waited for
+    rng = random.Random(TEST_SEED + 3)
+    observation, real = playedHand(rng, 4, 10, 9)
+    player = bots.ISMCTSPlayer('m', rng, budget = 0.05, processes = 1)
+    margin = ismcts.POOL_MARGIN
+    ismcts.POOL_MARGIN = -20
+    try:
+      player.numPlayers, player.numCards = 4, 10
+      player.dealer, player.trump = observation.dealer, observation.trump
+      player.hand, player.bids = observation.hand, observation.bids
+      player.plays = observation.plays
+      start = time.time()
+      card = player.decide(observation.player, 0)
+      self.assertTrue(time.time() - start < 0.5)
+      self.assertTrue(real.legalMoves() & (1 << card))
+    finally:
+      ismcts.POOL_MARGIN = margin
+      player.close()
+
+
+if __name__ == '__main__':
+  unittest.main()
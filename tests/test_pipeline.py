@@ -0,0 +1,88 @@
+###############################################
+# test_pipeline.py
+# simulation records written to the binary
+# format and read back
+###############################################
+
+import os, sys, unittest
+from StringIO import StringIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+import pipeline
+from pipeline import BinarySink, readBinary, Summary
+
+#
+# seed of the test games
+#
+TEST_SEED = 0x919E
+
+BOTS = [ 'RandomPlayer', 'HeuristicPlayer', 'RandomPlayer' ]
+
+#
+# scored records of a few games
+#
+def records( numGames ):
+  return list(pipeline.score(pipeline.play(pipeline.deal(numGames, len(BOTS),
+                                                         TEST_SEED),
+                                           BOTS, TEST_SEED)))
+
+#
+# file of StringIO that keeps its contents when closed
+#
+class KeptFile(StringIO):
+
+  def close( self ):
+    self.kept = self.getvalue()
+    StringIO.close(self)
+
+
+class PipelineTest(unittest.TestCase):
+
+  def testBinaryRoundTrip( self ):
+    written = records(2)
+    file = KeptFile()
+    pipeline.drain(iter(written), BinarySink(file))
+    self.assertEqual(list(readBinary(StringIO(file.kept))), written)
+    # an empty run is only the magic
+    file = KeptFile()
+    pipeline.drain(iter([]), BinarySink(file))
+    self.assertEqual(file.kept, pipeline.MAGIC)
+    self.assertEqual(list(readBinary(StringIO(file.kept))), [])
+
+  def testTruncated( self ):
+    written = records(1)
+    file = KeptFile()
+    pipeline.drain(iter(written), BinarySink(file))
+    data = file.kept
+    # where each record ends
+    ends = [ len(pipeline.MAGIC) ]
+    for record in written:
+      ends.append(ends[-1] + pipeline.HEADER.size
+                  + len(record[pipeline.HANDS])*pipeline.PLAYER.size
+                  + len(record[pipeline.PLAYS]))
+    self.assertEqual(ends[-1], len(data))
+    for size in range(len(pipeline.MAGIC), len(data)):
+      if size in ends:
+        self.assertEqual(list(readBinary(StringIO(data[:size]))),
+                         written[:ends.index(size)])
+      else:
+        self.assertRaises(ValueError, list, readBinary(StringIO(data[:size])))
+    self.assertRaises(ValueError, list, readBinary(StringIO('OHS1' + data[4:])))
+    self.assertRaises(ValueError, list, readBinary(StringIO(data[:2])))
+
+  def testSummary( self ):
+    summary = Summary(len(BOTS))
+    self.assertEqual(summary.averageScores(), [0.0] * len(BOTS))
+    self.assertEqual(summary.madeRates(), [0.0] * len(BOTS))
+    written = records(2)
+    pipeline.drain(pipeline.aggregate(iter(written), summary))
+    self.assertEqual(summary.numGames, 2)
+    self.assertEqual(summary.numHands, len(written))
+    for seat in range(len(BOTS)):
+      total = sum([ record[pipeline.DELTAS][seat] for record in written ])
+      self.assertEqual(summary.averageScores()[seat], total / 2.0)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,120 @@
+###############################################
+# test_position.py
+# playing and taking back cards of a Position,
+# its Zobrist hash and the HandState round trip
+###############################################
+
+import os, sys, unittest, random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+from card import *
+from position import Position, fromHandState, HAND_KEYS, TRICK_KEYS, \
+                     MOVE_KEYS, TRUMP_KEYS
+
+#
+# seed of the test hands
+#
+TEST_SEED = 0x9051
+
+#
+# random position at the start of a hand
+#
+def randomPosition( rng, numPlayers, numCards ):
+  dealer = rng.randrange(numPlayers)
+  hands, trump = Deck(rng = rng).deal(numPlayers, numCards,
+                                      (dealer + 1) % numPlayers)
+  if rng.randrange(3) == 0:
+    trump = -1
+  bids = [ rng.randint(0, numCards) for player in range(numPlayers) ]
+  return Position([ sum([ 1 << card for card in cards ]) for cards in hands ],
+                  trump, dealer, bids)
+
+#
+# everything play and undo change, to compare positions by
+#
+def state( position ):
+  return (list(position.hands), list(position.trick), position.leader,
+          position.toMove, list(position.tricksWon),
+          [ (leader, list(cards)) for leader, cards in position.tricks ],
+          position.hash)
+
+#
+# Zobrist hash of a position worked out from scratch
+#
+def freshHash( position ):
+  result = TRUMP_KEYS[position.trump + 1] ^ MOVE_KEYS[position.toMove]
+  for player in range(position.numPlayers):
+    for card in iterCards(position.hands[player]):
+      result = result ^ HAND_KEYS[player][card]
+  for player, card in position.trick:
+    result = result ^ TRICK_KEYS[player][card]
+  return result
+
+HANDS = [ (2, 13), (3, 7), (4, 10), (5, 10), (4, 3) ]
+
+
+class PositionTest(unittest.TestCase):
+
+  def testPlayUndo( self ):
+    # taking back a random line leads through the same positions back
+    # to the start, with the hash always as if worked out from scratch
+    rng = random.Random(TEST_SEED)
+    for numPlayers, numCards in HANDS * 4:
+      position = randomPosition(rng, numPlayers, numCards)
+      states = [ state(position) ]
+      numPlayed = rng.randint(1, numPlayers*numCards)
+      for i in range(numPlayed):
+        self.assertEqual(position.hash, freshHash(position))
+        position.play(rng.choice(list(iterCards(position.legalMoves()))))
+        states.append(state(position))
+      self.assertEqual(position.hash, freshHash(position))
+      self.assertEqual(position.isOver(), numPlayed == numPlayers*numCards)
+      for i in range(numPlayed):
+        position.undo()
+        states.pop()
+        self.assertEqual(state(position), states[-1])
+      self.assertEqual(position.hands, position.deals)
+      self.assertEqual(position.tricksLeft(), numCards)
+
+  def testTransposition( self ):
+    # the same cards held and the same player to move give the same hash,
+    # whatever order the tricks were played in
+    position = Position([ (1 << 0) | (1 << 13) | (1 << 26),
+                          (1 << 1) | (1 << 14) | (1 << 27) ], -1, 1)
+    other = position.clone()
+    for card in [0, 1, 14, 13]:
+      position.play(card)
+    for card in [13, 14, 1, 0]:
+      other.play(card)
+    self.assertEqual(position.hands, other.hands)
+    self.assertEqual(position.toMove, other.toMove)
+    self.assertEqual(position.hash, other.hash)
+    self.assertNotEqual(position.tricks, other.tricks)
+    other.play(27)
+    self.assertNotEqual(position.hash, other.hash)
+
+  def testHandStateRoundTrip( self ):
+    rng = random.Random(TEST_SEED + 1)
+    for numPlayers, numCards in HANDS * 4:
+      position = randomPosition(rng, numPlayers, numCards)
+      numPlayed = rng.randint(0, numPlayers*numCards)
+      for i in range(numPlayed):
+        position.play(rng.choice(list(iterCards(position.legalMoves()))))
+      hand = position.toHandState()
+      replayed = fromHandState(hand)
+      self.assertEqual(state(replayed), state(position))
+      self.assertEqual(replayed.deals, position.deals)
+      self.assertEqual(replayed.bids, position.bids)
+      self.assertEqual(replayed.trump, position.trump)
+      self.assertEqual(replayed.dealer, position.dealer)
+      # and replaying only part of it
+      cut = rng.randint(0, numPlayed)
+      partial = fromHandState(hand, cut)
+      for i in range(numPlayed - cut):
+        position.undo()
+      self.assertEqual(state(partial), state(position))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,105 @@
+###############################################
+# test_scoring.py
+# hand scores and running totals against the
+# arithmetic GameState used to do inline
+###############################################
+
+import os, sys, unittest, random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+from GameState import GameState, HandState
+from scoring import handScore, handScores, runningTotals, scoreArray, \
+                    scoreGames, numpy
+
+#
+# seed of the test games
+#
+TEST_SEED = 0x5C0E
+
+#
+# totals after each hand as the original GameState.currentScores added
+# them up
+#
+def oldTotals( hands, numPlayers ):
+  scores = [0] * numPlayers
+  totals = []
+  for bids, tricks in hands:
+    for i in range(numPlayers):
+      if bids[i] == tricks[i]:
+        scores[i] = scores[i] + 10 + bids[i]*bids[i]
+      elif tricks[i] < bids[i]:
+        scores[i] = scores[i] - 5*(bids[i] - tricks[i])
+    totals.append(list(scores))
+  return totals
+
+#
+# random games: each a list of (bids, tricks) pairs whose tricks add up
+# to the number of cards
+#
+def randomGames( rng, count ):
+  games = []
+  for game in range(count):
+    numPlayers = rng.randint(2, 5)
+    hands = []
+    for numCards in range(10, 0, -1):
+      bids = [ rng.randint(0, numCards) for player in range(numPlayers) ]
+      tricks = [0] * numPlayers
+      for trick in range(numCards):
+        winner = rng.randrange(numPlayers)
+        tricks[winner] = tricks[winner] + 1
+      hands.append( (bids, tricks) )
+    games.append(hands)
+  return games
+
+
+class ScoringTest(unittest.TestCase):
+
+  def testHandScore( self ):
+    self.assertEqual(handScore(0, 0), 10)
+    self.assertEqual(handScore(3, 3), 19)
+    self.assertEqual(handScore(3, 1), -10)
+    self.assertEqual(handScore(1, 4), 0)
+    self.assertEqual(handScores([2, 0, 1], [2, 1, 0]), [14, 0, -5])
+
+  def testRunningTotals( self ):
+    rng = random.Random(TEST_SEED)
+    for hands in randomGames(rng, 50):
+      numPlayers = len(hands[0][0])
+      self.assertEqual(runningTotals(hands), oldTotals(hands, numPlayers))
+    self.assertEqual(runningTotals([]), [])
+
+  def testCurrentScores( self ):
+    rng = random.Random(TEST_SEED + 1)
+    for hands in randomGames(rng, 10):
+      numPlayers = len(hands[0][0])
+      game = GameState()
+      game.init_new(numPlayers, '')
+      for bids, tricks in hands:
+        hand = HandState(numPlayers, sum(tricks), -1, 0)
+        for player in range(numPlayers):
+          hand.setHand(player, [])
+          hand.setBid(player, bids[player])
+          hand.setTricksMade(player, tricks[player])
+        game.addHand(hand)
+      self.assertEqual(game.currentScores(),
+                       oldTotals(hands, numPlayers)[-1])
+
+  @unittest.skipIf(numpy is None, 'scoreArray needs NumPy')
+  def testArrays( self ):
+    rng = random.Random(TEST_SEED + 2)
+    games = [ hands for hands in randomGames(rng, 40)
+              if len(hands[0][0]) == 4 ]
+    bids = numpy.array([ [ hand[0] for hand in hands ] for hands in games ])
+    tricks = numpy.array([ [ hand[1] for hand in hands ] for hands in games ])
+    self.assertEqual(scoreArray(bids, tricks).tolist(),
+                     [ [ handScores(b, t) for b, t in hands ]
+                       for hands in games ])
+    self.assertEqual(scoreGames(bids, tricks).tolist(),
+                     [ oldTotals(hands, 4) for hands in games ])
+    self.assertEqual(scoreGames(bids[0], tricks[0]).tolist(),
+                     oldTotals(games[0], 4))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,93 @@
+###############################################
+# test_seeds.py
+# seeds derive the same streams, deals and games
+# every time
+###############################################
+
+import os, sys, unittest, random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+from seeds import *
+from engine import Engine
+from GameState import HandState
+from bots import RandomPlayer
+
+#
+# seed of the test games
+#
+TEST_SEED = 0x5EED
+
+#
+# play a game of random players from a seed
+# Parameters:
+#   seed       - seed of game
+#   numPlayers - number of players
+# Return value:
+#   list of (seed, dealer, trump, hands, bids, tricks) for each hand
+#
+def playGame( seed, numPlayers ):
+  players = [ RandomPlayer('r%d' % i, random.Random(TEST_SEED + i))
+              for i in range(numPlayers) ]
+  engine = Engine(players, seed = seed)
+  engine.playGame()
+  return [ (hand.seed, hand.getDealer(), hand.getTrump(), hand.getHands(),
+            hand.getBids(), hand.getTricksMade())
+           for hand in engine.gameState.getHands() ]
+
+
+class SeedsTest(unittest.TestCase):
+
+  def testDerive( self ):
+    self.assertEqual(mix64(TEST_SEED), mix64(TEST_SEED))
+    children = [ deriveSeed(TEST_SEED, i) for i in range(100) ]
+    self.assertEqual(children, [ deriveSeed(TEST_SEED, i)
+                                 for i in range(100) ])
+    self.assertEqual(len(set(children)), 100)
+    for seed in children + [ mix64(0), mix64(MASK64), newSeed() ]:
+      self.assertTrue(0 <= seed <= MASK64)
+    self.assertNotEqual(deriveSeed(TEST_SEED + 1, 0), children[0])
+    self.assertEqual(handSeed(TEST_SEED, 3), children[3])
+    for numPlayers in range(2, 7):
+      dealer = firstDealer(TEST_SEED, numPlayers)
+      self.assertTrue(0 <= dealer < numPlayers)
+      self.assertEqual(firstDealer(TEST_SEED, numPlayers), dealer)
+
+  def testDealFromSeed( self ):
+    for i in range(20):
+      seed = handSeed(TEST_SEED, i)
+      numPlayers = 2 + i % 4
+      numCards = 1 + i % 10
+      dealer = i % numPlayers
+      hands, trump = dealFromSeed(seed, numPlayers, numCards, dealer)
+      self.assertEqual(dealFromSeed(seed, numPlayers, numCards, dealer),
+                       (hands, trump))
+      self.assertEqual([ len(cards) for cards in hands ],
+                       [numCards] * numPlayers)
+      cards = sum(hands, [])
+      if numCards == 10:
+        self.assertEqual(trump, -1)
+      else:
+        cards.append(trump)
+      self.assertEqual(len(set(cards)), len(cards))
+      self.assertNotEqual(dealFromSeed(seed + 1, numPlayers, numCards,
+                                       dealer), (hands, trump))
+
+  def testGames( self ):
+    for numPlayers in [ 3, 5 ]:
+      hands = playGame(TEST_SEED, numPlayers)
+      self.assertEqual(playGame(TEST_SEED, numPlayers), hands)
+      self.assertNotEqual(playGame(TEST_SEED + 1, numPlayers), hands)
+      self.assertEqual(hands[0][1], firstDealer(TEST_SEED, numPlayers))
+      # a recorded hand deals again from its seed alone
+      for i in range(len(hands)):
+        seed, dealer, trump, cards, bids, tricks = hands[i]
+        self.assertEqual(seed, handSeed(TEST_SEED, i))
+        state = HandState(numPlayers, len(cards[0]), -2, dealer, seed)
+        state.dealFromSeed()
+        self.assertEqual( (state.getHands(), state.getTrump()),
+                          (cards, trump) )
+
+
+if __name__ == '__main__':
+  unittest.main()
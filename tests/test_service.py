@@ -0,0 +1,143 @@
+###############################################
+# test_service.py
+# batched decisions against the decisions of
+# one player at a time
+###############################################
+
+import os, sys, unittest, random, threading, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+from card import *
+from bots import chanceCard
+from test_tracker import playHand, playToTurn
+import strength, service
+
+#
+# seed of the test hands
+#
+TEST_SEED = 0x5E7C
+
+#
+# random decisions: bids for hands of 1 to 10 cards and cards for trackers
+# in the middle of a hand
+# Parameters:
+#   rng   - random.Random instance
+#   count - number of decisions
+# Return value:
+#   list of (decision, expected result)
+#
+def decisions( rng, count ):
+  result = []
+  while len(result) < count:
+    if rng.randrange(2):
+      numCards = rng.randint(1, 10)
+      cards = rng.sample(range(52), numCards + 1)
+      hand = sum([ 1 << card for card in cards[:numCards] ])
+      forbidden = rng.randint(-1, numCards)
+      result.append( (service.Decision(service.BID, (hand, cards[numCards],
+                                                     forbidden)),
+                      strength.strengthBid(hand, cards[numCards], forbidden)) )
+      continue
+    numPlayers = rng.randint(2, 5)
+    numCards = { 2: 13, 3: 7, 4: 10, 5: 10 }[numPlayers]
+    tracker, position = playHand(rng, numPlayers, numCards,
+                                 rng.randrange(numPlayers),
+                                 rng.randrange(numPlayers*numCards))
+    if playToTurn(rng, tracker, position):
+      want = rng.randrange(2)
+      result.append( (service.Decision(service.CARD, (tracker, want)),
+                      chanceCard(tracker.winChances(), want)) )
+  return result
+
+
+class ServiceTest(unittest.TestCase):
+
+  def setUp( self ):
+    if service.numpy is None:
+      self.skipTest('the decision service needs NumPy')
+
+  def testBatch( self ):
+    # a batch decides as the players would one at a time
+    rng = random.Random(TEST_SEED)
+    batch = decisions(rng, 100)
+    decider = service.DecisionService()
+    try:
+      decider.answer([ decision for decision, expected in batch ])
+    finally:
+      decider.close()
+    for decision, expected in batch:
+      self.assertTrue(decision.done.isSet())
+      self.assertEqual(decision.error, None)
+      self.assertEqual(decision.result, expected)
+
+  def testDecide( self ):
+    # decisions of many threads, answered in batches
+    rng = random.Random(TEST_SEED + 1)
+    batch = decisions(rng, 40)
+    results = {}
+    decider = service.DecisionService(batchSize = 8, latency = 0.01)
+
+    def decide( i ):
+      results[i] = decider.decide(batch[i][0])
+
+    threads = [ threading.Thread(target = decide, args = (i,))
+                for i in range(len(batch)) ]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    decider.close()
+    self.assertEqual([ results[i] for i in range(len(batch)) ],
+                     [ expected for decision, expected in batch ])
+    self.assertEqual(decider.decisions, len(batch))
+    self.assertTrue(decider.batches < len(batch))
+
+  def testClose( self ):
+    # the decisions queued when the service closes are answered once,
+    # and no decision is taken after it
+    rng = random.Random(TEST_SEED + 2)
+    batch = decisions(rng, 10)
+    results = {}
+    decider = service.DecisionService(batchSize = 100, latency = 60.0)
+
+    def decide( i ):
+      results[i] = decider.decide(batch[i][0])
+
+    threads = [ threading.Thread(target = decide, args = (i,))
+                for i in range(len(batch)) ]
+    for thread in threads:
+      thread.start()
+    while len(decider.queue) < len(batch):
+      time.sleep(0.001)
+    decider.close()
+    for thread in threads:
+      thread.join()
+    self.assertEqual([ results[i] for i in range(len(batch)) ],
+                     [ expected for decision, expected in batch ])
+    self.assertEqual(decider.decisions, len(batch))
+    self.assertEqual(decider.batches, 1)
+    self.assertRaises(ValueError, decider.bid, 1, -1)
+
+  def testError( self ):
+    # an error answering the cards reaches every card decision of the
+    # batch, and only them
+    rng = random.Random(TEST_SEED + 3)
+    batch = decisions(rng, 10)
+    broken = service.Decision(service.CARD, (None, 1))
+    decider = service.DecisionService()
+    try:
+      decider.answer([ decision for decision, expected in batch ] + [broken])
+    finally:
+      decider.close()
+    self.assertNotEqual(broken.error, None)
+    for decision, expected in batch:
+      if decision.kind == service.CARD:
+        self.assertTrue(decision.error is broken.error)
+      else:
+        self.assertEqual(decision.error, None)
+        self.assertEqual(decision.result, expected)
+
+
+if __name__ == '__main__':
+  unittest.main()
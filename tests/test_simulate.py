@@ -0,0 +1,60 @@
+###############################################
+# test_simulate.py
+# simulations give the same tally whatever the
+# number of processes and the chunk size
+###############################################
+
+import os, sys, unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+import simulate
+from simulate import Tally, makeUnits, playUnit
+
+#
+# seed of the test simulations
+#
+TEST_SEED = 0x519
+
+BOTS = [ 'HeuristicPlayer', 'RandomPlayer', 'RandomPlayer' ]
+
+#
+# everything a tally holds, to compare tallies by
+#
+def contents( tally ):
+  return (tally.numGames, tally.wins, tally.sheet, tally.made)
+
+
+class SimulateTest(unittest.TestCase):
+
+  def testProcesses( self ):
+    expected = playUnit( (TEST_SEED, 0, 12, tuple(BOTS)) )
+    self.assertEqual(expected.numGames, 12)
+    self.assertEqual(sum(expected.wins), 12)
+    for processes, chunkSize in [ (1, 12), (1, 5), (2, 1), (3, 4) ]:
+      tally = simulate.simulate(12, BOTS, TEST_SEED, processes, chunkSize,
+                                progress = None)
+      self.assertEqual(contents(tally), contents(expected))
+    other = simulate.simulate(12, BOTS, TEST_SEED + 1, 2, progress = None)
+    self.assertNotEqual(contents(other), contents(expected))
+
+  def testMerge( self ):
+    # merging the units in any order gives the tally of all the games
+    units = makeUnits(9, BOTS, TEST_SEED, 4)
+    self.assertEqual([ (first, n) for seed, first, n, names in units ],
+                     [ (0, 4), (4, 4), (8, 1) ])
+    tallies = [ playUnit(unit) for unit in units ]
+    expected = playUnit( (TEST_SEED, 0, 9, tuple(BOTS)) )
+    for order in [ (0, 1, 2), (2, 0, 1), (1, 2, 0) ]:
+      tally = Tally(len(BOTS))
+      for i in order:
+        tally.merge(tallies[i])
+      self.assertEqual(contents(tally), contents(expected))
+    self.assertEqual(Tally(3).averageScores(), [0.0] * 3)
+    self.assertEqual(expected.averageScores(),
+                     [ score / 9.0
+                       for bid, tricks, score in expected.sheet[-1][1] ])
+
+
+if __name__ == '__main__':
+  unittest.main()
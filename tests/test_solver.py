@@ -0,0 +1,116 @@
+###############################################
+# test_solver.py
+# double dummy solver against a brute force
+# search of every line of play on small deals
+###############################################
+
+import os, sys, unittest, tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+from card import *
+from position import Position
+from seeds import deriveSeed, dealFromSeed
+from solver import Solver, SearchLimit, tableSize, TABLE_BITS
+import tablebase
+
+#
+# seed of the test deals
+#
+TEST_SEED = 0x7E57
+
+#
+# most tricks a seat can take, trying every card of every player
+#
+def bruteMaxTricks( position, seat ):
+  if position.isOver():
+    return position.tricksWon[seat]
+  results = []
+  for card in iterCards(position.legalMoves()):
+    position.play(card)
+    results.append(bruteMaxTricks(position, seat))
+    position.undo()
+  if position.toMove == seat:
+    return max(results)
+  return min(results)
+
+#
+# return count seeded deals of numPlayers hands of numCards cards, every
+# other one without trump
+#
+def deals( numPlayers, numCards, count ):
+  positions = []
+  for i in range(count):
+    seed = deriveSeed(TEST_SEED, numPlayers*100 + numCards*10 + i)
+    hands, trump = dealFromSeed(seed, numPlayers, numCards, 0)
+    if i % 2:
+      trump = -1
+    positions.append(Position([ sum([ 1 << card for card in cards ])
+                                for cards in hands ], trump, 0))
+  return positions
+
+
+class SolverTest(unittest.TestCase):
+
+  def checkPosition( self, solver, position ):
+    expected = [ bruteMaxTricks(position, seat)
+                 for seat in range(position.numPlayers) ]
+    self.assertEqual(solver.solve(position), expected)
+
+  def testSmallDeals( self ):
+    for numPlayers, numCards in [ (2, 4), (3, 3), (4, 2), (4, 3), (5, 2) ]:
+      for position in deals(numPlayers, numCards, 6):
+        self.checkPosition(Solver(), position)
+
+  def testMidTrick( self ):
+    # positions with part of a trick, and a trick already won, played
+    for position in deals(3, 3, 6) + deals(4, 3, 4):
+      for played in range(1, position.numPlayers + 2):
+        position.play(firstCard(position.legalMoves()))
+        self.checkPosition(Solver(), position)
+
+  def testPositionUnchanged( self ):
+    position = deals(4, 3, 1)[0]
+    hands = list(position.hands)
+    Solver().solve(position)
+    self.assertEqual(position.hands, hands)
+    self.assertEqual(position.tricks, [])
+
+  def testSharedTable( self ):
+    # one solver, so later deals probe entries stored by earlier ones
+    solver = Solver(tableBits = 8)
+    for position in deals(3, 3, 10):
+      self.checkPosition(solver, position)
+
+  def testTablebase( self ):
+    fd, fileName = tempfile.mkstemp(suffix = '.tb')
+    os.close(fd)
+    try:
+      tablebase.writeTablebase(fileName, 3, 2, tablebase.generate(3, 2))
+      table = tablebase.Tablebase(fileName)
+      for position in deals(3, 3, 6) + deals(3, 2, 6):
+        self.checkPosition(Solver(tablebase = table), position)
+      table.close()
+    finally:
+      os.remove(fileName)
+
+  def testTableSize( self ):
+    # sized from the cards of the first hand, grown for a bigger one
+    solver = Solver()
+    solver.solve(deals(4, 2, 1)[0])
+    self.assertEqual(solver.mask, (1 << tableSize(2)) - 1)
+    nodes = solver.nodes
+    solver.solve(deals(4, 3, 1)[0])
+    self.assertEqual(solver.mask, (1 << tableSize(3)) - 1)
+    self.assertTrue(solver.nodes > nodes)
+    self.assertEqual(tableSize(10), TABLE_BITS)
+
+  def testSearchLimit( self ):
+    position = deals(4, 3, 1)[0]
+    self.assertRaises(SearchLimit,
+                      Solver(maxNodes = 1).solve,
+                      position)
+
+
+if __name__ == '__main__':
+  unittest.main()
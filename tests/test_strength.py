@@ -0,0 +1,79 @@
+###############################################
+# test_strength.py
+# batch hand strength against the one-hand
+# functions on random hands
+###############################################
+
+import os, sys, unittest, random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+from card import *
+import strength
+
+#
+# seed of the test hands
+#
+TEST_SEED = 0x57E7
+
+#
+# return count random (cards, trump) pairs of numCards cards, the trump
+# card taken from the rest of the deck or -1 for no trump
+#
+def randomHands( rng, count, numCards ):
+  hands = []
+  for i in range(count):
+    cards = rng.sample(range(52), numCards + 1)
+    trump = cards.pop()
+    if rng.random() < 0.2:
+      trump = -1
+    hands.append( (cards, trump) )
+  return hands
+
+
+class StrengthTest(unittest.TestCase):
+
+  @unittest.skipIf(strength.numpy is None, 'needs NumPy')
+  def testFeatures( self ):
+    rng = random.Random(TEST_SEED)
+    for numCards in range(1, 14):
+      hands = randomHands(rng, 3000 // 13, numCards)
+      counts = strength.features([ cards for cards, trump in hands ],
+                                 [ trump for cards, trump in hands ])
+      tricks = strength.expectedTricks([ cards for cards, trump in hands ],
+                                       [ trump for cards, trump in hands ])
+      for i in range(len(hands)):
+        cards, trump = hands[i]
+        mask = sum([ 1 << card for card in cards ])
+        self.assertEqual(list(counts[i]), strength.handFeatures(mask, trump))
+        self.assertAlmostEqual(tricks[i], strength.handStrength(mask, trump))
+
+  @unittest.skipIf(strength.numpy is None, 'needs NumPy')
+  def testScalarTrump( self ):
+    hands = [ [0, 13, 26], [12, 25, 51] ]
+    self.assertEqual(strength.features(hands, 38).tolist(),
+                     strength.features(hands, [38, 38]).tolist())
+
+  def testStrengthRange( self ):
+    rng = random.Random(TEST_SEED)
+    for numCards in range(1, 14):
+      for cards, trump in randomHands(rng, 50, numCards):
+        tricks = strength.handStrength(sum([ 1 << card for card in cards ]),
+                                       trump)
+        self.assertTrue(0 <= tricks <= numCards)
+
+  def testTricksToBid( self ):
+    for numCards in range(1, 14):
+      for tenths in range(10*numCards + 1):
+        tricks = tenths / 10.0
+        self.assertEqual(strength.tricksToBid(tricks, numCards),
+                         int(tricks + 0.5))
+        for forbidden in range(numCards + 1):
+          bid = strength.tricksToBid(tricks, numCards, forbidden)
+          self.assertNotEqual(bid, forbidden)
+          self.assertTrue(0 <= bid <= numCards)
+          self.assertTrue(abs(bid - tricks) <= 1.5)
+
+
+if __name__ == '__main__':
+  unittest.main()
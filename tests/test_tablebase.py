@@ -0,0 +1,124 @@
+###############################################
+# test_tablebase.py
+# canonical forms and keys of the tablebase and
+# the tablebase file
+###############################################
+
+import os, sys, unittest, random, tempfile, itertools
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+from card import *
+import tablebase
+from tablebase import canonicalForm, canonicalForms, formKey, formPosition
+from position import Position
+from solver import Solver
+
+#
+# seed of the test deals
+#
+TEST_SEED = 0x7AB
+
+#
+# (numPlayers, most cards per player) of the forms checked
+#
+SIZES = [ (2, 4), (3, 2), (4, 2), (5, 1) ]
+
+#
+# return a random position of numCards cards per player as (hands,
+# leader, trumpSuit)
+#
+def randomPosition( rng, numPlayers, numCards ):
+  cards = rng.sample(range(52), numPlayers*numCards)
+  hands = [ sum([ 1 << card for card in cards[i::numPlayers] ])
+            for i in range(numPlayers) ]
+  return hands, rng.randrange(numPlayers), rng.randrange(-1, 4)
+
+
+class TablebaseTest(unittest.TestCase):
+
+  def testUniqueKeys( self ):
+    # the forms of every size of a table share one key space
+    for numPlayers, maxCards in SIZES:
+      keys = {}
+      for numCards in range(1, maxCards + 1):
+        for form in canonicalForms(numPlayers, numCards):
+          key = formKey(form)
+          self.assertTrue(0 < key < 1 << 64)
+          self.assertEqual(keys.setdefault(key, form), form)
+
+  def testFormPosition( self ):
+    for numPlayers, maxCards in SIZES:
+      for numCards in range(1, maxCards + 1):
+        for form in canonicalForms(numPlayers, numCards):
+          position = formPosition(form, numPlayers)
+          self.assertEqual(canonicalForm(position.hands, position.leader,
+                                         position.trumpSuit), form)
+
+  def testRandomPositions( self ):
+    rng = random.Random(TEST_SEED)
+    forms = {}
+    for numPlayers, maxCards in SIZES:
+      for numCards in range(1, maxCards + 1):
+        forms[numPlayers, numCards] = set(canonicalForms(numPlayers,
+                                                         numCards))
+    for i in range(300):
+      numPlayers, maxCards = rng.choice(SIZES)
+      numCards = rng.randint(1, maxCards)
+      hands, leader, trumpSuit = randomPosition(rng, numPlayers, numCards)
+      form = canonicalForm(hands, leader, trumpSuit)
+      self.assertTrue(form in forms[numPlayers, numCards])
+
+      # the same form with the players turned round the table
+      shift = rng.randrange(numPlayers)
+      turned = hands[shift:] + hands[:shift]
+      self.assertEqual(canonicalForm(turned, (leader - shift) % numPlayers,
+                                     trumpSuit), form)
+
+      # and with the suits renamed, the trump suit with them
+      perm = range(4)
+      rng.shuffle(perm)
+      renamed = [ sum([ 1 << (13*perm[CARD_SUIT[card]] + CARD_RANK[card])
+                        for card in iterCards(hand) ]) for hand in hands ]
+      renamedTrump = -1
+      if trumpSuit >= 0:
+        renamedTrump = perm[trumpSuit]
+      self.assertEqual(canonicalForm(renamed, leader, renamedTrump), form)
+
+  def testFile( self ):
+    table = tablebase.generate(3, 2)
+    fd, fileName = tempfile.mkstemp(suffix = '.tb')
+    os.close(fd)
+    try:
+      tablebase.writeTablebase(fileName, 3, 2, table)
+      file = tablebase.Tablebase(fileName)
+      self.assertEqual((file.numPlayers, file.maxCards), (3, 2))
+      for key, packed in table.iteritems():
+        self.assertEqual(file.probe(key), packed)
+      form = iter(canonicalForms(3, 3)).next()
+      self.assertEqual(file.probe(formKey(form)), None)
+
+      # the results of positions dealt at random are the solver's
+      rng = random.Random(TEST_SEED)
+      for i in range(50):
+        hands, leader, trumpSuit = randomPosition(rng, 3, 2)
+        trump = -1
+        if trumpSuit >= 0:
+          held = hands[0] | hands[1] | hands[2]
+          trump = firstCard(SUIT_MASKS[trumpSuit] & ~held)
+        position = Position(hands, trump, (leader - 1) % 3)
+        self.assertEqual(file.results(hands, leader, trumpSuit),
+                         Solver().solve(position))
+      self.assertEqual(file.results([1, 2], 0, -1), None)
+      file.close()
+    finally:
+      os.remove(fileName)
+
+  def testPackResults( self ):
+    for results in itertools.product(range(3), repeat = 4):
+      packed = tablebase.packResults(list(results))
+      self.assertEqual(tablebase.unpackResults(packed, 4), list(results))
+
+
+if __name__ == '__main__':
+  unittest.main()
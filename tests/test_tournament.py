@@ -0,0 +1,129 @@
+###############################################
+# test_tournament.py
+# deal sets, their file format and duplicate
+# play of them under every seating
+###############################################
+
+import os, sys, unittest, random, itertools
+from StringIO import StringIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+from card import *
+from engine import Engine, makeTrickNums
+import bots, tournament
+from tournament import DealSet, makeDealSet, readDealSets, seatings
+
+#
+# seed of the test games
+#
+TEST_SEED = 0x70A7
+
+#
+# RandomPlayer that keeps the hands it is dealt
+#
+# Attributes:
+#   dealt
+#     list of (seat, dealer, numCards, trump, hand mask), one per hand
+#
+class DealtPlayer(bots.RandomPlayer):
+
+  def __init__( self, name = "", rng = None ):
+    bots.RandomPlayer.__init__(self, name, rng)
+    self.dealt = []
+
+  def getBid( self, engine, playerNum ):
+    self.dealt.append( (playerNum, engine.dealer, engine.numCards,
+                        engine.trump, engine.cards[playerNum].mask) )
+    return bots.RandomPlayer.getBid(self, engine, playerNum)
+
+
+class TournamentTest(unittest.TestCase):
+
+  def testPackRoundTrip( self ):
+    dealSets = [ makeDealSet(TEST_SEED + game, numPlayers)
+                 for game, numPlayers in enumerate([3, 4, 5, 2]) ]
+    data = ''.join([ dealSet.pack() for dealSet in dealSets ])
+    read = list(readDealSets(StringIO(data)))
+    self.assertEqual(len(read), len(dealSets))
+    for dealSet, other in zip(dealSets, read):
+      self.assertEqual( (other.seed, other.numPlayers, other.dealer),
+                        (dealSet.seed, dealSet.numPlayers, dealSet.dealer) )
+      self.assertEqual(other.hands, dealSet.hands)
+    self.assertEqual(list(readDealSets(StringIO(''))), [])
+    # cut inside the header or a hand of the last deal set
+    for cut in [1, tournament.SET_HEADER.size + 3]:
+      self.assertRaises(ValueError, list,
+                        readDealSets(StringIO(data[:len(data) - cut])))
+
+  def testDealSet( self ):
+    # the hands of a game dealt the way Engine deals them from the seed
+    for numPlayers in [3, 4, 5]:
+      dealSet = makeDealSet(TEST_SEED, numPlayers)
+      players = [ DealtPlayer('p%d' % i) for i in range(numPlayers) ]
+      Engine(players, seed = TEST_SEED, record = 0).playGame()
+      trickNums = makeTrickNums(numPlayers)
+      self.assertEqual(len(dealSet.hands), len(trickNums))
+      for handNum in range(len(trickNums)):
+        numCards, trump, masks = dealSet.hands[handNum]
+        self.assertEqual(numCards, trickNums[handNum])
+        self.assertEqual(popcount(sum(masks)), numPlayers*numCards)
+        for player in range(numPlayers):
+          self.assertEqual(players[player].dealt[handNum],
+                           (player, (dealSet.dealer + handNum) % numPlayers,
+                            numCards, trump, masks[player]))
+
+  def testSeatings( self ):
+    for numPlayers in range(2, 6):
+      rotations = seatings(numPlayers)
+      self.assertEqual(len(rotations), numPlayers)
+      self.assertEqual(rotations[0], tuple(range(numPlayers)))
+      for seat in range(numPlayers):
+        # every bot sits in every seat once
+        self.assertEqual(sorted([ seating[seat] for seating in rotations ]),
+                         range(numPlayers))
+      every = seatings(numPlayers, 1)
+      self.assertEqual(sorted(every),
+                       sorted(itertools.permutations(range(numPlayers))))
+      for seating in rotations:
+        self.assertTrue(seating in every)
+
+  def testDuplicate( self ):
+    # under every seating each seat holds the same cards, so every bot
+    # holds the cards of every seat; the same players play every seating
+    dealSet = makeDealSet(TEST_SEED, 3)
+    players = [ DealtPlayer('bot%d' % bot) for bot in range(3) ]
+    rotations = seatings(3)
+    results = tournament.playDealSet(dealSet, players, rotations)
+    self.assertEqual([ seating for seating, scores, winner in results ],
+                     rotations)
+    numHands = len(dealSet.hands)
+    for bot in range(3):
+      self.assertEqual(len(players[bot].dealt), numHands*len(rotations))
+      for game in range(len(rotations)):
+        seat = list(rotations[game]).index(bot)
+        for handNum in range(numHands):
+          numCards, trump, masks = dealSet.hands[handNum]
+          self.assertEqual(players[bot].dealt[game*numHands + handNum],
+                           (seat, (dealSet.dealer + handNum) % 3, numCards,
+                            trump, masks[seat]))
+
+  def testTournament( self ):
+    # a tournament is decided by its deal sets
+    botNames = [ 'HeuristicPlayer', 'RandomPlayer', 'RandomPlayer' ]
+    dealSets = [ makeDealSet(TEST_SEED + game, 3) for game in range(2) ]
+    standings = tournament.tournament(dealSets, botNames, progress = None)
+    again = tournament.tournament(dealSets, botNames, progress = None)
+    self.assertEqual(standings.numGames, 6)
+    self.assertEqual(sum(standings.wins), 6)
+    self.assertEqual(standings.dealTotals, again.dealTotals)
+    self.assertEqual(standings.totals,
+                     [ sum(totals) for totals in zip(*standings.dealTotals) ])
+    self.assertEqual(standings.averageScores(),
+                     [ total / 6.0 for total in standings.totals ])
+    self.assertEqual(tournament.Standings(botNames).averageScores(),
+                     [0.0] * 3)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,346 @@
+###############################################
+# test_tracker.py
+# card tracker state and deal sampling against
+# every deal consistent with the cards played
+###############################################
+
+import os, sys, unittest, random, itertools
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..'))
+from card import *
+from position import Position
+from tracker import CardTracker, CHOOSE, batchWinChances, numpy
+
+#
+# seed of the test games
+#
+TEST_SEED = 0x7AC
+
+#
+# play a hand with random legal cards, following it with a tracker
+# Parameters:
+#   rng        - random.Random instance
+#   numPlayers - number of players
+#   numCards   - number of cards dealt to each player
+#   player     - index of the observing player
+#   numPlayed  - number of cards to play
+#   noTrump    - 1 to play without trump
+# Return value:
+#   (tracker, Position after the cards were played)
+#
+def playHand( rng, numPlayers, numCards, player, numPlayed, noTrump = 0 ):
+  dealer = rng.randrange(numPlayers)
+  hands, trump = Deck(rng = rng).deal(numPlayers, numCards,
+                                      (dealer + 1) % numPlayers)
+  if noTrump:
+    trump = -1
+  position = Position([ sum([ 1 << card for card in cards ])
+                        for cards in hands ], trump, dealer)
+  tracker = CardTracker(numPlayers, player)
+  tracker.newHand(numCards, dealer)
+  for card in hands[player]:
+    tracker.draw(card)
+  tracker.dealOver(trump)
+  for i in range(numPlayed):
+    card = rng.choice(list(iterCards(position.legalMoves())))
+    tracker.cardPlayed(position.toMove, card)
+    position.play(card)
+  return tracker, position
+
+#
+# every deal of the unseen cards consistent with what a tracker saw
+# Parameters:
+#   tracker - CardTracker
+#   players - the players to deal to (None for all); leaving out players
+#             with voids would weigh the deals wrongly
+# Return value:
+#   list of tuples of the bit masks of the cards each player holds (0 for
+#   the players left out)
+#
+def consistentDeals( tracker, players = None, player = 0, taken = 0 ):
+  if player == tracker.numPlayers:
+    return [ () ]
+  if player == tracker.player:
+    return [ (tracker.hand,) + rest for rest in
+             consistentDeals(tracker, players, player + 1, taken) ]
+  if players is not None and player not in players:
+    return [ (0,) + rest for rest in
+             consistentDeals(tracker, players, player + 1, taken) ]
+  deals = []
+  cards = list(iterCards(tracker.possible(player) & ~taken))
+  for hand in itertools.combinations(cards, tracker.left[player]):
+    mask = sum([ 1 << card for card in hand ])
+    deals.extend([ (mask,) + rest for rest in
+                   consistentDeals(tracker, players, player + 1,
+                                   taken | mask) ])
+  return deals
+
+#
+# bound on the number of consistent deals, to keep the listing short
+#
+def dealBound( tracker ):
+  bound = 1
+  for player in range(tracker.numPlayers):
+    if player != tracker.player:
+      bound = bound*CHOOSE[popcount(tracker.possible(player))][
+                             tracker.left[player]]
+  return bound
+
+
+#
+# play on with random legal cards until the tracker's player is to move
+# Return value:
+#   0 if the hand ended first
+#
+def playToTurn( rng, tracker, position ):
+  while position.toMove != tracker.player and not position.isOver():
+    card = rng.choice(list(iterCards(position.legalMoves())))
+    tracker.cardPlayed(position.toMove, card)
+    position.play(card)
+  return not position.isOver()
+
+#
+# return the players still to play to the trick after the tracker's player
+#
+def laterPlayers( tracker ):
+  return [ (tracker.player + i) % tracker.numPlayers
+           for i in range(1, tracker.numPlayers - len(tracker.trick)) ]
+
+#
+# chance of each card the tracker's player may play to win the trick,
+# counted over a list of deals the way winChances takes it: the card wins
+# a deal if none of the later players can play a card that beats it
+#
+def bruteChances( tracker, deals ):
+  trumpSuit = -1
+  if tracker.trump >= 0:
+    trumpSuit = CARD_SUIT[tracker.trump]
+  best = ledCard = -1
+  if tracker.trick:
+    best = ledCard = tracker.trick[0][1]
+    for p, card in tracker.trick[1:]:
+      if beats(card, best, trumpSuit):
+        best = card
+  chances = {}
+  for card in iterCards(legalMask(tracker.hand, ledCard)):
+    led = ledCard
+    if led < 0:
+      led = card
+    wins = 0
+    if best < 0 or beats(card, best, trumpSuit):
+      for hands in deals:
+        for p in laterPlayers(tracker):
+          if [ other for other in iterCards(legalMask(hands[p], led))
+               if beats(other, card, trumpSuit) ]:
+            break
+        else:
+          wins = wins + 1
+    chances[card] = float(wins) / len(deals)
+  return chances
+
+
+class TrackerTest(unittest.TestCase):
+
+  def testState( self ):
+    rng = random.Random(TEST_SEED)
+    for numPlayers, numCards in [ (2, 13), (3, 7), (4, 10), (5, 10) ]:
+      for numPlayed in range(numPlayers*numCards):
+        player = rng.randrange(numPlayers)
+        tracker, position = playHand(rng, numPlayers, numCards, player,
+                                     numPlayed)
+        self.assertEqual(tracker.hand, position.hands[player])
+        self.assertEqual(tracker.trick, position.trick)
+        seen = tracker.hand
+        for p, cards in position.tricks:
+          for p, card in cards:
+            seen = seen | (1 << card)
+        for p, card in position.trick:
+          seen = seen | (1 << card)
+        if position.trump >= 0:
+          seen = seen | (1 << position.trump)
+        self.assertEqual(tracker.out, FULL_MASK & ~seen)
+        for p in range(numPlayers):
+          self.assertEqual(tracker.left[p], popcount(position.hands[p]))
+          # the real cards are always among the possible ones
+          self.assertEqual(position.hands[p] & ~tracker.possible(p), 0)
+
+  def testSampleConsistent( self ):
+    rng = random.Random(TEST_SEED)
+    for numPlayers, numCards in [ (2, 13), (3, 7), (4, 10), (5, 10) ]:
+      for numPlayed in range(0, numPlayers*numCards, 3):
+        player = rng.randrange(numPlayers)
+        tracker, position = playHand(rng, numPlayers, numCards, player,
+                                     numPlayed)
+        for i in range(5):
+          hands = tracker.sampleDeal(rng)
+          self.assertEqual(hands[player], tracker.hand)
+          dealt = 0
+          for p in range(numPlayers):
+            self.assertEqual(popcount(hands[p]), tracker.left[p])
+            self.assertEqual(hands[p] & dealt, 0)
+            dealt = dealt | hands[p]
+            if p != player:
+              self.assertEqual(hands[p] & ~tracker.possible(p), 0)
+
+  def testSampleUniform( self ):
+    # late in 5 player hands every consistent deal can be listed, and each
+    # must come up about as often as the others
+    rng = random.Random(TEST_SEED)
+    tested = 0
+    while tested < 10:
+      tracker, position = playHand(rng, 5, 10, rng.randrange(5),
+                                   rng.randint(36, 42))
+      if dealBound(tracker) > 10000:
+        continue
+      deals = consistentDeals(tracker)
+      if len(deals) < 2 or len(deals) > 100:
+        continue
+      counts = dict.fromkeys(deals, 0)
+      numSamples = 50*len(deals)
+      for i in range(numSamples):
+        hands = tuple(tracker.sampleDeal(rng))
+        self.assertTrue(hands in counts)
+        counts[hands] = counts[hands] + 1
+      expected = float(numSamples) / len(deals)
+      chiSquare = sum([ (count - expected)**2 / expected
+                        for count in counts.values() ])
+      freedom = len(deals) - 1
+      self.assertTrue(chiSquare < freedom + 6*(2*freedom)**0.5,
+                      '%d deals: chi square %.1f' % (len(deals), chiSquare))
+      tested = tested + 1
+
+  def testSampleMarginals( self ):
+    # where each unseen card is, over many consistent deals
+    rng = random.Random(TEST_SEED)
+    tested = 0
+    while tested < 5:
+      tracker, position = playHand(rng, 5, 10, rng.randrange(5),
+                                   rng.randint(34, 38))
+      if not sum(tracker.voids) or dealBound(tracker) > 20000:
+        continue
+      deals = consistentDeals(tracker)
+      numSamples = 2000
+      samples = [ tracker.sampleDeal(rng) for i in range(numSamples) ]
+      for p in range(5):
+        for card in iterCards(tracker.out):
+          bit = 1 << card
+          chance = float(len([ hands for hands in deals if hands[p] & bit ]))
+          chance = chance / len(deals)
+          freq = float(len([ hands for hands in samples if hands[p] & bit ]))
+          freq = freq / numSamples
+          error = 5*(chance*(1 - chance) / numSamples)**0.5 + 0.005
+          self.assertTrue(abs(freq - chance) <= error,
+                          'player %d card %d: %.3f sampled, %.3f exact'
+                          % (p, card, freq, chance))
+      tested = tested + 1
+
+  def testWinChancesLegal( self ):
+    rng = random.Random(TEST_SEED)
+    for numPlayers, numCards in [ (2, 13), (3, 7), (4, 10), (5, 10) ]:
+      for numPlayed in range(numPlayers*numCards):
+        tracker, position = playHand(rng, numPlayers, numCards,
+                                     rng.randrange(numPlayers), numPlayed)
+        if not playToTurn(rng, tracker, position):
+          continue
+        chances = tracker.winChances()
+        self.assertEqual(sorted(chances),
+                         list(iterCards(position.legalMoves())))
+        for chance in chances.values():
+          self.assertTrue(0.0 <= chance <= 1.0)
+        if not laterPlayers(tracker):
+          # the last player to the trick knows which cards win
+          self.assertEqual(chances, bruteChances(tracker, [ () ]))
+
+  def testWinChancesRuffed( self ):
+    # the trick was led in suit 0 and ruffed: a card of suit 0 must be
+    # followed and loses, without one only a higher trump wins
+    tracker = CardTracker(3, 2)
+    tracker.newHand(2, 2)
+    for card in [5, 25]:
+      tracker.draw(card)
+    tracker.dealOver(39)
+    tracker.cardPlayed(0, 3)
+    tracker.cardPlayed(1, 45)
+    self.assertEqual(tracker.winChances(), { 5: 0.0 })
+    tracker.newHand(2, 2)
+    for card in [25, 51]:
+      tracker.draw(card)
+    tracker.dealOver(39)
+    tracker.cardPlayed(0, 3)
+    tracker.cardPlayed(1, 45)
+    self.assertEqual(tracker.winChances(), { 25: 0.0, 51: 1.0 })
+
+  def testWinChancesExact( self ):
+    # before anybody shows out the chances are exact without trump, or
+    # with one player left to play; only the hands of the later players
+    # matter then, so only they are dealt
+    rng = random.Random(TEST_SEED)
+    tested = 0
+    while tested < 200:
+      numPlayers = rng.randint(2, 5)
+      numCards = rng.randint(1, 3)
+      tracker, position = playHand(rng, numPlayers, numCards,
+                                   rng.randrange(numPlayers),
+                                   rng.randrange(numPlayers*numCards),
+                                   rng.randrange(2))
+      if not playToTurn(rng, tracker, position) or sum(tracker.voids):
+        continue
+      later = laterPlayers(tracker)
+      if tracker.trump >= 0 and len(later) > 1:
+        continue
+      bound = 1
+      for p in later:
+        bound = bound*CHOOSE[popcount(tracker.out)][tracker.left[p]]
+      if bound > 20000:
+        continue
+      expected = bruteChances(tracker, consistentDeals(tracker, later))
+      chances = tracker.winChances()
+      for card in expected:
+        self.assertAlmostEqual(chances[card], expected[card])
+      tested = tested + 1
+
+  def testWinChancesClose( self ):
+    # late in a hand, with voids, the chances are close to the counts
+    # over every consistent deal
+    rng = random.Random(TEST_SEED)
+    errors = []
+    while len(errors) < 300:
+      numPlayers = rng.randint(3, 5)
+      numCards = { 3: 7, 4: 10, 5: 10 }[numPlayers]
+      tracker, position = playHand(rng, numPlayers, numCards,
+                                   rng.randrange(numPlayers),
+                                   rng.randrange(numPlayers*numCards),
+                                   rng.randrange(2))
+      if not playToTurn(rng, tracker, position) or \
+         dealBound(tracker) > 20000:
+        continue
+      expected = bruteChances(tracker, consistentDeals(tracker))
+      chances = tracker.winChances()
+      errors.append(max([ abs(chances[card] - expected[card])
+                          for card in expected ]))
+    self.assertTrue(sum(errors) / len(errors) < 0.02)
+
+  @unittest.skipIf(numpy is None, 'batchWinChances needs NumPy')
+  def testBatchWinChances( self ):
+    # the same chances as one tracker at a time, whatever the other
+    # trackers of the batch
+    rng = random.Random(TEST_SEED)
+    trackers = []
+    while len(trackers) < 200:
+      numPlayers = rng.randint(2, 5)
+      numCards = { 2: 13, 3: 7, 4: 10, 5: 10 }[numPlayers]
+      tracker, position = playHand(rng, numPlayers, numCards,
+                                   rng.randrange(numPlayers),
+                                   rng.randrange(numPlayers*numCards),
+                                   rng.randrange(2))
+      if playToTurn(rng, tracker, position):
+        trackers.append(tracker)
+    expected = [ tracker.winChances() for tracker in trackers ]
+    self.assertEqual(batchWinChances(trackers), expected)
+    self.assertEqual(batchWinChances(trackers[:1]), expected[:1])
+    self.assertEqual(batchWinChances([]), [])
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,387 @@
+#!/usr/bin/python
+
+###############################################
+# tournament.py
+# duplicate tournaments between bots
+#
+# Every game of a tournament is a deal set: the
+# first dealer and the cards of every hand of a
+# game, generated once from the game seed and kept
+# packed in a few hundred bytes.  The deal set is
+# then played once for each seating of the bots,
+# so every bot holds every seat's cards and luck
+# of the deal cancels out.  Each bot is made
+# once for the whole tournament and every game
+# runs in this process, so the caches of the bots
+# (e.g. the bid advisor of AdvisorPlayer, with its
+# canonical hand keys and exact solutions) carry
+# over from one seating to the next.
+#
+# Only those caches are shared.  No bot plays with
+# the double dummy solver (solver.py), so there
+# are no per-deal solver results to reuse across
+# seatings; a solver-backed bot is left for later.
+#
+#   tournament.py [-g <games>] [-b <bot,bot,...>] [-s <seed>] [-a]
+#                 [-o <deal file> | -i <deal file>] [-m <bid model file>]
+###############################################
+#
+# Deal file layout (little endian), one deal set after the other:
+#   deal set - game seed (Q), number of players (B), first dealer (B),
+#              number of hands (B)
+#   hand     - number of cards (B), trump card (b), then the bit mask of
+#              the cards of each player (Q)
+#
+
+import sys, time, random, struct, itertools
+import bots
+from card import *
+from engine import Engine, makeTrickNums
+from seeds import newSeed, deriveSeed, handSeed, firstDealer, dealFromSeed, \
+                  PLAYER_STREAM
+
+SET_HEADER = struct.Struct('<QBBB')
+HAND_HEADER = struct.Struct('<Bb')
+
+
+#
+# DealSet class
+# the deals of one game
+#
+# Attributes:
+#   seed
+#     seed of the game the deals were made from
+#
+#   numPlayers
+#     number of players
+#
+#   dealer
+#     index of the first dealer
+#
+#   hands
+#     list of (numCards, trump, masks) for each hand, masks holding the
+#     bit mask of the cards of each player
+#
+class DealSet:
+
+  def __init__( self, seed, numPlayers, dealer, hands ):
+    self.seed = seed
+    self.numPlayers = numPlayers
+    self.dealer = dealer
+    self.hands = hands
+
+  #
+  # return the deal set packed as a string (see the deal file layout)
+  #
+  def pack( self ):
+    masks = struct.Struct('<%dQ' % self.numPlayers)
+    data = [ SET_HEADER.pack(self.seed, self.numPlayers, self.dealer,
+                             len(self.hands)) ]
+    for numCards, trump, hands in self.hands:
+      data.append(HAND_HEADER.pack(numCards, trump))
+      data.append(masks.pack(*hands))
+    return ''.join(data)
+
+
+#
+# deal the hands of a game the way Engine does from the game seed
+# Parameters:
+#   seed       - seed of game
+#   numPlayers - number of players
+# Return value:
+#   DealSet
+#
+def makeDealSet( seed, numPlayers ):
+  dealer = firstDealer(seed, numPlayers)
+  hands = []
+  for handNum, numCards in enumerate(makeTrickNums(numPlayers)):
+    cards, trump = dealFromSeed(handSeed(seed, handNum), numPlayers,
+                                numCards, (dealer + handNum) % numPlayers)
+    masks = tuple([ sum([ 1 << card for card in player ])
+                    for player in cards ])
+    hands.append( (numCards, trump, masks) )
+  return DealSet(seed, numPlayers, dealer, hands)
+
+#
+# read deal sets packed with DealSet.pack
+# Parameter:
+#   file - file object to read from
+# Return value:
+#   generator of DealSets
+#
+def readDealSets( file ):
+  while 1:
+    header = file.read(SET_HEADER.size)
+    if not header:
+      return
+    if len(header) < SET_HEADER.size:
+      raise ValueError('Truncated deal file')
+    seed, numPlayers, dealer, numHands = SET_HEADER.unpack(header)
+    masks = struct.Struct('<%dQ' % numPlayers)
+    hands = []
+    for i in range(numHands):
+      data = file.read(HAND_HEADER.size + masks.size)
+      if len(data) < HAND_HEADER.size + masks.size:
+        raise ValueError('Truncated deal file')
+      numCards, trump = HAND_HEADER.unpack_from(data)
+      hands.append( (numCards, trump,
+                     masks.unpack_from(data, HAND_HEADER.size)) )
+    yield DealSet(seed, numPlayers, dealer, hands)
+
+
+#
+# DuplicateEngine class
+# Engine that plays the hands of a DealSet instead of dealing
+#
+# Attributes:
+#   dealSet
+#     DealSet of the game
+#
+class DuplicateEngine(Engine):
+
+  #
+  # constructor
+  # Parameters:
+  #   players - list of players, one for each seat of dealSet
+  #   dealSet - DealSet to play
+  #   record  - 0 to keep no history of the hands
+  #
+  def __init__( self, players, dealSet, record = 1 ):
+    if len(players) != dealSet.numPlayers:
+      raise ValueError('Deal set is for %d players' % dealSet.numPlayers)
+    Engine.__init__(self, players, seed = dealSet.seed, record = record)
+    self.dealSet = dealSet
+
+  def playGame( self, handNum = 0, dealer = -1 ):
+    return Engine.playGame(self, handNum, self.dealSet.dealer)
+
+  def startHand( self ):
+    handNum = self.firstHand + self.handNum
+    numCards, trump, masks = self.dealSet.hands[handNum]
+    self.dealHand(numCards, [ list(iterCards(mask)) for mask in masks ],
+                  trump, handSeed(self.seed, handNum))
+
+
+#
+# return the seatings of a tournament: each is a tuple giving the index of
+# the bot in each seat
+# Parameters:
+#   numPlayers - number of players
+#   every      - 1 for every permutation of the bots, 0 for the rotations
+#
+def seatings( numPlayers, every = 0 ):
+  if every:
+    return list(itertools.permutations(range(numPlayers)))
+  return [ tuple([ (seat - shift) % numPlayers for seat in range(numPlayers) ])
+           for shift in range(numPlayers) ]
+
+
+#
+# Standings class
+# results of the bots of a tournament
+#
+# Attributes:
+#   botNames
+#     class name (from bots.py) of each bot
+#
+#   numGames
+#     number of games played
+#
+#   wins
+#     games won by each bot
+#
+#   totals
+#     sum of the final scores of each bot
+#
+#   dealTotals
+#     list of the totals of each bot over the seatings of each deal set
+#
+class Standings:
+
+  def __init__( self, botNames ):
+    self.botNames = botNames
+    self.numGames = 0
+    self.wins = [0] * len(botNames)
+    self.totals = [0] * len(botNames)
+    self.dealTotals = []
+
+  #
+  # add the games of one deal set
+  # Parameter:
+  #   results - list of (seating, final scores by seat, winning seat)
+  #
+  def addDealSet( self, results ):
+    dealTotals = [0] * len(self.botNames)
+    for seating, scores, winner in results:
+      self.numGames = self.numGames + 1
+      self.wins[seating[winner]] = self.wins[seating[winner]] + 1
+      for seat in range(len(seating)):
+        dealTotals[seating[seat]] = dealTotals[seating[seat]] + scores[seat]
+    for bot in range(len(self.botNames)):
+      self.totals[bot] = self.totals[bot] + dealTotals[bot]
+    self.dealTotals.append(dealTotals)
+
+  #
+  # return the average final score of each bot
+  #
+  def averageScores( self ):
+    return [ float(total) / max(self.numGames, 1) for total in self.totals ]
+
+
+#
+# make the bots of a tournament
+# Parameter:
+#   botNames - class name (from bots.py) of each bot
+# Return value:
+#   list of players, one for each bot
+#
+def makeBots( botNames ):
+  return [ getattr(bots, botNames[bot])('bot%d' % bot)
+           for bot in range(len(botNames)) ]
+
+#
+# play every seating of a deal set
+# Parameters:
+#   dealSet  - DealSet to play
+#   players  - players of the bots (see makeBots), kept for every seating
+#   seating  - list of seatings (see seatings)
+# Return value:
+#   list of (seating, final scores by seat, winning seat)
+#
+def playDealSet( dealSet, players, seatingList ):
+  results = []
+  for seating in seatingList:
+    # each bot draws from its own stream whatever its seat
+    for bot in range(len(players)):
+      players[bot].rng = random.Random(deriveSeed(deriveSeed(dealSet.seed,
+                                                             PLAYER_STREAM),
+                                                  bot))
+    engine = DuplicateEngine([ players[bot] for bot in seating ], dealSet,
+                             record = 0)
+    winner = engine.playGame()
+    results.append( (seating, list(engine.scores), winner) )
+  return results
+
+#
+# play a tournament
+# Parameters:
+#   dealSets - iterable of DealSets
+#   botNames - class name (from bots.py) of each bot
+#   every    - 1 to play every permutation of the bots, 0 the rotations
+#   progress - file to write a progress line to (None for no output)
+# Return value:
+#   Standings
+#
+def tournament( dealSets, botNames, every = 0, progress = sys.stderr ):
+  standings = Standings(botNames)
+  seatingList = seatings(len(botNames), every)
+  players = makeBots(botNames)
+  start = time.time()
+  try:
+    for dealSet in dealSets:
+      standings.addDealSet(playDealSet(dealSet, players, seatingList))
+      if progress is not None:
+        elapsed = time.time() - start
+        progress.write('\r%d games  %.1f games/s  '
+                       % (standings.numGames,
+                          standings.numGames / max(elapsed, 1e-9)))
+        progress.flush()
+  finally:
+    for player in players:
+      if hasattr(player, 'close'):
+        player.close()
+  if progress is not None:
+    progress.write('\n')
+  return standings
+
+
+###############################################################
+# program code
+###############################################################
+
+def printUsage():
+  print 'Usage: tournament.py [-g <games>] [-b <bot,bot,...>] [-s <seed>] [-a]'
+  print '                     [-o <deal file> | -i <deal file>]'
+  print '                     [-m <bid model file>]'
+  sys.exit(1)
+
+
+if __name__ == '__main__':
+  import getopt
+
+  numGames = 10
+  botNames = [ 'HeuristicPlayer', 'RandomPlayer', 'RandomPlayer',
+               'RandomPlayer' ]
+  seed = None
+  every = 0
+  outName = inName = modelFile = None
+  try:
+    flags, args = getopt.getopt(sys.argv[1:], 'g:b:s:ao:i:m:')
+    for flag, value in flags:
+      if flag == '-g':
+        numGames = int(value)
+      elif flag == '-b':
+        botNames = value.split(',')
+      elif flag == '-s':
+        seed = int(value)
+      elif flag == '-a':
+        every = 1
+      elif flag == '-o':
+        outName = value
+      elif flag == '-i':
+        inName = value
+      elif flag == '-m':
+        modelFile = value
+  except (getopt.GetoptError, ValueError):
+    printUsage()
+  if outName is not None and inName is not None:
+    printUsage()
+
+  for name in botNames:
+    if not hasattr(bots, name):
+      print 'Unknown bot:', name
+      sys.exit(1)
+  if modelFile is not None:
+    import calibrate
+    try:
+      bots.HeuristicPlayer.model = calibrate.loadModel(modelFile)
+    except (IOError, ValueError), e:
+      print 'Cannot read bid model:', e
+      sys.exit(1)
+
+  if inName is not None:
+    try:
+      dealSets = list(readDealSets(open(inName, 'rb')))
+    except (IOError, ValueError), e:
+      print 'Cannot read deals:', e
+      sys.exit(1)
+    for dealSet in dealSets:
+      if dealSet.numPlayers != len(botNames):
+        print 'Deals are for %d players' % dealSet.numPlayers
+        sys.exit(1)
+  else:
+    if seed is None:
+      seed = newSeed()
+    dealSets = [ makeDealSet(deriveSeed(seed, game), len(botNames))
+                 for game in range(numGames) ]
+    if outName is not None:
+      out = open(outName, 'wb')
+      for dealSet in dealSets:
+        out.write(dealSet.pack())
+      out.close()
+
+  start = time.time()
+  standings = tournament(dealSets, botNames, every)
+  elapsed = time.time() - start
+
+  print '%d deal sets, %d games in %.1f s' % (len(dealSets),
+                                              standings.numGames, elapsed)
+  print '%-6s %-16s %6s %10s' % ('Bot', 'Class', 'Wins', 'Avg score')
+  scores = standings.averageScores()
+  for bot in range(len(botNames)):
+    print '%-6d %-16s %6d %10.1f' % (bot, botNames[bot], standings.wins[bot],
+                                     scores[bot])
+  if bots.AdvisorPlayer.advisor is not None:
+    stats = bots.AdvisorPlayer.advisor.stats()
+    print 'Bid advisor cache: %d hits, %d misses (%.0f%% hit rate)' % \
+          (stats['hits'], stats['misses'], 100*stats['hitRate'])
@@ -0,0 +1,507 @@
+###############################################
+# tracker.py
+# what one player can infer about the cards of
+# the others as a hand is played
+#
+# The tracker follows the game events and keeps,
+# for every player, the cards still out and the
+# suits they have shown out of, in O(1) per event.
+# From that it deals the unseen cards to the other
+# players uniformly among all consistent deals,
+# without retrying deals that break a void.
+#
+# batchWinChances, the win chances of many
+# trackers at once, needs NumPy; the rest is
+# plain Python.
+###############################################
+#
+# Sampling a consistent deal: cards of the same suit are alike as far as
+# the voids go, so each player is first given a number of cards of each
+# suit, then the cards themselves are drawn at random within each suit.
+# Players that have not shown out of any suit (and the cards left in the
+# deck) can take any card, so they share a pool that is split at random
+# at the end; only the players with voids need counting.  They are dealt
+# one after the other, and the number of ways to deal the players after
+# one only depends on how many cards of each suit are left, so it is
+# counted once for each such 4-tuple and remembered until the next event.
+#
+
+import bisect
+
+try:
+  import numpy
+except ImportError:
+  numpy = None
+
+from card import *
+
+
+#
+# CHOOSE[n][k] - number of ways to choose k of n cards
+#
+CHOOSE = [ [1] ]
+for n in range(1, 53):
+  CHOOSE.append([1] + [ CHOOSE[n - 1][k - 1] + CHOOSE[n - 1][k]
+                        for k in range(1, n) ] + [1])
+
+#
+# chances that a hand of h cards dealt from n holds none of x given cards,
+# worked out once for each (n, h, x)
+#
+ABSENT = {}
+
+def absent( n, h, x ):
+  key = (n, h, x)
+  chance = ABSENT.get(key)
+  if chance is None:
+    chance = 0.0
+    if h <= n - x:
+      chance = float(CHOOSE[n - x][h]) / CHOOSE[n][h]
+    ABSENT[key] = chance
+  return chance
+
+#
+# ABSENT as an array indexed [n][h][x] for batchWinChances, made on first
+# use (None until then)
+#
+_absentTable = None
+
+#
+# number of bits set in each 16 bit value, as an array for
+# batchWinChances (None until first used)
+#
+_popcount16 = None
+
+#
+# difference of two 4-tuples
+#
+def _minus( a, b ):
+  return (a[0] - b[0], a[1] - b[1], a[2] - b[2], a[3] - b[3])
+
+
+#
+# CardTracker class
+# one player's view of the cards of a hand
+#
+# Attributes:
+#   numPlayers
+#     number of players
+#
+#   player
+#     index of the observing player
+#
+#   numCards
+#     number of cards dealt to each player
+#
+#   dealer
+#     index of dealer
+#
+#   trump
+#     trump card (-1 for no trump)
+#
+#   hand
+#     bit mask of the cards the player still holds
+#
+#   out
+#     bit mask of the cards the player has not seen (held by the others
+#     or left in the deck)
+#
+#   left
+#     number of cards each player still holds
+#
+#   voids
+#     bit mask of the suits each player has shown out of (bit s for suit s)
+#
+#   trick
+#     list of (player, card) pairs played to the current trick
+#
+class CardTracker:
+
+  #
+  # constructor
+  # Parameters:
+  #   numPlayers - number of players
+  #   player     - index of the observing player
+  #
+  def __init__( self, numPlayers, player ):
+    self.numPlayers = numPlayers
+    self.player = player
+    self.newHand(0, 0)
+
+  #
+  # start a new hand
+  #
+  def newHand( self, numCards, dealer ):
+    self.numCards = numCards
+    self.dealer = dealer
+    self.trump = -1
+    self.hand = 0
+    self.out = FULL_MASK
+    self.left = [numCards] * self.numPlayers
+    self.voids = [0] * self.numPlayers
+    self.voidCards = [0] * self.numPlayers
+    self.trick = []
+    self.counts = {}
+
+  #
+  # a card is dealt to the player
+  #
+  def draw( self, card ):
+    self.hand = self.hand | (1 << card)
+    self.out = self.out & ~(1 << card)
+    self.counts = {}
+
+  #
+  # the deal is over and the trump card turned
+  #
+  def dealOver( self, trump ):
+    self.trump = trump
+    if trump >= 0:
+      self.out = self.out & ~(1 << trump)
+    self.counts = {}
+
+  #
+  # a card is played
+  # Parameters:
+  #   player - index of player who played it
+  #   card   - index of card
+  #
+  def cardPlayed( self, player, card ):
+    if self.trick:
+      ledSuit = CARD_SUIT[self.trick[0][1]]
+      if CARD_SUIT[card] != ledSuit:
+        self.voids[player] = self.voids[player] | (1 << ledSuit)
+        self.voidCards[player] = self.voidCards[player] | SUIT_MASKS[ledSuit]
+    if len(self.trick) == self.numPlayers - 1:
+      self.trick = []
+    else:
+      self.trick.append( (player, card) )
+    self.hand = self.hand & ~(1 << card)
+    self.out = self.out & ~(1 << card)
+    self.left[player] = self.left[player] - 1
+    self.counts = {}
+
+  #
+  # play the cards of a TrickState (e.g. a trick of a game log)
+  #
+  def addTrick( self, trick ):
+    for player, card in trick.getCards():
+      self.cardPlayed(player, card)
+
+  #
+  # follow a game event (the engine messages of EnginePlayer.notify or a
+  # line of the server protocol split into words)
+  #
+  def notify( self, message, *args ):
+    if message == 'NEW_HAND':
+      self.newHand(int(args[0]), int(args[1]))
+    elif message == 'DRAW':
+      self.draw(int(args[0]))
+    elif message == 'DEAL_OVER':
+      self.dealOver(int(args[0]))
+    elif message == 'CARD_PLAYED':
+      self.cardPlayed(int(args[0]), int(args[1]))
+
+  #
+  # return bit mask of the cards a player may hold
+  #
+  def possible( self, player ):
+    if player == self.player:
+      return self.hand
+    return self.out & ~self.voidCards[player]
+
+  #
+  # number of ways to deal the players with voids from one on
+  # Parameters:
+  #   i       - index in players of the next player to deal to
+  #   left    - number of cards of each suit not dealt yet (4-tuple)
+  #   players - indexes of the players with voids
+  #
+  def _count( self, i, left, players ):
+    if i == len(players):
+      # the rest goes to the pool
+      return 1
+    return self._choices(i, left, players)[0]
+
+  #
+  # the ways to deal to player i
+  # Return value:
+  #   (number of ways to deal the players from i on, list of 4-tuples of
+  #   numbers of cards of each suit player i may get, running totals of
+  #   the number of ways that follow each of them)
+  #
+  def _choices( self, i, left, players ):
+    key = (i, left)
+    choices = self.counts.get(key)
+    if choices is None:
+      count = 0
+      takes = []
+      totals = []
+      for take in self._takes(players[i], left):
+        ways = self._ways(left, take) * self._count(i + 1, _minus(left, take),
+                                                    players)
+        if ways:
+          count = count + ways
+          takes.append(take)
+          totals.append(count)
+      choices = (count, takes, totals)
+      self.counts[key] = choices
+    return choices
+
+  #
+  # every way to give a player with voids the cards they still hold
+  # Parameters:
+  #   player - index of player
+  #   left   - number of cards of each suit not dealt yet
+  # Return value:
+  #   generator of 4-tuples of numbers of cards of each suit
+  #
+  def _takes( self, player, left, suit = 0, need = None ):
+    if need is None:
+      need = self.left[player]
+    if suit == 4:
+      if not need:
+        yield ()
+      return
+    most = 0
+    if not self.voids[player] & (1 << suit):
+      most = min(need, left[suit])
+    for take in range(most + 1):
+      for rest in self._takes(player, left, suit + 1, need - take):
+        yield (take,) + rest
+
+  #
+  # number of ways to choose take of the cards left of each suit
+  #
+  def _ways( self, left, take ):
+    return (CHOOSE[left[0]][take[0]] * CHOOSE[left[1]][take[1]]
+            * CHOOSE[left[2]][take[2]] * CHOOSE[left[3]][take[3]])
+
+  #
+  # deal the unseen cards to the other players, every deal consistent
+  # with the voids shown being equally likely
+  # Parameter:
+  #   rng - random.Random instance
+  # Return value:
+  #   list of bit masks of the cards each player holds now
+  #
+  def sampleDeal( self, rng ):
+    others = [ player for player in range(self.numPlayers)
+               if player != self.player ]
+    players = tuple([ player for player in others if self.voids[player] ])
+    suits = []
+    for suit in range(4):
+      cards = list(iterCards(self.out & SUIT_MASKS[suit]))
+      rng.shuffle(cards)
+      suits.append(cards)
+    left = tuple([ len(cards) for cards in suits ])
+
+    hands = [0] * self.numPlayers
+    hands[self.player] = self.hand
+    for i in range(len(players)):
+      # choose how many cards of each suit player i gets, in proportion
+      # to the number of deals that follow
+      total, takes, totals = self._choices(i, left, players)
+      if not total:
+        raise ValueError('No deal is consistent with the cards played')
+      rest = _minus(left, takes[bisect.bisect_right(totals,
+                                                    rng.randrange(total))])
+      for suit in range(4):
+        for card in suits[suit][rest[suit]:left[suit]]:
+          hands[players[i]] = hands[players[i]] | (1 << card)
+      left = rest
+    pool = []
+    for suit in range(4):
+      pool.extend(suits[suit][:left[suit]])
+
+    # the players without voids share the rest, the deck keeps the cards
+    # nobody gets
+    rng.shuffle(pool)
+    start = 0
+    for player in others:
+      if not self.voids[player]:
+        for card in pool[start:start + self.left[player]]:
+          hands[player] = hands[player] | (1 << card)
+        start = start + self.left[player]
+    return hands
+
+  #
+  # chance of each card the player may play now to win the current trick
+  # Return value:
+  #   dict from card to probability
+  #
+  # A card wins if none of the players still to play can beat it, each of
+  # them being taken to beat it whenever they hold the cards to.  Their
+  # hands are taken one at a time, each as a random hand of the cards they
+  # may have less the cards the players before them hold; that is exact
+  # when only higher cards of the led suit can beat it and nobody has
+  # shown out, and close otherwise.  The chances of a hand holding none
+  # of a set of cards are tabled in ABSENT, so a call is a few lookups per
+  # card and player.
+  #
+  def winChances( self ):
+    players, cards = self.chanceSets()
+    chances = {}
+    for card, sets in cards:
+      if sets is None:
+        chances[card] = 0.0
+        continue
+      higher, follow, both = sets
+      chance = 1.0
+      for pool, h, taken in players:
+        n = max(popcount(pool) - taken, h)
+        # beaten if holding a higher card, or none of the led suit and a
+        # trump that is high enough
+        chance = chance * (absent(n, h, popcount(higher & pool))
+                           - absent(n, h, popcount(follow & pool))
+                           + absent(n, h, popcount(both & pool)))
+      chances[card] = chance
+    return chances
+
+  #
+  # the sets of cards winChances counts
+  # Return value:
+  #   (players, cards) with players a (pool, h, taken) tuple for each
+  #   player still to play (the cards they may hold, the number they do,
+  #   the number the players before them hold) and cards a list of (card,
+  #   sets) for each card the player may play, sets None for a card that
+  #   cannot win the trick, else (higher, follow, both): the cards that
+  #   beat card in the led suit, that follow the led suit, and that either
+  #   follow it or beat card out of it
+  #
+  def chanceSets( self ):
+    trumpSuit = -1
+    if self.trump >= 0:
+      trumpSuit = CARD_SUIT[self.trump]
+    best = ledCard = -1
+    if self.trick:
+      best = ledCard = self.trick[0][1]
+      for p, card in self.trick[1:]:
+        if beats(card, best, trumpSuit):
+          best = card
+
+    players = []
+    taken = 0
+    for i in range(1, self.numPlayers - len(self.trick)):
+      player = (self.player + i) % self.numPlayers
+      h = self.left[player]
+      players.append( (self.out & ~self.voidCards[player], h, taken) )
+      taken = taken + h
+
+    cards = []
+    for card in iterCards(legalMask(self.hand, ledCard)):
+      if best >= 0 and not beats(card, best, trumpSuit):
+        cards.append( (card, None) )
+        continue
+      ledSuit = CARD_SUIT[card]
+      if self.trick:
+        ledSuit = CARD_SUIT[ledCard]
+      above = self.out & SUIT_MASKS[CARD_SUIT[card]] & ~((2 << card) - 1)
+      # follow: cards that keep a player from trumping
+      # higher: the cards of the led suit that beat card
+      # trumps: the cards that beat card once out of the led suit
+      follow = self.out & SUIT_MASKS[ledSuit]
+      higher = trumps = 0
+      if CARD_SUIT[card] == ledSuit:
+        higher = above
+        if trumpSuit >= 0 and ledSuit != trumpSuit:
+          trumps = self.out & SUIT_MASKS[trumpSuit]
+      else:
+        trumps = above
+      cards.append( (card, (higher, follow, follow | trumps)) )
+    return players, cards
+
+
+#
+# number of bits set in each element of an array of 64 bit masks
+#
+def _popcounts( masks ):
+  bits = _popcount16[masks.view(numpy.uint16)]
+  return bits.reshape(masks.shape + (4,)).sum(axis = -1)
+
+#
+# winChances of many trackers at once, with NumPy
+# Parameter:
+#   trackers - list of CardTrackers
+# Return value:
+#   list of the dicts winChances returns for each tracker
+#
+# The players still to play of every tracker are rows of one array,
+# padded to the same number with players that do not change the product,
+# and the cards of every tracker rows of another; the pool of each player
+# is crossed with the sets of each card of its tracker, so the popcounts,
+# the lookups in ABSENT and the products are a few array operations for
+# the whole batch.
+#
+def batchWinChances( trackers ):
+  global _absentTable, _popcount16
+  if _absentTable is None:
+    _absentTable = numpy.array([ [ [ absent(n, h, x) for x in range(53) ]
+                                   for h in range(53) ]
+                                 for n in range(53) ])
+    _popcount16 = numpy.zeros(1 << 16, numpy.intp)
+    for bit in range(16):
+      _popcount16 = _popcount16 + ((numpy.arange(1 << 16) >> bit) & 1)
+  results = [ {} for tracker in trackers ]
+  players = []
+  owners = []
+  winners = []
+  sets = []
+  width = 1
+  for i in range(len(trackers)):
+    later, cards = trackers[i].chanceSets()
+    players.append(later)
+    width = max(width, len(later))
+    for card, cardSets in cards:
+      if cardSets is None:
+        results[i][card] = 0.0
+      else:
+        owners.append(i)
+        winners.append(card)
+        sets.append(cardSets)
+  if not sets:
+    return results
+
+  # a player of no cards holding none is a factor of 1
+  for later in players:
+    later.extend([ (0, 0, 0) ] * (width - len(later)))
+  players = numpy.array(players, numpy.uint64)
+  rows = numpy.array(owners, numpy.intp)
+  pools = players[rows, :, 0]
+  h = players[rows, :, 1].astype(numpy.intp)
+  taken = players[rows, :, 2].astype(numpy.intp)
+  n = numpy.maximum(_popcounts(pools) - taken, h)
+  bits = _popcounts(pools[:, :, numpy.newaxis]
+                    & numpy.array(sets, numpy.uint64)[:, numpy.newaxis, :])
+  table = _absentTable
+  chances = (table[n, h, bits[..., 0]] - table[n, h, bits[..., 1]]
+             + table[n, h, bits[..., 2]]).prod(axis = 1)
+  for i, card, chance in zip(owners, winners, chances):
+    results[i][card] = float(chance)
+  return results
+
+
+#
+# build the tracker of a player from a HandState in one pass
+# Parameters:
+#   hand        - HandState, e.g. from a game log
+#   player      - index of the observing player
+#   cardsPlayed - number of cards of the hand to replay (None for all)
+# Return value:
+#   CardTracker after the cards have been played
+#
+def fromHandState( hand, player, cardsPlayed = None ):
+  numPlayers = len(hand.getHands())
+  tracker = CardTracker(numPlayers, player)
+  tracker.newHand(hand.getNumCards(), hand.getDealer())
+  for card in hand.getHands()[player]:
+    tracker.draw(card)
+  tracker.dealOver(hand.getTrump())
+  played = 0
+  for trick in hand.getTricks():
+    for p, card in trick.getCards():
+      if cardsPlayed is not None and played == cardsPlayed:
+        return tracker
+      tracker.cardPlayed(p, card)
+      played = played + 1
+  return tracker